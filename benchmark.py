@@ -0,0 +1,247 @@
+"""
+任务管理系统性能基准测试
+
+生成 tasks.json 格式的合成数据集，在无界面（QT_QPA_PLATFORM=offscreen）环境下
+测量数据处理和视图生成的耗时，结果以JSON输出，便于在不同版本之间比较。
+
+用法:
+    python benchmark.py --groups 50 --branches 20 --subtasks 3 --output result.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from task_data_handler import TaskDataHandler
+
+# 结果格式版本，结构变化时递增
+RESULT_FORMAT_VERSION = 2
+
+# 对比的任务文件格式：(名称, 压缩编解码器, 是否紧凑)，默认的缩进格式作为基准
+FILE_FORMATS = [
+    ("compact", None, True),
+    ("gzip", "gzip", True),
+    ("lzma", "lzma", True)
+]
+
+# 生成中文文本使用的常用字
+CJK_CHARS = ("的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经"
+             "十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处理")
+TASK_TYPES = ["工作", "学习", "生活", "其他"]
+
+
+def random_text(rng, length):
+    """生成指定长度的随机中文文本"""
+    return "".join(rng.choice(CJK_CHARS) for _ in range(length))
+
+
+def generate_dataset(groups=50, branches=20, subtasks=3, text_length=40, completion_ratio=0.3, seed=0):
+    """
+    生成 tasks.json 格式的合成数据集
+
+    参数:
+        groups (int): 总任务（分组）数量
+        branches (int): 每个分组的分支任务数量
+        subtasks (int): 每个分支任务的子任务数量
+        text_length (int): 细节描述的中文字数，标题和子任务名称按比例缩短
+        completion_ratio (float): 已完成的分支任务和子任务比例
+        seed (int): 随机种子，相同参数生成相同的数据
+
+    返回:
+        dict: 按总标题分组的数据
+    """
+    rng = random.Random(seed)
+    title_length = max(2, text_length // 8)
+
+    organized_tasks = {}
+    for group_index in range(groups):
+        main_task = f"{random_text(rng, title_length)}{group_index}"
+        tasks = []
+        for branch_number in range(1, branches + 1):
+            tasks.append({
+                "branch_number": branch_number,
+                "sub_task_name": random_text(rng, title_length),
+                "details": random_text(rng, text_length),
+                "sub_task_tasks": {
+                    f"{random_text(rng, title_length)}{i}": rng.random() < completion_ratio
+                    for i in range(subtasks)
+                },
+                "estimated_time_hours": rng.randint(0, 3),
+                "estimated_time_minutes": rng.randint(0, 59),
+                "completed": rng.random() < completion_ratio,
+                "weight": rng.randint(1, 100)
+            })
+        organized_tasks[main_task] = {
+            "Types": [rng.choice(TASK_TYPES)],
+            "describe": "",
+            "tasks": tasks,
+            "sub_task_number": len(tasks)
+        }
+    return organized_tasks
+
+
+def measure(func, repeat):
+    """
+    多次调用函数并统计耗时
+
+    返回:
+        dict: 以毫秒为单位的最小值、中位数、平均值和最大值
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "repeat": repeat,
+        "min_ms": round(min(samples), 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "max_ms": round(max(samples), 3)
+    }
+
+
+def run_data_benchmarks(workdir, dataset, repeat):
+    """数据处理相关的基准测试，不需要创建界面"""
+    from task_display import TaskDisplayIntegration
+
+    filename = os.path.join(workdir, "tasks.json")
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(dataset, f, ensure_ascii=False, indent=4)
+    tasks = TaskDataHandler.load_tasks_from_json(filename)
+    with open(filename, encoding='utf-8') as f:
+        text = f.read()
+    raw_groups = json.loads(text)
+
+    # 搜索一个在部分任务中出现的关键词
+    query = tasks[len(tasks) // 2]["details"][:2]
+
+    results = {
+        "save_tasks_to_json": measure(lambda: TaskDataHandler.save_tasks_to_json(tasks, filename), repeat),
+        "load_tasks_from_json": measure(lambda: TaskDataHandler.load_tasks_from_json(filename), repeat),
+        # 加载时的格式校验和规范化单独的耗时，与只解析JSON的耗时对比
+        "parse_json": measure(lambda: json.loads(text), repeat),
+        "normalize_groups": measure(
+            lambda: [TaskDataHandler.normalize_group(main_task, group) for main_task, group in raw_groups.items()],
+            repeat),
+        "backup_tasks_file": measure(lambda: TaskDataHandler.backup_tasks_file(filename), repeat),
+        "search_tasks": measure(lambda: TaskDataHandler.search_tasks(tasks, query), repeat),
+        "filter_tasks_by_type": measure(lambda: TaskDataHandler.filter_tasks_by_type(tasks, TASK_TYPES[0]), repeat),
+        "convert_task_format": measure(lambda: TaskDisplayIntegration.convert_task_format(tasks), repeat),
+    }
+
+    # 紧凑格式和压缩容器的保存/加载时间及文件大小
+    sizes = {"indent": os.path.getsize(filename)}
+    for name, compression, compact in FILE_FORMATS:
+        path = os.path.join(workdir, f"tasks_{name}.json")
+        results[f"save_tasks_to_json[{name}]"] = measure(
+            lambda: TaskDataHandler.save_tasks_to_json(tasks, path, compression, compact), repeat)
+        results[f"load_tasks_from_json[{name}]"] = measure(
+            lambda: TaskDataHandler.load_tasks_from_json(path), repeat)
+        sizes[name] = os.path.getsize(path)
+
+    # 列式统计报表依赖numpy，未安装时跳过
+    from task_analytics import TaskAnalytics, TaskTable, np
+    if np is not None:
+        table = TaskTable.from_tasks(tasks)
+        results["task_table_build"] = measure(lambda: TaskTable.from_tasks(tasks), repeat)
+        results["analytics_report"] = measure(lambda: TaskAnalytics.report(table), repeat)
+    return results, {"tasks": len(tasks), "file_bytes": sizes}
+
+
+def run_gui_benchmarks(workdir, dataset, repeat):
+    """视图生成相关的基准测试，在offscreen平台下运行"""
+    from PySide6.QtWidgets import QApplication
+    from task_display import TaskDisplayPanel
+
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    # 卡片视图HTML生成（不创建Web视图，也不使用分组缓存）
+    panel = TaskDisplayPanel(lazy=True)
+    panel.task_data = dataset
+    results = {"generate_html": measure(panel.generate_html, repeat)}
+
+    # 列表视图重建，TaskListApp会在工作目录中自动加载 tasks.json
+    import main
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        window = main.TaskListApp()
+        while window._loading:
+            app.processEvents()
+        window.update_filtered_tasks()
+        results["update_task_display"] = measure(window.update_task_display, repeat)
+        window.close()
+    finally:
+        os.chdir(cwd)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="任务管理系统性能基准测试")
+    parser.add_argument("--groups", type=int, default=50, help="分组数量")
+    parser.add_argument("--branches", type=int, default=20, help="每个分组的分支任务数量")
+    parser.add_argument("--subtasks", type=int, default=3, help="每个分支任务的子任务数量")
+    parser.add_argument("--text-length", type=int, default=40, help="细节描述的中文字数")
+    parser.add_argument("--completion", type=float, default=0.3, help="已完成比例")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--repeat", type=int, default=5, help="数据处理测试的重复次数")
+    parser.add_argument("--gui-repeat", type=int, default=3, help="视图测试的重复次数")
+    parser.add_argument("--skip-gui", action="store_true", help="跳过需要Qt的视图测试")
+    parser.add_argument("--output", help="结果JSON文件，不指定时输出到标准输出")
+    args = parser.parse_args()
+
+    dataset_params = {
+        "groups": args.groups,
+        "branches": args.branches,
+        "subtasks": args.subtasks,
+        "text_length": args.text_length,
+        "completion_ratio": args.completion,
+        "seed": args.seed
+    }
+    dataset = generate_dataset(args.groups, args.branches, args.subtasks,
+                               args.text_length, args.completion, args.seed)
+
+    workdir = tempfile.mkdtemp(prefix="task_benchmark_")
+    try:
+        # 被测代码的打印信息输出到标准错误，避免混入JSON结果
+        with contextlib.redirect_stdout(sys.stderr):
+            results, dataset_info = run_data_benchmarks(workdir, dataset, args.repeat)
+            if not args.skip_gui:
+                results.update(run_gui_benchmarks(workdir, dataset, args.gui_repeat))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "format_version": RESULT_FORMAT_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "qt_platform": os.environ.get("QT_QPA_PLATFORM")
+        },
+        "dataset": {**dataset_params, **dataset_info},
+        "results": results
+    }
+
+    output = json.dumps(report, ensure_ascii=False, indent=4)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,62 @@
+import bisect
+import os
 import sys
+import time
 
-from PySide6.QtCore import Qt, QPoint, QRect
-from PySide6.QtGui import QColor, QPainter, QPen, QPainterPath, QFont
+# 进程启动时间，用于测量窗口首次显示耗时
+STARTUP_TIME = time.perf_counter()
+
+from PySide6.QtCore import Qt, QPoint, QRect, QTimer, QThread, QFileSystemWatcher, Signal
+from PySide6.QtGui import QColor, QPainter, QPen, QPainterPath, QFont, QKeySequence, QShortcut
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                                QHBoxLayout, QLabel, QLineEdit, QPushButton,
                                QComboBox, QScrollArea, QFrame, QTextEdit,
                                QDoubleSpinBox, QSpinBox, QCheckBox, QMessageBox,
                                QListWidget, QListWidgetItem, QSplitter, QGroupBox,
-                               QTabWidget, QInputDialog)
+                               QTabWidget, QInputDialog, QFileDialog, QGridLayout, QMenu,
+                               QProgressDialog, QDialog)
 
+from memory_diagnostics import MemoryDiagnostics
+from perf_instrument import perf, timed
+from task_archive import TaskArchive
 from task_data_handler import TaskDataHandler
-from task_display import TaskDisplayIntegration
+from task_display import TaskDisplayIntegration, TaskDisplayPanel
+from task_planner import DailyPlanner
+from task_history import (AddTasksCommand, DependencyCommand, ImportTasksCommand, MoveTaskCommand,
+                          RegroupTasksCommand, RemoveTasksCommand, TaskCommand, UndoStack,
+                          UpdateTasksCommand)
+from task_store import TaskStore
+from task_sync import TaskSyncClient
+from task_workers import TaskImportWorker, TaskLoadWorker
+from task_workspace import Workspace, WorkspaceCache, WorkspaceRegistry
+
+# 首次绘制完成后，空闲多久预热卡片视图的QtWebEngine（毫秒）
+CARD_VIEW_PREWARM_DELAY_MS = 1500
+# 后台加载时每块包含的任务数
+LOAD_CHUNK_SIZE = 100
+# 导入CSV/JSONL时每块包含的任务数，每块刷新一次视图（列表视图每个任务都要创建控件，块不宜过大）
+IMPORT_CHUNK_SIZE = 500
+# 任务文件变化通知的合并间隔（毫秒），其他程序写入文件时往往连续触发多次
+FILE_CHANGE_DEBOUNCE_MS = 300
+# 连接同步服务时交换修改的间隔（毫秒）
+SYNC_INTERVAL_MS = 5000
+# 列表视图中任务控件的样式，以及被多选中时的样式
+TASK_FRAME_STYLE = """
+    background-color: white; 
+    padding: 10px; 
+    margin: 4px;
+    border-radius: 6px;
+    border: 1px solid #eaeef2;
+"""
+TASK_FRAME_SELECTED_STYLE = """
+    background-color: #fef5e7; 
+    padding: 10px; 
+    margin: 4px;
+    border-radius: 6px;
+    border: 2px solid #f39c12;
+"""
+# 性能读数中显示的指标及顺序
+PERF_OVERLAY_METRICS = ["load", "save", "backup", "filter", "search", "convert", "html", "list_rebuild", "bridge", "plan", "merge", "sync", "import", "archive"]
 
 class CustomCheckBox(QCheckBox):
     def __init__(self, parent=None):
@@ -63,12 +109,140 @@ class CustomCheckBox(QCheckBox):
             painter.drawText(textRect, Qt.AlignLeft | Qt.AlignVCenter, text)
 
 
+class TaskFrame(QFrame):
+    """列表视图中单个任务的控件，点击空白处或标签时发送 clicked(是否按住Ctrl/Shift)"""
+
+    clicked = Signal(bool)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            modifiers = event.modifiers()
+            self.clicked.emit(bool(modifiers & (Qt.KeyboardModifier.ControlModifier |
+                                                Qt.KeyboardModifier.ShiftModifier)))
+        super().mousePressEvent(event)
+
+
+class ArchiveDialog(QDialog):
+    """浏览和搜索归档的分组，选择要恢复到任务列表的分组（打开时才读取归档文件）"""
+
+    def __init__(self, task_archive, parent=None):
+        super().__init__(parent)
+        self.task_archive = task_archive
+        # 点击“恢复”后选中的总标题
+        self.selected_groups = []
+        self.setWindowTitle("归档")
+        self.resize(560, 480)
+
+        layout = QVBoxLayout(self)
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("搜索归档的任务...")
+        self.search_input.textChanged.connect(self.update_list)
+        layout.addWidget(self.search_input)
+
+        self.summary_label = QLabel()
+        self.summary_label.setStyleSheet("color: #7f8c8d;")
+        layout.addWidget(self.summary_label)
+
+        self.archive_list = QListWidget()
+        self.archive_list.setSelectionMode(QListWidget.SelectionMode.ExtendedSelection)
+        layout.addWidget(self.archive_list)
+
+        btn_layout = QHBoxLayout()
+        btn_layout.addStretch()
+        restore_btn = QPushButton("恢复选中的分组")
+        restore_btn.clicked.connect(self.restore_selected)
+        close_btn = QPushButton("关闭")
+        close_btn.clicked.connect(self.reject)
+        btn_layout.addWidget(restore_btn)
+        btn_layout.addWidget(close_btn)
+        layout.addLayout(btn_layout)
+
+        self.update_list()
+
+    def update_list(self):
+        """没有搜索词时列出归档的分组，否则列出匹配的任务（属于哪个分组）"""
+        self.archive_list.clear()
+        query = self.search_input.text().strip()
+        if not query:
+            groups = self.task_archive.groups()
+            for main_task, group in groups.items():
+                item = QListWidgetItem(f"{main_task}（{len(group['tasks'])} 个任务）")
+                item.setData(Qt.ItemDataRole.UserRole, main_task)
+                self.archive_list.addItem(item)
+            self.summary_label.setText(f"归档中有 {len(groups)} 个分组，{len(self.task_archive.tasks())} 个任务")
+            return
+
+        tasks = self.task_archive.search(query)
+        for task in tasks:
+            item = QListWidgetItem(f"{task['main_task']} / 分支 {task['branch_number']} {task['sub_task']}")
+            item.setData(Qt.ItemDataRole.UserRole, task["main_task"])
+            self.archive_list.addItem(item)
+        self.summary_label.setText(f"找到 {len(tasks)} 个归档的任务，恢复时整个分组一起恢复")
+
+    def restore_selected(self):
+        selected = [item.data(Qt.ItemDataRole.UserRole) for item in self.archive_list.selectedItems()]
+        if not selected:
+            QMessageBox.warning(self, "恢复分组", "请先选择要恢复的分组或任务")
+            return
+        self.selected_groups = list(dict.fromkeys(selected))
+        self.accept()
+
+
 class TaskListApp(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.setWindowTitle("任务管理系统")
         self.setMinimumSize(900, 700)
 
+        # 同步服务地址（设置环境变量 TASK_SYNC_URL，例如 http://127.0.0.1:8765）
+        self.sync_client = None
+
+        # 内存诊断模式（设置环境变量 TASK_MEMDIAG=1 或按 Ctrl+Shift+M 开启）
+        self.memory_diagnostics = MemoryDiagnostics()
+        if os.environ.get("TASK_MEMDIAG") == "1":
+            self.memory_diagnostics.start()
+
+        # 初始化任务存储，列表视图和卡片视图共享同一份数据
+        self.task_store = TaskStore()
+        # 所有修改的撤销/重做栈（先注册，重新加载时先清空再刷新界面）
+        self.undo_stack = UndoStack(self.task_store)
+        self.undo_stack.add_listener(self.on_history_changed)
+        self.task_store.add_listener(self.on_store_changed)
+        self.filtered_tasks = []
+        # 总标题 -> 列表视图中的分组控件，用于只重建变化的分组
+        self._group_frames = {}
+        # 任务id -> 列表视图中的复选框，用于单个任务的增量同步
+        self._task_checkboxes = {}
+        # 任务id -> {子任务名称: (复选框, 名称标签)}
+        self._subtask_widgets = {}
+        # 任务id -> “等待前置任务”标签
+        self._blocked_labels = {}
+        # 列表视图和卡片视图中多选中的任务id
+        self.selected_ids = set()
+        # 后台加载状态
+        self._loading = False
+        self._load_thread = None
+        self._load_worker = None
+        # 后台导入状态
+        self._import_thread = None
+        self._import_worker = None
+        self._import_command = None
+        self._import_progress = None
+        self._import_counts = None
+        # 上次生成卡片视图时的存储版本和筛选条件
+        self._card_state = None
+        self._first_shown = False
+        # 每日计划，首次打开计划标签页时才求解，之后随存储变更增量调整
+        self.planner = DailyPlanner(self.task_store)
+        self._plan_ready = False
+        # 计划列表中显示的任务id（按顺序）及对应的列表项
+        self._plan_items = {}
+        # 命名工作区（各自的任务文件），切换走的工作区留在LRU缓存中
+        self.workspaces = WorkspaceRegistry()
+        self.workspace_cache = WorkspaceCache()
+        self.workspace = Workspace(self.workspaces.current, self.workspaces.task_file(self.workspaces.current))
+
+        self.update_window_title()
+
         # 创建主分割器
         main_splitter = QSplitter(Qt.Orientation.Horizontal)
         self.setCentralWidget(main_splitter)
@@ -82,31 +256,70 @@ class TaskListApp(QMainWindow):
         # 第一个选项卡 - 原始列表视图
         list_view_tab = self.setup_list_view_tab()
 
-        # 第二个选项卡 - 新的卡片视图
-        card_view_tab, self.task_card_display = TaskDisplayIntegration.create_display_tab()
+        # 第二个选项卡 - 新的卡片视图，Web视图延迟到首次切换或空闲预热时创建
+        card_view_tab, self.task_card_display = TaskDisplayIntegration.create_display_tab(
+            task_store=self.task_store, lazy=True, undo_stack=self.undo_stack)
+
+        # 第三个选项卡 - 每日计划
+        plan_tab = self.setup_plan_tab()
 
         # 添加选项卡
         display_panel.addTab(list_view_tab, "列表视图")
         display_panel.addTab(card_view_tab, "卡片视图")
+        display_panel.addTab(plan_tab, "今日计划")
+
+        # 选项卡上方是多选任务的批量操作栏，列表视图和卡片视图共用
+        display_widget = QWidget()
+        display_layout = QVBoxLayout(display_widget)
+        display_layout.setContentsMargins(0, 0, 0, 0)
+        display_layout.addWidget(self.setup_bulk_bar())
+        display_layout.addWidget(display_panel)
 
         # 添加面板到分割器
         main_splitter.addWidget(input_panel)
-        main_splitter.addWidget(display_panel)
+        main_splitter.addWidget(display_widget)
         main_splitter.setStretchFactor(0, 1)
         main_splitter.setStretchFactor(1, 2)
 
-        # 初始化任务列表
-        self.tasks = []
-        self.filtered_tasks = []
-
         # 设置样式
         self.apply_styles()
 
         # 连接信号
         display_panel.currentChanged.connect(self.on_tab_changed)
+        self.task_card_display.taskClicked.connect(self.on_task_clicked)
 
-        # 尝试自动加载任务
+        # 隐藏的性能读数和内存诊断
+        self.setup_perf_overlay()
+        memory_shortcut = QShortcut(QKeySequence("Ctrl+Shift+M"), self)
+        memory_shortcut.activated.connect(self.show_memory_report)
+
+        # 撤销/重做（输入框有焦点时由输入框处理自己的撤销）
+        undo_shortcut = QShortcut(QKeySequence.Undo, self)
+        undo_shortcut.activated.connect(self.undo_last)
+        redo_shortcut = QShortcut(QKeySequence.Redo, self)
+        redo_shortcut.activated.connect(self.redo_last)
+
+        # 尝试自动加载任务（在后台线程中进行，窗口先显示）
+        self.update_task_display()
+        self.setup_file_watcher()
         self.auto_load_tasks()
+        if os.environ.get("TASK_SYNC_URL"):
+            self.setup_sync(os.environ["TASK_SYNC_URL"])
+
+    @property
+    def tasks(self):
+        """当前所有任务（来自共享存储）"""
+        return self.task_store.tasks
+
+    @property
+    def file_sync(self):
+        """当前工作区任务文件的外部修改检测，加载和保存时记录基准版本"""
+        return self.workspace.file_sync
+
+    @property
+    def task_archive(self):
+        """当前工作区已完成分组的归档，浏览或搜索归档时才读取"""
+        return self.workspace.task_archive
 
     def update_filtered_tasks(self):
         """更新筛选后的任务列表"""
@@ -118,19 +331,136 @@ class TaskListApp(QMainWindow):
 
         # 再按搜索关键词筛选
         if search_text:
-            filtered = TaskDataHandler.search_tasks(filtered, search_text)
+            filtered = self.task_store.search_tasks(filtered, search_text)
 
         self.filtered_tasks = filtered
 
+    def apply_filters(self, tasks):
+        """对给定的任务应用当前的类型筛选和搜索条件"""
+        filtered = TaskDataHandler.filter_tasks_by_type(tasks, self.filter_combo.currentText())
+        search_text = self.search_input.text().strip()
+        if search_text:
+            filtered = self.task_store.search_tasks(filtered, search_text)
+        return filtered
+
+    def append_tasks(self, tasks, modified=True):
+        """
+        批量追加任务，只重建受影响的分组
+
+        参数:
+            tasks (list): 任务对象列表
+            modified (bool): 是否标记为未保存的修改
+        """
+        self.task_store.add_tasks(tasks, modified=modified)
+        filtered = self.apply_filters(tasks)
+        self.filtered_tasks.extend(filtered)
+        self.add_to_task_display(filtered)
+        self.update_card_display()
+
     def filter_tasks(self):
         """按类型筛选任务"""
         self.update_filtered_tasks()
         self.update_task_display()
+        self.memory_checkpoint("list_refresh")
 
     def search_tasks(self):
         """搜索任务"""
         self.update_filtered_tasks()
         self.update_task_display()
+        self.memory_checkpoint("list_refresh")
+
+
+    def setup_perf_overlay(self):
+        """设置状态栏中隐藏的性能读数：Ctrl+Shift+P 显示/隐藏，Ctrl+Shift+T 导出追踪文件"""
+        self.perf_label = QLabel()
+        self.perf_label.setStyleSheet("color: #7f8c8d; font-family: monospace;")
+        self.perf_label.setVisible(False)
+        self.statusBar().addPermanentWidget(self.perf_label)
+
+        self.perf_timer = QTimer(self)
+        self.perf_timer.setInterval(1000)
+        self.perf_timer.timeout.connect(self.update_perf_overlay)
+
+        # 启动时是否已通过环境变量开启记录
+        self._perf_enabled_at_start = perf.enabled
+
+        toggle_shortcut = QShortcut(QKeySequence("Ctrl+Shift+P"), self)
+        toggle_shortcut.activated.connect(self.toggle_perf_overlay)
+        export_shortcut = QShortcut(QKeySequence("Ctrl+Shift+T"), self)
+        export_shortcut.activated.connect(self.export_perf_trace)
+
+    def toggle_perf_overlay(self):
+        """显示/隐藏性能读数，显示期间开启记录"""
+        visible = not self.perf_label.isVisible()
+        self.perf_label.setVisible(visible)
+        if visible:
+            perf.enabled = True
+            self.update_perf_overlay()
+            self.perf_timer.start()
+        else:
+            perf.enabled = self._perf_enabled_at_start
+            self.perf_timer.stop()
+
+    def update_perf_overlay(self):
+        """刷新性能读数：每个指标最近一次和p95耗时"""
+        stats = perf.stats()
+        parts = []
+        tooltip = []
+        for name in PERF_OVERLAY_METRICS:
+            metric = stats.get(name)
+            if metric is None:
+                continue
+            parts.append(f"{name} {metric['last_ms']:.1f}/{metric['p95_ms']:.1f}")
+            tooltip.append(f"{name}: {metric['count']} 次, {metric['items']} 项, 共 {metric['total_ms']:.1f} ms")
+        self.perf_label.setText("最近/p95 (ms): " + "  ".join(parts) if parts else "暂无性能数据")
+        self.perf_label.setToolTip("\n".join(tooltip))
+
+    def export_perf_trace(self):
+        """导出Chrome追踪格式的性能记录"""
+        filename, _ = QFileDialog.getSaveFileName(
+            self, "导出性能追踪", "task_perf_trace.json", "JSON文件 (*.json)")
+        if not filename:
+            return
+        try:
+            count = perf.export_chrome_trace(filename)
+            self.statusBar().showMessage(f"已导出 {count} 条性能记录到 {filename}", 5000)
+        except OSError as e:
+            QMessageBox.critical(self, "导出失败", f"导出性能追踪时发生错误: {str(e)}")
+
+
+    def memory_checkpoint(self, label):
+        """内存诊断模式下在加载、渲染、刷新之后记录一次检查点"""
+        if not self.memory_diagnostics.enabled:
+            return
+        checkpoint = self.memory_diagnostics.checkpoint(label, self)
+        print(MemoryDiagnostics.format_checkpoint(checkpoint))
+
+    def show_memory_report(self):
+        """开启内存诊断，已开启时显示检查点报告并可导出"""
+        if not self.memory_diagnostics.enabled:
+            self.memory_diagnostics.start()
+            self.memory_checkpoint("start")
+            self.statusBar().showMessage("已开启内存诊断模式，再次按 Ctrl+Shift+M 查看报告", 5000)
+            return
+
+        self.memory_checkpoint("manual")
+        report = "\n".join(MemoryDiagnostics.format_checkpoint(cp)
+                           for cp in self.memory_diagnostics.checkpoints[-20:])
+        reply = QMessageBox.question(
+            self,
+            "内存诊断",
+            f"{report}\n\n是否导出全部检查点？",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No
+        )
+        if reply == QMessageBox.Yes:
+            filename, _ = QFileDialog.getSaveFileName(
+                self, "导出内存诊断", "task_memory_report.json", "JSON文件 (*.json)")
+            if filename:
+                try:
+                    self.memory_diagnostics.export(filename)
+                except OSError as e:
+                    QMessageBox.critical(self, "导出失败", f"导出内存诊断时发生错误: {str(e)}")
 
 
     def setup_input_panel(self):
@@ -140,6 +470,20 @@ class TaskListApp(QMainWindow):
         input_layout.setContentsMargins(10, 10, 10, 10)
         input_layout.setSpacing(10)
 
+        # 工作区切换
+        workspace_layout = QHBoxLayout()
+        workspace_layout.addWidget(QLabel("工作区:"))
+        self.workspace_combo = QComboBox()
+        self.workspace_combo.addItems(self.workspaces.names())
+        self.workspace_combo.setCurrentText(self.workspace.name)
+        self.workspace_combo.setToolTip("最近使用的工作区保留在内存中，切换回来时不需要重新加载")
+        self.workspace_combo.currentTextChanged.connect(self.switch_workspace)
+        workspace_layout.addWidget(self.workspace_combo, 1)
+        self.new_workspace_btn = QPushButton("新建...")
+        self.new_workspace_btn.clicked.connect(self.create_workspace)
+        workspace_layout.addWidget(self.new_workspace_btn)
+        input_layout.addLayout(workspace_layout)
+
         # 输入区域分组
         input_group = QGroupBox("添加新任务")
         input_group_layout = QVBoxLayout(input_group)
@@ -269,11 +613,26 @@ class TaskListApp(QMainWindow):
         self.save_btn.clicked.connect(self.save_tasks)
         self.load_btn = QPushButton("加载任务")
         self.load_btn.clicked.connect(self.load_tasks)
+        self.import_btn = QPushButton("导入...")
+        self.import_btn.setToolTip("从CSV或JSONL文件批量导入任务")
+        self.import_btn.clicked.connect(self.import_tasks)
         bottom_layout.addStretch()
         bottom_layout.addWidget(self.save_btn)
         bottom_layout.addWidget(self.load_btn)
+        bottom_layout.addWidget(self.import_btn)
         input_layout.addLayout(bottom_layout)
 
+        archive_layout = QHBoxLayout()
+        self.archive_btn = QPushButton("归档已完成分组")
+        self.archive_btn.setToolTip("将所有任务都已完成的分组移到归档文件，列表中不再显示")
+        self.archive_btn.clicked.connect(self.archive_completed_groups)
+        self.browse_archive_btn = QPushButton("浏览归档...")
+        self.browse_archive_btn.clicked.connect(self.browse_archive)
+        archive_layout.addStretch()
+        archive_layout.addWidget(self.archive_btn)
+        archive_layout.addWidget(self.browse_archive_btn)
+        input_layout.addLayout(archive_layout)
+
         input_layout.addStretch()
 
         return input_panel
@@ -303,6 +662,9 @@ class TaskListApp(QMainWindow):
 
         list_view_layout.addWidget(filter_frame)
 
+        # 任务概览：全部任务和各任务类型的统计，由共享存储增量维护
+        list_view_layout.addWidget(self.setup_summary_panel())
+
         # 任务显示区域
         tasks_group = QGroupBox("任务列表")
         tasks_layout = QVBoxLayout(tasks_group)
@@ -320,6 +682,198 @@ class TaskListApp(QMainWindow):
         return list_view_tab
 
 
+    def setup_bulk_bar(self):
+        """设置批量操作栏：点击任务选中，按住Ctrl或Shift点击多选，对选中的任务批量操作"""
+        bulk_frame = QFrame()
+        bulk_layout = QHBoxLayout(bulk_frame)
+        bulk_layout.setContentsMargins(10, 5, 10, 0)
+
+        self.selection_label = QLabel()
+        self.selection_label.setStyleSheet("color: #7f8c8d;")
+        bulk_layout.addWidget(self.selection_label)
+        bulk_layout.addStretch()
+
+        select_all_btn = QPushButton("全选")
+        select_all_btn.setToolTip("选中列表视图中当前显示（符合筛选条件）的所有任务")
+        select_all_btn.clicked.connect(self.select_all_tasks)
+        bulk_layout.addWidget(select_all_btn)
+
+        # 只在有选中的任务时可用的按钮
+        self._bulk_buttons = []
+        for text, slot in [
+            ("完成", lambda checked: self.bulk_set_completed(True)),
+            ("取消完成", lambda checked: self.bulk_set_completed(False)),
+            ("修改类型...", self.bulk_change_type),
+            ("移动到分组...", self.bulk_move_to_group),
+            ("删除", self.bulk_delete),
+            ("取消选择", self.clear_selection)
+        ]:
+            button = QPushButton(text)
+            button.clicked.connect(slot)
+            bulk_layout.addWidget(button)
+            self._bulk_buttons.append(button)
+
+        self.undo_btn = QPushButton("撤销")
+        self.undo_btn.clicked.connect(self.undo_last)
+        bulk_layout.addWidget(self.undo_btn)
+        self.redo_btn = QPushButton("重做")
+        self.redo_btn.clicked.connect(self.redo_last)
+        bulk_layout.addWidget(self.redo_btn)
+
+        self.update_selection_bar()
+        return bulk_frame
+
+    def update_selection_bar(self):
+        """刷新批量操作栏中的选中数量和按钮状态"""
+        count = len(self.selected_ids)
+        self.selection_label.setText(f"已选中 {count} 个任务" if count else "点击任务选中，按住Ctrl或Shift多选")
+        for button in self._bulk_buttons:
+            button.setEnabled(count > 0)
+        undo_text = self.undo_stack.undo_text()
+        self.undo_btn.setEnabled(undo_text is not None)
+        self.undo_btn.setToolTip(f"撤销: {undo_text}" if undo_text else "")
+        redo_text = self.undo_stack.redo_text()
+        self.redo_btn.setEnabled(redo_text is not None)
+        self.redo_btn.setToolTip(f"重做: {redo_text}" if redo_text else "")
+
+    def setup_summary_panel(self):
+        """设置任务概览面板"""
+        summary_group = QGroupBox("任务概览")
+        summary_group_layout = QVBoxLayout(summary_group)
+        self.summary_layout = QGridLayout()
+        summary_group_layout.addLayout(self.summary_layout)
+        self.ready_label = QLabel()
+        self.ready_label.setStyleSheet("color: #27ae60;")
+        summary_group_layout.addWidget(self.ready_label)
+        self.summary_layout.setHorizontalSpacing(20)
+        self.summary_layout.setVerticalSpacing(4)
+
+        for column, title in enumerate(["类型", "任务数", "已完成", "剩余时间", "加权完成"]):
+            header = QLabel(f"<b>{title}</b>")
+            header.setStyleSheet("color: #7f8c8d;")
+            self.summary_layout.addWidget(header, 0, column)
+
+        # 任务类型 -> 该行的数值标签，总计固定在第一行
+        self._summary_rows = {}
+        self.add_summary_row(None)
+        for task_type in ["工作", "学习", "生活", "其他"]:
+            self.add_summary_row(task_type)
+        self.update_summary_panel()
+
+        return summary_group
+
+    def add_summary_row(self, task_type):
+        """在概览面板末尾添加一行，task_type 为None时表示总计"""
+        row = len(self._summary_rows) + 1
+        name_label = QLabel("<b>总计</b>" if task_type is None else (task_type or "未分类"))
+        self.summary_layout.addWidget(name_label, row, 0)
+
+        value_labels = []
+        for column in range(1, 5):
+            label = QLabel()
+            self.summary_layout.addWidget(label, row, column)
+            value_labels.append(label)
+        self._summary_rows[task_type] = value_labels
+
+    def update_summary_panel(self):
+        """根据存储中的聚合统计刷新概览面板，只涉及任务类型数量的工作量"""
+        for task_type in self.task_store.type_stats:
+            if task_type not in self._summary_rows:
+                self.add_summary_row(task_type)
+
+        for task_type, value_labels in self._summary_rows.items():
+            if task_type is None:
+                stats = self.task_store.totals
+            else:
+                stats = self.task_store.type_stats.get(task_type) or TaskStore.new_stats()
+            text = TaskDisplayPanel.format_stats(stats)
+            values = [str(stats["count"]), text["completed"], text["remaining"], text["progress"]]
+            for label, value in zip(value_labels, values):
+                label.setText(value)
+
+        self.ready_label.setText(f"所有前置任务已完成、可立即开始的任务: {len(self.task_store.dependencies.ready)}")
+
+    def setup_plan_tab(self):
+        """设置每日计划标签页"""
+        plan_tab = QWidget()
+        plan_layout = QVBoxLayout(plan_tab)
+
+        # 时间预算
+        budget_frame = QFrame()
+        budget_layout = QHBoxLayout(budget_frame)
+        budget_layout.addWidget(QLabel("每日时间预算:"))
+        self.plan_hours_input = QSpinBox()
+        self.plan_hours_input.setRange(0, 24)
+        self.plan_hours_input.setValue(self.planner.budget_minutes // 60)
+        self.plan_hours_input.setSuffix(" 小时")
+        budget_layout.addWidget(self.plan_hours_input)
+        self.plan_minutes_input = QSpinBox()
+        self.plan_minutes_input.setRange(0, 59)
+        self.plan_minutes_input.setSingleStep(15)
+        self.plan_minutes_input.setValue(self.planner.budget_minutes % 60)
+        self.plan_minutes_input.setSuffix(" 分钟")
+        budget_layout.addWidget(self.plan_minutes_input)
+        budget_layout.addStretch()
+
+        replan_btn = QPushButton("重新规划")
+        replan_btn.clicked.connect(self.on_plan_budget_changed)
+        budget_layout.addWidget(replan_btn)
+        plan_layout.addWidget(budget_frame)
+
+        self.plan_hours_input.valueChanged.connect(self.on_plan_budget_changed)
+        self.plan_minutes_input.valueChanged.connect(self.on_plan_budget_changed)
+
+        # 计划概况和任务列表，勾选即完成任务
+        self.plan_summary_label = QLabel()
+        self.plan_summary_label.setStyleSheet("color: #7f8c8d; padding: 4px;")
+        plan_layout.addWidget(self.plan_summary_label)
+
+        self.plan_list = QListWidget()
+        self.plan_list.itemChanged.connect(self.on_plan_item_changed)
+        plan_layout.addWidget(self.plan_list)
+
+        return plan_tab
+
+    def on_plan_budget_changed(self):
+        """时间预算变化或点击重新规划时重新求解"""
+        if not self._plan_ready:
+            return
+        self.planner.set_budget(self.plan_hours_input.value() * 60 + self.plan_minutes_input.value())
+        self.update_plan_view()
+
+    def update_plan_view(self):
+        """用计划结果刷新计划列表，计划中的任务不变时只同步勾选状态"""
+        self.plan_list.blockSignals(True)
+        if list(self._plan_items) != self.planner.plan:
+            self.plan_list.clear()
+            self._plan_items = {}
+            for task in self.planner.plan_tasks():
+                minutes = DailyPlanner.task_minutes(task)
+                item = QListWidgetItem(
+                    f"{task['main_task']} · 分支 {task['branch_number']} {task['sub_task']}    "
+                    f"{TaskDisplayPanel.format_minutes(minutes)} · 权重 {task['weight']}")
+                item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+                item.setData(Qt.ItemDataRole.UserRole, task["id"])
+                self.plan_list.addItem(item)
+                self._plan_items[task["id"]] = item
+
+        for task_id, item in self._plan_items.items():
+            completed = self.task_store.get(task_id)["completed"]
+            item.setCheckState(Qt.CheckState.Checked if completed else Qt.CheckState.Unchecked)
+        self.plan_list.blockSignals(False)
+
+        budget = TaskDisplayPanel.format_minutes(self.planner.budget_minutes)
+        used = TaskDisplayPanel.format_minutes(self.planner.used_minutes)
+        method = "最优解" if self.planner.exact else "近似解"
+        self.plan_summary_label.setText(
+            f"已安排 {len(self.planner.plan)} 项（已完成 {len(self.planner.done)} 项） · "
+            f"用时 {used} / {budget} · 总权重 {self.planner.total_weight}（{method}）")
+
+    def on_plan_item_changed(self, item):
+        """在计划列表中勾选任务时写入共享存储"""
+        task = self.task_store.get(item.data(Qt.ItemDataRole.UserRole))
+        self.run_command(UpdateTasksCommand.completion(task, item.checkState() == Qt.CheckState.Checked))
+
     def add_subtask(self):
         """添加子任务到列表"""
         subtask_text, ok = QInputDialog.getText(self, "添加子任务", "输入子任务名称:")
@@ -422,8 +976,8 @@ class TaskListApp(QMainWindow):
             "sub_task_tasks": sub_task_tasks
         }
 
-        # 添加到任务列表
-        self.tasks.append(task)
+        # 添加到任务列表并增量更新显示
+        self.run_command(AddTasksCommand(f"添加任务 {sub_task}", [task]))
 
         # 清空输入框
         self.sub_task_input.clear()
@@ -433,27 +987,86 @@ class TaskListApp(QMainWindow):
         self.branch_number_input.setValue(self.branch_number_input.value() + 1)
         self.subtasks_list.clear()
 
-        # 更新显示
-        self.update_filtered_tasks()
-        self.update_task_display()
-        self.update_card_display()
+        # 提示成功（不弹出对话框，连续添加时不打断输入）
+        self.statusBar().showMessage("任务已成功添加到列表", 3000)
 
-        # 提示成功
-        QMessageBox.information(self, "添加成功", "任务已成功添加到列表")
 
+    def card_state(self):
+        """卡片页面对应的数据版本和筛选条件"""
+        return (self.task_store.revision, len(self.filtered_tasks),
+                self.filter_combo.currentText(), self.search_input.text().strip())
 
     def update_card_display(self):
         """更新卡片视图任务显示"""
         if hasattr(self, 'task_card_display'):
-            converted_data = TaskDisplayIntegration.convert_task_format(self.filtered_tasks)
-            self.task_card_display.set_task_data(converted_data)
+            # 数据和筛选条件都没有变化时不需要重新生成页面
+            card_state = self.card_state()
+            if card_state == self._card_state:
+                return
+            self._card_state = card_state
+
+            # 使用存储中增量维护的分组投影，只有版本变化的分组会重新生成HTML
+            if len(self.filtered_tasks) == len(self.task_store):
+                groups, versions = self.task_store.grouped_view()
+                self.task_card_display.set_task_data(groups, versions, self.task_store.group_stats)
+            else:
+                groups, versions = self.task_store.grouped_view(self.filtered_tasks)
+                self.task_card_display.set_task_data(groups, versions)
+            self.memory_checkpoint("card_render")
 
 
     def toggle_task_complete(self, task, state):
         """切换任务完成状态"""
-        task["completed"] = (state == Qt.CheckState.Checked.value)
-        # 更新卡片视图
-        self.update_card_display()
+        # 作为可撤销的命令写入共享存储，卡片视图通过存储的变更通知同步
+        self.run_command(UpdateTasksCommand.completion(task, state == Qt.CheckState.Checked.value))
+
+
+    def on_store_changed(self, event, tasks):
+        """共享存储变更时同步列表视图中对应任务的控件和统计，不重建整个列表"""
+        self.update_summary_panel()
+        for main_task in {task["main_task"] for task in tasks}:
+            self.update_group_header(main_task)
+        if self._plan_ready and self.planner.on_store_changed(event, tasks):
+            self.update_plan_view()
+        if event == "reset" or (event == "remove" and self.selected_ids):
+            # 被删除的任务不再保持选中
+            self.selected_ids = {task_id for task_id in self.selected_ids if self.task_store.get(task_id) is not None}
+            self.update_selection_bar()
+        if event == "move":
+            # 分支序号或位置变化，只重建涉及的分组（执行命令时由命令结束后统一刷新）
+            if not self.undo_stack.applying:
+                self.update_task_groups({task["main_task"] for task in tasks})
+                self.update_card_display()
+            return
+        if event in ("add", "update"):
+            # 完成状态或依赖变化只影响任务自身和直接依赖它的任务
+            dependencies = self.task_store.dependencies
+            for task in tasks:
+                self.update_ready_badge(task["id"])
+                for dependent_id in dependencies.dependents(task["id"]):
+                    self.update_ready_badge(dependent_id)
+        if event != "update":
+            return
+
+        for task in tasks:
+            checkbox = self._task_checkboxes.get(task["id"])
+            if checkbox is not None and checkbox.isChecked() != task["completed"]:
+                checkbox.blockSignals(True)
+                checkbox.setChecked(task["completed"])
+                checkbox.blockSignals(False)
+
+            subtask_widgets = self._subtask_widgets.get(task["id"], {})
+            for sub_task_name, completed in task["sub_task_tasks"].items():
+                widgets = subtask_widgets.get(sub_task_name)
+                if widgets is None:
+                    continue
+                subtask_checkbox, subtask_name_label = widgets
+                if subtask_checkbox.isChecked() != completed:
+                    subtask_checkbox.blockSignals(True)
+                    subtask_checkbox.setChecked(completed)
+                    subtask_checkbox.blockSignals(False)
+                subtask_name_label.setStyleSheet(
+                    "text-decoration: line-through; color: #95a5a6;" if completed else "")
 
 
     def on_tab_changed(self, index):
@@ -461,6 +1074,35 @@ class TaskListApp(QMainWindow):
         # 如果切换到卡片视图标签页，刷新其内容
         if index == 1:  # 卡片视图是第二个标签页
             self.update_card_display()
+            self.task_card_display.ensure_web_view()
+        elif index == 2 and not self._plan_ready:
+            self._plan_ready = True
+            self.planner.replan()
+            self.update_plan_view()
+
+
+    def showEvent(self, event):
+        """窗口显示事件"""
+        super().showEvent(event)
+        if not self._first_shown:
+            self._first_shown = True
+            # 事件循环处理完首次绘制后再执行
+            QTimer.singleShot(0, self.on_first_paint)
+
+
+    def on_first_paint(self):
+        """首次绘制完成：启用性能记录时记录启动耗时，并安排空闲时预热卡片视图"""
+        if perf.enabled:
+            now = time.perf_counter()
+            perf.record("first_paint", STARTUP_TIME, now)
+            print(f"窗口首次显示耗时: {(now - STARTUP_TIME) * 1000:.0f} ms")
+        QTimer.singleShot(CARD_VIEW_PREWARM_DELAY_MS, self.prewarm_card_view)
+
+
+    def prewarm_card_view(self):
+        """预热卡片视图，使第一次切换到卡片视图时无需等待QtWebEngine启动"""
+        self.update_card_display()
+        self.task_card_display.ensure_web_view()
 
 
     def save_tasks(self):
@@ -470,8 +1112,7 @@ class TaskListApp(QMainWindow):
             return
 
         try:
-            success = TaskDataHandler.save_tasks_to_json(self.tasks, "tasks.json")
-            if success:
+            if self.write_tasks_file():
                 QMessageBox.information(self, "保存成功", "任务已成功保存到文件")
             else:
                 QMessageBox.critical(self, "保存失败", "保存任务时发生错误")
@@ -479,15 +1120,172 @@ class TaskListApp(QMainWindow):
             QMessageBox.critical(self, "保存失败", f"保存任务时发生错误: {str(e)}")
 
 
+    def write_tasks_file(self):
+        """
+        将任务存储写入任务文件，返回是否成功
+
+        异常:
+            Exception: 保存过程中的其他错误（由调用方提示）
+        """
+        # 其他实例在此期间保存过时，先合并对方的修改再写入
+        success, result = self.file_sync.save(self.task_store)
+        if result is not None:
+            self.apply_merge_result(result)
+        if success:
+            self.task_store.mark_saved()
+            self.memory_checkpoint("save")
+            # 恢复的分组写入任务文件后才从归档文件中删除
+            if self.task_archive.modified:
+                try:
+                    self.task_archive.save()
+                except (OSError, ValueError) as e:
+                    print(f"更新归档文件时出错: {e}")
+        return success
+
+
+    def archive_completed_groups(self):
+        """将全部完成的分组移到归档文件，并立即保存任务文件"""
+        if self._loading or self._import_thread is not None:
+            return
+        main_tasks = TaskArchive.completed_groups(self.task_store)
+        if not main_tasks:
+            QMessageBox.information(self, "归档", "没有所有任务都已完成的分组")
+            return
+        count = sum(self.task_store.group_stats[main_task]["count"] for main_task in main_tasks)
+        reply = QMessageBox.question(
+            self, "归档",
+            f"将 {len(main_tasks)} 个已完成的分组（{count} 个任务）移到归档文件并保存任务文件？\n"
+            "归档的任务可以通过“浏览归档”搜索和恢复，归档后不能撤销。",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+
+        try:
+            removed = self.task_archive.archive(self.task_store, main_tasks)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "归档失败", f"写入归档文件时发生错误: {e}")
+            return
+        # 归档文件已经写入，之前的命令不再适用
+        self.undo_stack.clear()
+        self.refresh_after_command(TaskCommand.changes(removed=removed))
+        try:
+            saved = self.write_tasks_file()
+        except Exception as e:
+            print(f"保存任务时出错: {e}")
+            saved = False
+        if not saved:
+            QMessageBox.warning(self, "归档", "分组已写入归档文件，但保存任务文件失败，请稍后手动保存")
+        self.statusBar().showMessage(f"已归档 {len(main_tasks)} 个分组，{len(removed)} 个任务", 5000)
+
+
+    def browse_archive(self):
+        """浏览和搜索归档，恢复选中的分组并保存任务文件（保存成功后才从归档文件中删除）"""
+        if self._loading or self._import_thread is not None:
+            return
+        try:
+            dialog = ArchiveDialog(self.task_archive, self)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "归档", f"读取归档文件时发生错误: {e}")
+            return
+        if dialog.exec() != QDialog.Accepted or not dialog.selected_groups:
+            return
+
+        restored = self.task_archive.restore(self.task_store, dialog.selected_groups)
+        self.undo_stack.clear()
+        self.refresh_after_command(TaskCommand.changes(added=restored))
+        try:
+            saved = self.write_tasks_file()
+        except Exception as e:
+            print(f"保存任务时出错: {e}")
+            saved = False
+        if not saved:
+            QMessageBox.warning(self, "恢复分组", "分组已恢复到列表，但保存任务文件失败，请稍后手动保存\n"
+                                              "（保存之前归档中仍保留这些分组）")
+        self.statusBar().showMessage(f"已恢复 {len(dialog.selected_groups)} 个分组，{len(restored)} 个任务", 5000)
+
+
+    def update_window_title(self):
+        self.setWindowTitle(f"任务管理系统 - {self.workspace.name}")
+
+
+    def create_workspace(self):
+        """新建工作区：输入名称并选择任务文件（可以是已有的文件），然后切换过去"""
+        name, ok = QInputDialog.getText(self, "新建工作区", "工作区名称:")
+        if not ok or not name.strip():
+            return
+        filename, _ = QFileDialog.getSaveFileName(
+            self, "工作区的任务文件", f"{name.strip()}.json", "任务文件 (*.json *.json.gz *.json.xz)",
+            options=QFileDialog.DontConfirmOverwrite)
+        if not filename:
+            return
+        try:
+            self.workspaces.add(name, filename)
+        except ValueError as e:
+            QMessageBox.warning(self, "新建工作区", str(e))
+            return
+        self.workspace_combo.addItem(name.strip())
+        self.workspace_combo.setCurrentText(name.strip())
+
+
+    def switch_workspace(self, name):
+        """
+        切换工作区。当前工作区连同任务存储中的数据（包括未保存的修改）放入LRU缓存；
+        目标工作区在缓存中时直接换入存储，否则在后台加载其任务文件
+        """
+        if not name or name == self.workspace.name:
+            return
+        if self._loading or self._import_thread is not None or self.sync_client is not None:
+            if self.sync_client is not None:
+                QMessageBox.information(self, "切换工作区", "已连接同步服务，同步服务只对应当前工作区的任务文件")
+            self.workspace_combo.blockSignals(True)
+            self.workspace_combo.setCurrentText(self.workspace.name)
+            self.workspace_combo.blockSignals(False)
+            return
+
+        target = self.workspace_cache.take(name)
+        cold = target is None
+        if cold:
+            target = Workspace(name, self.workspaces.task_file(name))
+            target.task_store = TaskStore()
+        previous = self.workspace
+        # 交换数据后 previous.task_store 持有切换走的数据，界面上的存储对象不变
+        self.task_store.swap(target.task_store)
+        previous.task_store = target.task_store
+        target.task_store = None
+        self.workspace = target
+        for evicted in self.workspace_cache.put(previous):
+            print(f"工作区 {evicted.name} 超出缓存预算，已从内存中释放")
+        self.workspaces.set_current(name)
+
+        self.update_window_title()
+        self.watch_tasks_file()
+        self.update_filtered_tasks()
+        self.update_task_display()
+        self.update_card_display()
+        self.memory_checkpoint("workspace")
+        if cold:
+            self.auto_load_tasks()
+        else:
+            # 在缓存中期间文件可能被其他实例修改，检查一次
+            self._file_check_timer.start()
+            self.statusBar().showMessage(f"已切换到工作区 {name}（{len(self.task_store)} 个任务）", 3000)
+
+
     def load_tasks(self):
         """从文件加载任务"""
         try:
-            loaded_tasks = TaskDataHandler.load_tasks_from_json("tasks.json")
+            try:
+                # 同时记录为检测外部修改的基准版本
+                loaded_tasks = self.file_sync.load()
+            except (FileNotFoundError, ValueError) as e:
+                print(f"加载任务时出错: {e}")
+                loaded_tasks = None
             if loaded_tasks:
-                self.tasks = loaded_tasks
+                self.task_store.reset(loaded_tasks)
                 self.update_filtered_tasks()
                 self.update_task_display()
                 self.update_card_display()
+                self.memory_checkpoint("load")
                 QMessageBox.information(self, "加载成功", "任务已成功从文件加载")
             else:
                 QMessageBox.warning(self, "加载失败", "加载任务时发生错误或文件不存在")
@@ -496,262 +1294,935 @@ class TaskListApp(QMainWindow):
 
 
     def auto_load_tasks(self):
-        """程序启动时尝试自动加载任务"""
+        """程序启动时在后台线程中自动加载任务，每加载一块就增量显示"""
+        self._loading = True
+        self.save_btn.setEnabled(False)
+        self.load_btn.setEnabled(False)
+        self.workspace_combo.setEnabled(False)
+        self.statusBar().showMessage("正在加载任务...")
+
+        self._load_thread = QThread(self)
+        self._load_worker = TaskLoadWorker(self.file_sync.filename, LOAD_CHUNK_SIZE)
+        self._load_worker.moveToThread(self._load_thread)
+        self._load_thread.started.connect(self._load_worker.run)
+        self._load_worker.chunkLoaded.connect(self.on_tasks_chunk_loaded)
+        self._load_worker.finished.connect(self.on_auto_load_finished)
+        self._load_worker.failed.connect(self.on_auto_load_failed)
+        self._load_thread.start()
+
+
+    def on_tasks_chunk_loaded(self, tasks):
+        """后台加载的一块任务到达"""
+        self.append_tasks(tasks, modified=False)
+        self.statusBar().showMessage(f"正在加载任务... 已加载 {len(self.task_store)} 个任务")
+
+
+    def on_auto_load_finished(self, count):
+        """后台加载完成"""
+        snapshot = self._load_worker.snapshot
+        self.stop_loading()
+        if snapshot is not None:
+            self.file_sync.record(*snapshot)
+            # 加载期间文件的变化通知被忽略了，重新检查一次
+            self._file_check_timer.start()
+        if count:
+            print("已自动加载任务数据")
+            self.memory_checkpoint("load")
+            # 分块加载时计划只做了增量填充，加载完成后重新求解
+            if self._plan_ready:
+                self.planner.replan()
+                self.update_plan_view()
+            self.statusBar().showMessage(f"已加载 {count} 个任务", 3000)
+        else:
+            print("未找到任务数据文件或文件为空")
+            self.statusBar().clearMessage()
+            self.update_task_display()
+
+
+    def on_auto_load_failed(self, message):
+        """后台加载失败"""
+        self.stop_loading()
+        print(f"自动加载任务数据失败: {message}")
+        self.statusBar().showMessage("自动加载任务数据失败", 3000)
+        self.update_task_display()
+
+
+    def stop_loading(self):
+        """结束后台加载并恢复界面状态"""
+        self._loading = False
+        self.save_btn.setEnabled(True)
+        self.load_btn.setEnabled(True)
+        self.workspace_combo.setEnabled(True)
+        if self._load_thread is not None:
+            self._load_worker.cancel()
+            self._load_thread.quit()
+            self._load_thread.wait()
+            self._load_worker.deleteLater()
+            self._load_thread.deleteLater()
+            self._load_thread = None
+            self._load_worker = None
+
+
+    def setup_file_watcher(self):
+        """监视任务文件，被其他程序修改后增量合并到当前数据"""
+        self.file_watcher = QFileSystemWatcher(self)
+        self.watch_tasks_file()
+        self.file_watcher.fileChanged.connect(self.on_tasks_file_changed)
+        self.file_watcher.directoryChanged.connect(self.on_tasks_file_changed)
+
+        self._file_check_timer = QTimer(self)
+        self._file_check_timer.setSingleShot(True)
+        self._file_check_timer.setInterval(FILE_CHANGE_DEBOUNCE_MS)
+        self._file_check_timer.timeout.connect(self.check_external_changes)
+
+
+    def watch_tasks_file(self):
+        """监视当前工作区的任务文件（切换工作区后改为监视新的文件）"""
+        watched = self.file_watcher.files() + self.file_watcher.directories()
+        if watched:
+            self.file_watcher.removePaths(watched)
+        path = os.path.abspath(self.file_sync.filename)
+        # 同时监视所在目录：文件被原子替换或重新创建后需要重新添加监视
+        self.file_watcher.addPath(os.path.dirname(path))
+        if os.path.exists(path):
+            self.file_watcher.addPath(path)
+
+
+    def on_tasks_file_changed(self, path):
+        """文件或目录变化通知，等通知停止后再检查"""
+        self._file_check_timer.start()
+
+
+    def check_external_changes(self):
+        """检查任务文件是否被外部修改，只合并内容变化的分组"""
+        if self._loading:
+            return
+
+        path = os.path.abspath(self.file_sync.filename)
+        if os.path.exists(path) and path not in self.file_watcher.files():
+            self.file_watcher.addPath(path)
+
+        text = self.file_sync.check()
+        if text is None:
+            return
+
         try:
-            loaded_tasks = TaskDataHandler.load_tasks_from_json("tasks.json")
-            if loaded_tasks:
-                self.tasks = loaded_tasks
-                self.update_filtered_tasks()
-                self.update_task_display()
-                self.update_card_display()
-                print("已自动加载任务数据")
-            else:
-                print("未找到任务数据文件或文件为空")
-        except Exception as e:
-            print(f"自动加载任务数据失败: {e}")
+            result = self.file_sync.merge(self.task_store, text)
+        except (ValueError, KeyError) as e:
+            print(f"合并任务文件的外部修改失败: {e}")
+            return
+        self.apply_merge_result(result)
+
+
+    def apply_merge_result(self, result, source="任务文件已被外部修改", kept="本地和文件中都被修改，已保留本地版本"):
+        """合并外部修改后刷新受影响的分组，并提示冲突"""
+        if result["groups"]:
+            self.update_filtered_tasks()
+            self.update_task_groups(result["groups"])
+            self.update_card_display()
+        self.statusBar().showMessage(
+            f"{source}：新增 {result['added']}，删除 {result['removed']}，修改 {result['updated']}", 5000)
+
+        if result["conflicts"]:
+            lines = [f"{conflict['main_task']} #{conflict['branch_number']} {conflict['sub_task']}：{conflict['reason']}"
+                     for conflict in result["conflicts"][:10]]
+            if len(result["conflicts"]) > 10:
+                lines.append(f"……共 {len(result['conflicts'])} 处冲突")
+            QMessageBox.warning(self, "合并冲突",
+                                f"以下任务在{kept}：\n\n" + "\n".join(lines))
+
+
+    def setup_sync(self, url):
+        """连接本机的同步服务（task_sync.py），定时交换增量"""
+        self.sync_client = TaskSyncClient(self.task_store, url)
+        self._sync_online = None
+        self.sync_timer = QTimer(self)
+        self.sync_timer.timeout.connect(self.sync_with_server)
+        self.sync_timer.start(SYNC_INTERVAL_MS)
+
+
+    def sync_with_server(self):
+        """与同步服务交换修改，服务不可用时修改保留到重新连接"""
+        if self._loading:
+            return
+        try:
+            result = self.sync_client.sync()
+        except OSError as e:
+            if self._sync_online is not False:
+                print(e)
+                self.statusBar().showMessage(
+                    f"同步服务不可用，{self.sync_client.pending} 个修改将在重新连接后提交", 5000)
+            self._sync_online = False
+            return
+
+        self._sync_online = True
+        if result["groups"] or result["conflicts"]:
+            self.apply_merge_result(result, "已从同步服务获取修改", "本地和其他客户端都被修改，已采用服务端版本")
+
+
+    def import_tasks(self):
+        """从CSV或JSONL文件导入任务：后台线程流式解析和校验，每块批量写入存储并刷新一次视图"""
+        if self._import_thread is not None:
+            return
+        filename, _ = QFileDialog.getOpenFileName(self, "导入任务", "", "任务数据 (*.csv *.jsonl);;所有文件 (*)")
+        if not filename:
+            return
+
+        self._import_counts = {"added": 0, "updated": 0, "skipped": 0}
+        self._import_command = ImportTasksCommand(f"导入 {os.path.basename(filename)}")
+        self.import_btn.setEnabled(False)
+        self._import_progress = QProgressDialog("正在导入任务...", "取消", 0, 1000, self)
+        self._import_progress.setWindowTitle("导入任务")
+        self._import_progress.setWindowModality(Qt.WindowModal)
+        self._import_progress.setMinimumDuration(0)
+        self._import_progress.setAutoClose(False)
+        self._import_progress.setAutoReset(False)
+
+        self._import_thread = QThread(self)
+        self._import_worker = TaskImportWorker(filename, IMPORT_CHUNK_SIZE)
+        self._import_worker.moveToThread(self._import_thread)
+        self._import_thread.started.connect(self._import_worker.run)
+        self._import_worker.chunkParsed.connect(self.on_import_chunk)
+        self._import_worker.progress.connect(self._import_progress.setValue)
+        self._import_worker.finished.connect(self.on_import_finished)
+        self._import_worker.failed.connect(self.on_import_failed)
+        self._import_progress.canceled.connect(self.cancel_import)
+        self._import_thread.start()
+
+
+    def cancel_import(self):
+        """取消导入（在界面线程中直接设置标志，工作线程读取下一行前停止）"""
+        if self._import_worker is not None:
+            self._import_worker.cancel()
+
+
+    def on_import_chunk(self, tasks):
+        """导入的一块任务到达：一次写入存储，只刷新受影响的分组"""
+        result = self.task_store.import_tasks(tasks)
+        self._import_command.record_chunk(self.task_store, result)
+        for key in ("added", "updated"):
+            self._import_counts[key] += len(result[key])
+        self._import_counts["skipped"] += result["skipped"]
+
+        # 与撤销/重做相同的刷新：重建更新过的分组，其余分组只追加新增的任务
+        self.refresh_after_command(TaskCommand.changes(
+            groups={task["main_task"] for task in result["updated"]}, added=result["added"]))
+        self._import_progress.setLabelText(f"正在导入任务... 已导入 {self._import_counts['added']} 个")
+
+
+    def on_import_finished(self, summary):
+        """导入结束（完成或取消）"""
+        self.stop_import()
+        counts = self._import_counts
+        lines = [f"读取 {summary['rows']} 行：新增 {counts['added']}，更新 {counts['updated']}，"
+                 f"跳过 {counts['skipped']}，无效 {summary['rows'] - summary['valid']}"]
+        if summary["cancelled"]:
+            lines.insert(0, "导入已取消，已导入的任务保留在列表中。")
+        lines.extend(f"第 {line_number} 行: {reason}" for line_number, reason in summary["errors"][:10])
+        if len(summary["errors"]) > 10:
+            lines.append("……")
+        QMessageBox.information(self, "导入任务", "\n".join(lines))
+
+
+    def on_import_failed(self, message):
+        """导入文件无法读取"""
+        self.stop_import()
+        QMessageBox.critical(self, "导入失败", f"读取导入文件时发生错误: {message}")
+
+
+    def stop_import(self):
+        """结束后台导入并恢复界面状态"""
+        self.import_btn.setEnabled(True)
+        if self._import_thread is not None:
+            self._import_worker.cancel()
+            self._import_thread.quit()
+            self._import_thread.wait()
+            self._import_worker.deleteLater()
+            self._import_thread.deleteLater()
+            self._import_thread = None
+            self._import_worker = None
+        if self._import_progress is not None:
+            self._import_progress.close()
+            self._import_progress.deleteLater()
+            self._import_progress = None
+        # 整个导入（包括取消或出错前已导入的部分）作为一条记录撤销
+        command = self._import_command
+        self._import_command = None
+        if command is not None and (command.added or command.before):
+            self.undo_stack.record(command)
+
+
+    def closeEvent(self, event):
+        """
+        关闭窗口前停止后台加载和导入线程。当前工作区和缓存中切换走的工作区有未保存的修改时
+        一起询问一次是否保存，保存失败时不关闭窗口
+        """
+        modified = [workspace.name for workspace in self.workspace_cache.modified()]
+        # 正在加载时存储中只有部分数据，不能保存
+        loading = self._loading
+        if self.task_store.modified and not loading:
+            modified.insert(0, self.workspace.name)
+        save = False
+        if modified:
+            reply = QMessageBox.question(
+                self, "保存修改",
+                f"以下工作区有未保存的修改：{'、'.join(modified)}\n关闭前是否保存？",
+                QMessageBox.Save | QMessageBox.Discard | QMessageBox.Cancel,
+                QMessageBox.Save
+            )
+            if reply == QMessageBox.Cancel:
+                event.ignore()
+                return
+            save = reply == QMessageBox.Save
+
+        self.stop_loading()
+        self.stop_import()
+        if save:
+            failed = []
+            if self.task_store.modified and not loading:
+                try:
+                    if not self.write_tasks_file():
+                        failed.append(self.workspace.name)
+                except Exception as e:
+                    print(f"保存工作区 {self.workspace.name} 时出错: {e}")
+                    failed.append(self.workspace.name)
+            for workspace in self.workspace_cache.modified():
+                try:
+                    success, _ = workspace.file_sync.save(workspace.task_store)
+                except Exception as e:
+                    print(f"保存工作区 {workspace.name} 时出错: {e}")
+                    success = False
+                if success:
+                    workspace.task_store.mark_saved()
+                else:
+                    failed.append(workspace.name)
+            if failed:
+                QMessageBox.critical(self, "保存失败", f"保存工作区 {'、'.join(failed)} 时发生错误，窗口未关闭")
+                event.ignore()
+                return
+        super().closeEvent(event)
 
 
     def delete_task(self, task):
         """删除指定任务"""
-        # 确认删除
+        self.delete_tasks([task["id"]])
+
+
+    def delete_tasks(self, task_ids):
+        """确认一次后删除一批任务（可撤销）"""
+        task_ids = [task_id for task_id in task_ids if self.task_store.get(task_id) is not None]
+        if not task_ids:
+            return
+
+        if len(task_ids) == 1:
+            task = self.task_store.get(task_ids[0])
+            question = f"确定要删除任务 '{task['main_task']} - {task['sub_task']}' 吗？"
+        else:
+            question = f"确定要删除选中的 {len(task_ids)} 个任务吗？"
         reply = QMessageBox.question(
             self,
             "确认删除",
-            f"确定要删除任务 '{task['main_task']} - {task['sub_task']}' 吗？",
+            question + "\n删除后可以点击“撤销”恢复。",
             QMessageBox.Yes | QMessageBox.No,
             QMessageBox.No
         )
-
         if reply == QMessageBox.Yes:
-            # 从任务列表中移除
-            self.tasks.remove(task)
-            # 更新显示
+            self.run_command(RemoveTasksCommand(f"删除 {len(task_ids)} 个任务", task_ids))
+
+
+    def on_task_clicked(self, task_id, extend):
+        """在列表视图或卡片视图中点击任务：只选中该任务，按住Ctrl/Shift时切换该任务的选中状态"""
+        if extend:
+            selection = self.selected_ids ^ {task_id}
+        elif self.selected_ids == {task_id}:
+            selection = set()
+        else:
+            selection = {task_id}
+        self.set_selection(selection)
+
+
+    def set_selection(self, task_ids):
+        """设置选中的任务，只更新选中状态变化的控件"""
+        task_ids = {task_id for task_id in task_ids if self.task_store.get(task_id) is not None}
+        changed = self.selected_ids ^ task_ids
+        self.selected_ids = task_ids
+        for task_id in changed:
+            sub_frame = self.task_frame(task_id)
+            if sub_frame is not None:
+                sub_frame.setStyleSheet(TASK_FRAME_SELECTED_STYLE if task_id in task_ids else TASK_FRAME_STYLE)
+        self.task_card_display.set_selection(task_ids)
+        self.update_selection_bar()
+
+
+    def task_frame(self, task_id):
+        """列表视图中任务的控件，任务未显示时返回None"""
+        task = self.task_store.get(task_id)
+        main_frame = self._group_frames.get(task["main_task"]) if task is not None else None
+        return main_frame.task_frames.get(task_id) if main_frame is not None else None
+
+
+    def select_all_tasks(self):
+        """选中当前显示的所有任务"""
+        self.set_selection(task["id"] for task in self.filtered_tasks)
+
+
+    def clear_selection(self):
+        self.set_selection(())
+
+
+    def bulk_set_completed(self, completed):
+        """将选中的任务标记为已完成或未完成"""
+        fields = {"completed": completed}
+        text = f"{'完成' if completed else '取消完成'} {len(self.selected_ids)} 个任务"
+        self.run_command(UpdateTasksCommand(text, {task_id: fields for task_id in self.selected_ids}))
+
+
+    def bulk_change_type(self):
+        """修改选中任务的任务类型"""
+        types = [self.main_task_type_combo.itemText(i) for i in range(self.main_task_type_combo.count())]
+        types += [task_type for task_type in self.task_store.type_stats if task_type and task_type not in types]
+        task_type, ok = QInputDialog.getItem(self, "修改类型", "任务类型:", types, 0, True)
+        task_type = task_type.strip()
+        if not ok or not task_type:
+            return
+
+        fields = {"main_task_type": task_type}
+        text = f"将 {len(self.selected_ids)} 个任务的类型改为 {task_type}"
+        self.run_command(UpdateTasksCommand(text, {task_id: fields for task_id in self.selected_ids}))
+
+
+    def bulk_move_to_group(self):
+        """将选中的任务移动到另一个总标题下（排在该分组末尾）"""
+        main_task, ok = QInputDialog.getItem(self, "移动到分组", "目标总标题（可输入新的总标题）:",
+                                             list(self.task_store.groups), 0, True)
+        main_task = main_task.strip()
+        if not ok or not main_task:
+            return
+        text = f"将 {len(self.selected_ids)} 个任务移动到 {main_task}"
+        self.run_command(RegroupTasksCommand(text, self.selected_ids, main_task))
+
+
+    def bulk_delete(self):
+        """删除选中的任务"""
+        self.delete_tasks(self.selected_ids)
+
+
+    def run_command(self, command, error_title="无法执行"):
+        """执行可撤销的命令：一次存储事务，之后由 on_history_changed 只刷新一次视图"""
+        try:
+            self.undo_stack.push(command)
+        except ValueError as e:
+            QMessageBox.warning(self, error_title, str(e))
+
+
+    def undo_last(self):
+        """撤销最近的修改（Ctrl+Z）"""
+        try:
+            self.undo_stack.undo()
+        except ValueError as e:
+            QMessageBox.warning(self, "无法撤销", f"{e}\n该修改已与外部修改冲突，已从撤销记录中移除。")
+
+
+    def redo_last(self):
+        """重做最近撤销的修改（Ctrl+Shift+Z / Ctrl+Y）"""
+        try:
+            self.undo_stack.redo()
+        except ValueError as e:
+            QMessageBox.warning(self, "无法重做", f"{e}\n该修改已与外部修改冲突，已从重做记录中移除。")
+
+
+    def on_history_changed(self, action, command, changes):
+        """执行、撤销或重做命令后刷新视图和撤销/重做按钮"""
+        if changes is not None:
+            self.refresh_after_command(changes)
+        else:
+            self.update_selection_bar()
+        if action == "do":
+            self.statusBar().showMessage(command.text, 3000)
+        elif action in ("undo", "redo"):
+            self.statusBar().showMessage(f"{'已撤销' if action == 'undo' else '已重做'}: {command.text}", 3000)
+
+
+    def refresh_after_command(self, changes):
+        """命令执行或撤销后刷新视图：删除的任务只移除其控件，其余受影响的分组整体重建"""
+        if changes["removed"]:
+            removed_ids = {task["id"] for task in changes["removed"]}
+            self.filtered_tasks = [task for task in self.filtered_tasks if task["id"] not in removed_ids]
+            self.remove_from_task_display(changes["removed"])
+        added = changes["added"]
+        if changes["groups"]:
+            # 修改后的任务可能不再符合筛选条件
             self.update_filtered_tasks()
-            self.update_task_display()
+            self.update_task_groups(changes["groups"])
+            # 重建的分组中已包含新增的任务
+            added = [task for task in added if task["main_task"] not in changes["groups"]]
+            self.add_to_task_display(self.apply_filters(added))
+        elif added:
+            filtered = self.apply_filters(added)
+            self.filtered_tasks.extend(filtered)
+            self.add_to_task_display(filtered)
+        card_state = self.card_state()
+        if (not changes["groups"] and not changes["added"] and not changes["removed"] and
+                self._card_state is not None and self._card_state[1:] == card_state[1:]):
+            # 只修改了完成状态等原地更新的字段，卡片页面已由 sync_tasks 同步，不重新生成
+            self._card_state = card_state
+        else:
             self.update_card_display()
-            QMessageBox.information(self, "删除成功", "任务已成功删除")
+        self.set_selection(self.selected_ids)
+
+
+    def clear_task_display(self):
+        """清空列表视图中的所有控件"""
+        while self.task_layout.count():
+            item = self.task_layout.takeAt(0)
+            if item.widget():
+                item.widget().deleteLater()
+        self._group_frames = {}
+        self._task_checkboxes = {}
+        self._subtask_widgets = {}
+        self._blocked_labels = {}
 
 
+    @timed("list_rebuild", items=lambda args, result: len(args[0].filtered_tasks))
     def update_task_display(self):
         """更新任务显示区域"""
         # 清空现有内容
-        for i in reversed(range(self.task_layout.count())):
-            widget = self.task_layout.itemAt(i).widget()
-            if widget:
-                widget.deleteLater()
+        self.clear_task_display()
 
         # 如果没有任务，显示提示信息
         if not self.filtered_tasks:
-            no_tasks_label = QLabel("没有任务可显示")
+            no_tasks_label = QLabel("正在加载任务..." if self._loading else "没有任务可显示")
             no_tasks_label.setAlignment(Qt.AlignCenter)
             no_tasks_label.setStyleSheet("color: #7f8c8d; font-size: 16px; padding: 20px;")
             self.task_layout.addWidget(no_tasks_label)
             self.task_layout.addStretch()
             return
 
-        # 按主任务分组显示
-        task_groups = {}
-
-        for task in self.filtered_tasks:
-            main_task = task["main_task"]
-            if main_task not in task_groups:
-                task_groups[main_task] = []
-            task_groups[main_task].append(task)
+        # 按主任务分组显示，分组内已按存储维护的顺序排列
+        task_groups = self.task_store.grouped_tasks(self.filtered_tasks)
 
         # 为每个主任务创建一个分组
         for main_task, tasks in task_groups.items():
-            # 获取第一个任务的类型作为主任务类型
-            main_task_type = tasks[0]["main_task_type"]
-
-            # 创建主任务框架
-            main_frame = QFrame()
-            main_frame.setFrameShape(QFrame.Shape.StyledPanel)
-            main_frame.setStyleSheet("""
-                background-color: #f5f7fa; 
-                padding: 12px; 
-                margin: 6px;
-                border-radius: 8px;
-                border: 1px solid #e0e6ed;
-            """)
-            main_layout = QVBoxLayout(main_frame)
-            main_layout.setSpacing(10)
-
-            # 主任务标题
-            title_label = QLabel(
-                f"<h3 style='color: #2c3e50;'>{main_task} <small style='color: #7f8c8d;'>({main_task_type})</small></h3>")
-            main_layout.addWidget(title_label)
-
-            # 按分支序号排序子任务
-            sorted_tasks = sorted(tasks, key=lambda x: x["branch_number"])
-
-            # 添加子任务
-            for task in sorted_tasks:
-                sub_frame = QFrame()
-                sub_frame.setFrameShape(QFrame.Shape.StyledPanel)
-                sub_frame.setStyleSheet("""
-                    background-color: white; 
-                    padding: 10px; 
-                    margin: 4px;
-                    border-radius: 6px;
-                    border: 1px solid #eaeef2;
-                """)
-                sub_layout = QVBoxLayout(sub_frame)
-                sub_layout.setSpacing(8)
-
-                # 子任务标题和完成状态
-                task_header = QHBoxLayout()
-
-                # 复选框
-                complete_checkbox = CustomCheckBox()
-                complete_checkbox.setChecked(task["completed"])
-                complete_checkbox.stateChanged.connect(lambda state, t=task: self.toggle_task_complete(t, state))
-                task_header.addWidget(complete_checkbox)
-
-                # 显示子任务标题
-                sub_task_title = QLabel(
-                    f"<span style='font-size: 14px; font-weight: bold; color: #34495e;'>{task['sub_task']}</span>")
-                task_header.addWidget(sub_task_title)
-
-                # 分支序号标签
-                branch_label = QLabel(
-                    f"<span style='font-size: 12px; color: white; background-color: #4a86e8; padding: 2px 6px; border-radius: 10px;'>分支 {task['branch_number']}</span>")
-                task_header.addWidget(branch_label)
-
-                task_header.addStretch()
-
-                # 显示预计时间
-                hours = int(task["estimated_time"])
-                minutes = int((task["estimated_time"] - hours) * 60)
-                time_str = ""
-                if hours > 0:
-                    time_str += f"{hours}小时"
-                if minutes > 0 or hours == 0:
-                    time_str += f"{minutes}分钟"
-
-                time_label = QLabel(f"<span style='color: #7f8c8d;'>预计: {time_str}</span>")
-                task_header.addWidget(time_label)
-
-                # 删除按钮
-                delete_btn = QPushButton("删除")
-                delete_btn.setStyleSheet("""
-                    background-color: #e74c3c;
-                    color: white;
-                    border: none;
-                    border-radius: 3px;
-                    padding: 3px 8px;
-                    font-size: 12px;
-                    max-height: 24px;
-                """)
-                delete_btn.clicked.connect(lambda checked, t=task: self.delete_task(t))
-                task_header.addWidget(delete_btn)
+            main_frame = self.create_group_frame(main_task, tasks)
+            self._group_frames[main_task] = main_frame
+            self.task_layout.addWidget(main_frame)
 
-                sub_layout.addLayout(task_header)
+        # 添加弹性空间
+        self.task_layout.addStretch()
 
-                # 任务详情
-                if task["details"]:
-                    details_frame = QFrame()
-                    details_frame.setStyleSheet("""
-                        background-color: #f8f9fa;
-                        border-radius: 4px;
-                        padding: 8px;
-                        margin-left: 25px;
-                    """)
-                    details_layout = QVBoxLayout(details_frame)
-                    details_layout.setContentsMargins(10, 8, 10, 8)
-
-                    details_label = QLabel(task["details"])
-                    details_label.setWordWrap(True)
-                    details_label.setStyleSheet("color: #5d6d7e;")
-                    details_layout.addWidget(details_label)
-
-                    sub_layout.addWidget(details_frame)
-
-                # 子任务列表
-                if task["sub_task_tasks"] and len(task["sub_task_tasks"]) > 0:
-                    subtasks_frame = QFrame()
-                    subtasks_frame.setStyleSheet("""
-                        background-color: #f8f9fa;
-                        border-radius: 4px;
-                        padding: 8px;
-                        margin-left: 25px;
-                    """)
-                    subtasks_layout = QVBoxLayout(subtasks_frame)
-                    subtasks_layout.setContentsMargins(10, 8, 10, 8)
 
-                    subtasks_label = QLabel("<b>子任务:</b>")
-                    subtasks_layout.addWidget(subtasks_label)
+    @timed("list_rebuild")
+    def update_task_groups(self, main_tasks):
+        """
+        只重建列表视图中指定的分组，其余分组的控件保持不变
 
-                    # 显示子任务
-                    if isinstance(task["sub_task_tasks"], dict):
-                        for sub_task_name, completed in task["sub_task_tasks"].items():
-                            subtask_layout = QHBoxLayout()
+        参数:
+            main_tasks (iterable): 需要重建的总标题
+        """
+        # 当前显示的是提示信息时直接整体重建
+        if not self._group_frames:
+            self.update_task_display()
+            return
 
-                            # 子任务复选框
-                            subtask_checkbox = CustomCheckBox()
-                            subtask_checkbox.setChecked(completed)
-                            subtask_checkbox.stateChanged.connect(
-                                lambda state, t=task, stn=sub_task_name: self.toggle_subtask_complete(t, stn, state)
-                            )
-                            subtask_layout.addWidget(subtask_checkbox)
+        for main_task in main_tasks:
+            old_frame = self._group_frames.pop(main_task, None)
+            if old_frame is not None:
+                for task_id in old_frame.task_frames:
+                    self._task_checkboxes.pop(task_id, None)
+                    self._subtask_widgets.pop(task_id, None)
+                    self._blocked_labels.pop(task_id, None)
+
+            group = self.task_store.groups.get(main_task)
+            tasks = []
+            if group is not None:
+                tasks = self.apply_filters([self.task_store.get(entry["id"]) for entry in group["tasks"]])
+
+            if tasks:
+                main_frame = self.create_group_frame(main_task, tasks)
+                self._group_frames[main_task] = main_frame
+                if old_frame is not None:
+                    self.task_layout.replaceWidget(old_frame, main_frame)
+                else:
+                    # 新分组插入到末尾的弹性空间之前
+                    self.task_layout.insertWidget(self.task_layout.count() - 1, main_frame)
+            elif old_frame is not None:
+                self.task_layout.removeWidget(old_frame)
+
+            if old_frame is not None:
+                old_frame.deleteLater()
+
+        if not self._group_frames:
+            self.update_task_display()
 
-                            # 子任务名称
-                            subtask_name_label = QLabel(sub_task_name)
-                            if completed:
-                                subtask_name_label.setStyleSheet("text-decoration: line-through; color: #95a5a6;")
-                            subtask_layout.addWidget(subtask_name_label)
 
-                            subtask_layout.addStretch()
+    @timed("list_rebuild", items=lambda args, result: len(args[1]))
+    def add_to_task_display(self, tasks):
+        """
+        将新增的任务插入列表视图：已有分组中插入单个任务控件，新分组追加到末尾
 
-                            subtasks_layout.addLayout(subtask_layout)
-                    elif isinstance(task["sub_task_tasks"], list):
-                        for sub_task_name in task["sub_task_tasks"]:
-                            subtask_layout = QHBoxLayout()
+        参数:
+            tasks (list): 已通过筛选的新增任务
+        """
+        if not tasks:
+            return
+        # 当前显示的是提示信息时直接整体重建
+        if not self._group_frames:
+            self.update_task_display()
+            return
 
-                            # 子任务复选框
-                            subtask_checkbox = CustomCheckBox()
-                            subtask_checkbox.stateChanged.connect(
-                                lambda state, t=task, stn=sub_task_name: self.toggle_subtask_complete(t, stn, state)
-                            )
-                            subtask_layout.addWidget(subtask_checkbox)
+        task_groups = {}
+        for task in tasks:
+            task_groups.setdefault(task["main_task"], []).append(task)
 
-                            # 子任务名称
-                            subtask_name_label = QLabel(sub_task_name)
-                            subtask_layout.addWidget(subtask_name_label)
+        for main_task, group_tasks in task_groups.items():
+            main_frame = self._group_frames.get(main_task)
+            if main_frame is not None:
+                self.add_task_frames(main_frame, group_tasks)
+            else:
+                main_frame = self.create_group_frame(main_task, group_tasks)
+                self._group_frames[main_task] = main_frame
+                # 新分组插入到末尾的弹性空间之前
+                self.task_layout.insertWidget(self.task_layout.count() - 1, main_frame)
+
+
+    def remove_from_task_display(self, tasks):
+        """
+        从列表视图中删除任务控件，分组为空时删除整个分组
+
+        参数:
+            tasks (list): 已删除的任务
+        """
+        for task in tasks:
+            main_frame = self._group_frames.get(task["main_task"])
+            if main_frame is None:
+                continue
+            self.remove_task_frame(main_frame, task)
+            if not main_frame.task_frames:
+                del self._group_frames[task["main_task"]]
+                self.task_layout.removeWidget(main_frame)
+                main_frame.deleteLater()
+
+        if not self._group_frames:
+            self.update_task_display()
 
-                            subtask_layout.addStretch()
 
-                            subtasks_layout.addLayout(subtask_layout)
+    def create_group_frame(self, main_task, tasks):
+        """创建列表视图中一个主任务分组的控件"""
 
-                    sub_layout.addWidget(subtasks_frame)
+        # 获取第一个任务的类型作为主任务类型
+        main_task_type = tasks[0]["main_task_type"]
 
-                main_layout.addWidget(sub_frame)
+        # 创建主任务框架
+        main_frame = QFrame()
+        main_frame.setFrameShape(QFrame.Shape.StyledPanel)
+        main_frame.setStyleSheet("""
+            background-color: #f5f7fa; 
+            padding: 12px; 
+            margin: 6px;
+            border-radius: 8px;
+            border: 1px solid #e0e6ed;
+        """)
+        main_layout = QVBoxLayout(main_frame)
+        main_layout.setSpacing(10)
 
-            self.task_layout.addWidget(main_frame)
+        # 主任务标题和分组统计
+        title_layout = QHBoxLayout()
+        title_label = QLabel(
+            f"<h3 style='color: #2c3e50;'>{main_task} <small style='color: #7f8c8d;'>({main_task_type})</small></h3>")
+        title_layout.addWidget(title_label)
+        title_layout.addStretch()
+        main_frame.stats_label = QLabel()
+        main_frame.stats_label.setStyleSheet("color: #7f8c8d; border: none;")
+        title_layout.addWidget(main_frame.stats_label)
+        main_layout.addLayout(title_layout)
+
+        # 分组中每个任务的控件和分支序号（与显示顺序一致），用于增量插入和删除
+        main_frame.task_frames = {}
+        main_frame.branch_numbers = []
+        self.add_task_frames(main_frame, tasks)
+        self.update_group_header(main_task, main_frame)
+
+        return main_frame
+
+    def update_group_header(self, main_task, main_frame=None):
+        """用存储中增量维护的分组统计刷新分组标题右侧的统计文本"""
+        main_frame = main_frame or self._group_frames.get(main_task)
+        stats = self.task_store.group_stats.get(main_task)
+        if main_frame is None or stats is None:
+            return
+
+        text = TaskDisplayPanel.format_stats(stats)
+        main_frame.stats_label.setText(
+            f"已完成 {text['completed']} · 剩余 {text['remaining']} · 加权完成 {text['progress']}")
 
-        # 添加弹性空间
-        self.task_layout.addStretch()
 
+    def add_task_frames(self, main_frame, tasks):
+        """按分支序号将任务控件插入到已有的分组中"""
+        main_layout = main_frame.layout()
+
+        # 添加子任务，按分支序号二分查找插入位置，不需要预先排序
+        for task in tasks:
+            sub_frame = self.create_task_frame(task)
+            position = bisect.bisect_right(main_frame.branch_numbers, task["branch_number"])
+            main_frame.branch_numbers.insert(position, task["branch_number"])
+            main_frame.task_frames[task["id"]] = sub_frame
+            # 第一项是分组标题
+            main_layout.insertWidget(position + 1, sub_frame)
+
+
+    def remove_task_frame(self, main_frame, task):
+        """从分组中删除一个任务的控件"""
+        sub_frame = main_frame.task_frames.pop(task["id"], None)
+        if sub_frame is None:
+            return
+
+        main_layout = main_frame.layout()
+        main_frame.branch_numbers.pop(main_layout.indexOf(sub_frame) - 1)
+        main_layout.removeWidget(sub_frame)
+        sub_frame.deleteLater()
+        self._task_checkboxes.pop(task["id"], None)
+        self._subtask_widgets.pop(task["id"], None)
+        self._blocked_labels.pop(task["id"], None)
+
+
+    def create_task_frame(self, task):
+        """创建列表视图中单个任务的控件"""
+        sub_frame = TaskFrame()
+        sub_frame.setFrameShape(QFrame.Shape.StyledPanel)
+        sub_frame.setStyleSheet(TASK_FRAME_SELECTED_STYLE if task["id"] in self.selected_ids else TASK_FRAME_STYLE)
+        sub_frame.clicked.connect(lambda extend, t=task: self.on_task_clicked(t["id"], extend))
+        sub_layout = QVBoxLayout(sub_frame)
+        sub_layout.setSpacing(8)
+
+        # 右键菜单：调整分支顺序
+        sub_frame.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        sub_frame.customContextMenuRequested.connect(
+            lambda pos, t=task, f=sub_frame: self.show_task_menu(t, f.mapToGlobal(pos)))
+
+        # 子任务标题和完成状态
+        task_header = QHBoxLayout()
+
+        # 复选框
+        complete_checkbox = CustomCheckBox()
+        complete_checkbox.setChecked(task["completed"])
+        complete_checkbox.stateChanged.connect(lambda state, t=task: self.toggle_task_complete(t, state))
+        task_header.addWidget(complete_checkbox)
+        self._task_checkboxes[task["id"]] = complete_checkbox
+
+        # 显示子任务标题
+        sub_task_title = QLabel(
+            f"<span style='font-size: 14px; font-weight: bold; color: #34495e;'>{task['sub_task']}</span>")
+        task_header.addWidget(sub_task_title)
+
+        # 分支序号标签
+        branch_label = QLabel(
+            f"<span style='font-size: 12px; color: white; background-color: #4a86e8; padding: 2px 6px; border-radius: 10px;'>分支 {task['branch_number']}</span>")
+        task_header.addWidget(branch_label)
+
+        # 前置任务未完成时显示
+        blocked_label = QLabel(
+            "<span style='font-size: 12px; color: white; background-color: #e67e22; padding: 2px 6px; border-radius: 10px;'>等待前置任务</span>")
+        task_header.addWidget(blocked_label)
+        self._blocked_labels[task["id"]] = blocked_label
+
+        task_header.addStretch()
+
+        # 显示预计时间
+        hours = int(task["estimated_time"])
+        minutes = int((task["estimated_time"] - hours) * 60)
+        time_str = ""
+        if hours > 0:
+            time_str += f"{hours}小时"
+        if minutes > 0 or hours == 0:
+            time_str += f"{minutes}分钟"
+
+        time_label = QLabel(f"<span style='color: #7f8c8d;'>预计: {time_str}</span>")
+        task_header.addWidget(time_label)
+
+        # 删除按钮
+        delete_btn = QPushButton("删除")
+        delete_btn.setStyleSheet("""
+            background-color: #e74c3c;
+            color: white;
+            border: none;
+            border-radius: 3px;
+            padding: 3px 8px;
+            font-size: 12px;
+            max-height: 24px;
+        """)
+        delete_btn.clicked.connect(lambda checked, t=task: self.delete_task(t))
+
+        # 依赖按钮
+        dependency_btn = QPushButton("依赖")
+        dependency_btn.setStyleSheet("""
+            background-color: #95a5a6;
+            color: white;
+            border: none;
+            border-radius: 3px;
+            padding: 3px 8px;
+            font-size: 12px;
+            max-height: 24px;
+        """)
+        dependency_btn.clicked.connect(lambda checked, t=task: self.edit_dependencies(t))
+        task_header.addWidget(dependency_btn)
+        task_header.addWidget(delete_btn)
+
+        sub_layout.addLayout(task_header)
+        self.update_ready_badge(task["id"])
+
+        # 任务详情，较长的细节描述（不在任务对象中）点击后才读取
+        if "details" not in task or task["details"]:
+            details_frame = QFrame()
+            details_frame.setStyleSheet("""
+                background-color: #f8f9fa;
+                border-radius: 4px;
+                padding: 8px;
+                margin-left: 25px;
+            """)
+            details_layout = QVBoxLayout(details_frame)
+            details_layout.setContentsMargins(10, 8, 10, 8)
+
+            if "details" in task:
+                details_label = QLabel(task["details"])
+                details_label.setWordWrap(True)
+                details_label.setStyleSheet("color: #5d6d7e;")
+                details_layout.addWidget(details_label)
+            else:
+                details_btn = QPushButton("显示细节描述")
+                details_btn.setStyleSheet("text-align: left; color: #5d6d7e; border: none; background: transparent;")
+                details_btn.clicked.connect(lambda checked, t=task, f=details_frame, b=details_btn:
+                                            self.show_task_details(t, f, b))
+                details_layout.addWidget(details_btn)
+
+            sub_layout.addWidget(details_frame)
+
+        # 子任务列表
+        if task["sub_task_tasks"]:
+            subtasks_frame = QFrame()
+            subtasks_frame.setStyleSheet("""
+                background-color: #f8f9fa;
+                border-radius: 4px;
+                padding: 8px;
+                margin-left: 25px;
+            """)
+            subtasks_layout = QVBoxLayout(subtasks_frame)
+            subtasks_layout.setContentsMargins(10, 8, 10, 8)
+
+            subtasks_label = QLabel("<b>子任务:</b>")
+            subtasks_layout.addWidget(subtasks_label)
+
+            # 显示子任务
+            for sub_task_name, completed in task["sub_task_tasks"].items():
+                subtask_layout = QHBoxLayout()
+
+                # 子任务复选框
+                subtask_checkbox = CustomCheckBox()
+                subtask_checkbox.setChecked(completed)
+                subtask_checkbox.stateChanged.connect(
+                    lambda state, t=task, stn=sub_task_name: self.toggle_subtask_complete(t, stn, state)
+                )
+                subtask_layout.addWidget(subtask_checkbox)
+
+                # 子任务名称
+                subtask_name_label = QLabel(sub_task_name)
+                if completed:
+                    subtask_name_label.setStyleSheet("text-decoration: line-through; color: #95a5a6;")
+                subtask_layout.addWidget(subtask_name_label)
+                self._subtask_widgets.setdefault(task["id"], {})[sub_task_name] = (subtask_checkbox, subtask_name_label)
+
+                subtask_layout.addStretch()
+
+                subtasks_layout.addLayout(subtask_layout)
+
+            sub_layout.addWidget(subtasks_frame)
+
+        return sub_frame
+
+
+    def show_task_details(self, task, details_frame, details_btn):
+        """读取移出任务对象的细节描述并替换“显示细节描述”按钮"""
+        details_label = QLabel(self.task_store.details(task))
+        details_label.setWordWrap(True)
+        details_label.setStyleSheet("color: #5d6d7e;")
+        details_frame.layout().replaceWidget(details_btn, details_label)
+        details_btn.deleteLater()
+
+
+    def show_task_menu(self, task, global_pos):
+        """任务的右键菜单：上移、下移和修改分支序号"""
+        menu = QMenu(self)
+        move_up_action = menu.addAction("上移")
+        move_down_action = menu.addAction("下移")
+        renumber_action = menu.addAction("修改分支序号...")
+        action = menu.exec(global_pos)
+
+        if action == renumber_action:
+            branch_number, ok = QInputDialog.getInt(self, "修改分支序号", "分支序号:",
+                                                    task["branch_number"], 1, 100000)
+            if not ok:
+                return
+            command = MoveTaskCommand(f"修改分支序号 {task['sub_task']}", task["id"], branch_number=branch_number)
+        elif action in (move_up_action, move_down_action):
+            index = self.task_store.dependencies.chain_index(task["id"])
+            index = index - 1 if action == move_up_action else index + 1
+            command = MoveTaskCommand(f"{action.text()} {task['sub_task']}", task["id"], index)
+        else:
+            return
+        self.run_command(command, "无法调整顺序")
+
+    def update_ready_badge(self, task_id):
+        """根据依赖图显示或隐藏任务的“等待前置任务”标签"""
+        blocked_label = self._blocked_labels.get(task_id)
+        if blocked_label is None or task_id not in self.task_store.dependencies:
+            return
+
+        task = self.task_store.get(task_id)
+        unmet = self.task_store.dependencies.unmet_prerequisites(task_id)
+        blocked_label.setVisible(bool(unmet) and not task["completed"])
+        blocked_label.setToolTip("\n".join(self.describe_task(self.task_store.get(p)) for p in unmet))
+
+    def describe_task(self, task):
+        """任务的简短描述，用于选择列表和提示"""
+        return f"{task['main_task']} / 分支 {task['branch_number']} {task['sub_task']}"
+
+    def edit_dependencies(self, task):
+        """添加或移除任务的前置任务"""
+        prerequisites = self.task_store.dependencies.prerequisites(task["id"])
+        action = "添加前置任务"
+        if prerequisites:
+            action, ok = QInputDialog.getItem(self, "前置任务", "选择操作:",
+                                              ["添加前置任务", "移除前置任务"], 0, False)
+            if not ok:
+                return
+
+        if action == "添加前置任务":
+            choices = [t for t in self.tasks if t["id"] != task["id"] and t["id"] not in prerequisites]
+        else:
+            choices = [self.task_store.get(task_id) for task_id in prerequisites]
+        if not choices:
+            QMessageBox.information(self, "前置任务", "没有可选择的任务")
+            return
+
+        labels = [self.describe_task(t) for t in choices]
+        label, ok = QInputDialog.getItem(self, action, "选择任务:", labels, 0, False)
+        if not ok:
+            return
+
+        chosen = choices[labels.index(label)]
+        command = DependencyCommand(f"{action} {chosen['sub_task']}", task["id"], chosen["id"],
+                                    add=action == "添加前置任务")
+        self.run_command(command, "无法添加依赖")
 
     def toggle_subtask_complete(self, task, sub_task_name, state):
         """切换子任务完成状态"""
         is_completed = (state == Qt.CheckState.Checked.value)
 
-        # 更新数据模型
-        if isinstance(task["sub_task_tasks"], dict):
-            task["sub_task_tasks"][sub_task_name] = is_completed
-        elif isinstance(task["sub_task_tasks"], list):
-            # 如果是列表，转换为字典
-            sub_tasks_dict = {}
-            for st in task["sub_task_tasks"]:
-                sub_tasks_dict[st] = False
-            sub_tasks_dict[sub_task_name] = is_completed
-            task["sub_task_tasks"] = sub_tasks_dict
-
-        # 更新视图
-        self.update_task_display()
-        self.update_card_display()
+        # 作为可撤销的命令写入共享存储，两个视图通过存储的变更通知只更新对应的控件
+        self.run_command(UpdateTasksCommand.subtask_completion(task, sub_task_name, is_completed))
 
 if __name__ == "__main__":
+    # QtWebEngine在QApplication创建之后才导入，需要提前开启OpenGL上下文共享
+    QApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
     app = QApplication(sys.argv)
     window = TaskListApp()
     window.show()
@@ -0,0 +1,184 @@
+import ast
+import bisect
+import json
+import os
+import time
+import tracemalloc
+
+# 追踪内存分配时保留的调用栈深度
+TRACEBACK_DEPTH = 25
+
+# 源文件 -> (函数名到子系统的映射, 文件内其他代码的默认子系统)
+# 默认子系统为None时继续沿调用栈向外查找
+SUBSYSTEM_MAP = {
+    "task_store.py": ({}, "task_store"),
+    "task_workers.py": ({}, "task_store"),
+    "task_merge.py": ({}, "task_store"),
+    "task_sync.py": ({}, "task_store"),
+    "task_data_handler.py": ({"backup_tasks_file": "backups"}, "task_store"),
+    "main.py": (dict.fromkeys(["update_task_display", "update_task_groups", "add_to_task_display",
+                               "create_group_frame", "add_task_frames", "create_task_frame",
+                               "remove_from_task_display", "clear_task_display"], "list_view"), None),
+    "task_display.py": (dict.fromkeys(["set_task_data", "refresh_display", "generate_html",
+                                       "get_subject_html", "generate_subject_html"], "card_html"), None),
+}
+SUBSYSTEMS = ["task_store", "list_view", "card_html", "backups", "other"]
+
+
+def read_rss_kb(pid="self"):
+    """读取进程的常驻内存（KB），不支持的平台返回None"""
+    try:
+        with open(f"/proc/{pid}/status", 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class MemoryDiagnostics:
+    """
+    内存诊断模式：在加载、渲染、刷新等时刻拍摄tracemalloc快照，
+    按调用栈把Python内存分配归属到任务存储、列表视图、卡片HTML和备份等子系统，
+    并记录Qt对象数量和进程内存，便于发现长时间运行时的泄漏和回归。
+    """
+
+    def __init__(self):
+        self.checkpoints = []
+        # 源文件绝对路径 -> (函数起始行列表, [(结束行, 子系统)])
+        self._ranges = {}
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        for filename, (functions, default) in SUBSYSTEM_MAP.items():
+            path = os.path.join(base_dir, filename)
+            self._ranges[path] = self._function_ranges(path, functions)
+
+    @staticmethod
+    def _function_ranges(path, functions):
+        """解析源文件，得到需要归属的函数所在的行号范围"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                tree = ast.parse(f.read())
+        except (OSError, SyntaxError):
+            return [], []
+
+        ranges = sorted(
+            (node.lineno, node.end_lineno, functions[node.name])
+            for node in ast.walk(tree)
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name in functions
+        )
+        return [start for start, _, _ in ranges], [(end, subsystem) for _, end, subsystem in ranges]
+
+    @property
+    def enabled(self):
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        """开始追踪内存分配"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEBACK_DEPTH)
+
+    def stop(self):
+        """停止追踪内存分配"""
+        tracemalloc.stop()
+
+    def _attribute(self, traceback):
+        """从最内层的调用开始，找到第一个属于已知子系统的栈帧"""
+        for frame in reversed(traceback):
+            ranges = self._ranges.get(frame.filename)
+            if ranges is None:
+                continue
+
+            starts, ends = ranges
+            index = bisect.bisect_right(starts, frame.lineno) - 1
+            if index >= 0 and frame.lineno <= ends[index][0]:
+                return ends[index][1]
+
+            default = SUBSYSTEM_MAP[os.path.basename(frame.filename)][1]
+            if default is not None:
+                return default
+        return "other"
+
+    def checkpoint(self, label, window=None):
+        """
+        拍摄快照并记录各子系统当前占用的内存
+
+        参数:
+            label (str): 检查点名称，例如 "load"、"list_refresh"、"card_render"
+            window (QWidget): 可选，统计该窗口下的Qt对象数量
+
+        返回:
+            dict: 检查点数据，未开启追踪时返回None
+        """
+        if not tracemalloc.is_tracing():
+            return None
+
+        snapshot = tracemalloc.take_snapshot()
+        subsystems = {name: {"bytes": 0, "blocks": 0} for name in SUBSYSTEMS}
+        for stat in snapshot.statistics("traceback"):
+            subsystem = subsystems[self._attribute(stat.traceback)]
+            subsystem["bytes"] += stat.size
+            subsystem["blocks"] += stat.count
+
+        traced, peak = tracemalloc.get_traced_memory()
+        checkpoint = {
+            "label": label,
+            "time": time.time(),
+            "traced_bytes": traced,
+            "peak_bytes": peak,
+            "rss_kb": read_rss_kb(),
+            "subsystems": subsystems
+        }
+        if window is not None:
+            checkpoint["qt"] = self.qt_object_counts(window)
+
+        # 与上一次同名检查点比较，持续增长的数值提示可能存在泄漏
+        previous = next((cp for cp in reversed(self.checkpoints) if cp["label"] == label), None)
+        if previous is not None:
+            checkpoint["delta_bytes"] = {
+                name: subsystems[name]["bytes"] - previous["subsystems"][name]["bytes"]
+                for name in SUBSYSTEMS
+            }
+
+        self.checkpoints.append(checkpoint)
+        return checkpoint
+
+    @staticmethod
+    def qt_object_counts(window):
+        """统计Qt对象数量和卡片视图渲染进程的内存"""
+        from PySide6.QtCore import QObject
+        from PySide6.QtWidgets import QApplication, QWidget
+
+        counts = {
+            "window_widgets": len(window.findChildren(QWidget)),
+            "window_objects": len(window.findChildren(QObject)),
+            "application_widgets": len(QApplication.allWidgets())
+        }
+
+        web_view = getattr(getattr(window, "task_card_display", None), "web_view", None)
+        if web_view is not None:
+            counts["web_process_rss_kb"] = read_rss_kb(web_view.page().renderProcessPid())
+        return counts
+
+    @staticmethod
+    def format_checkpoint(checkpoint):
+        """将检查点格式化为一行文本"""
+        parts = []
+        for name in SUBSYSTEMS:
+            text = f"{name} {checkpoint['subsystems'][name]['bytes'] / 1024:.0f}KB"
+            delta = checkpoint.get("delta_bytes", {}).get(name)
+            if delta:
+                text += f"({delta / 1024:+.0f})"
+            parts.append(text)
+
+        line = f"[{checkpoint['label']}] " + ", ".join(parts)
+        if checkpoint.get("qt"):
+            line += f", 控件 {checkpoint['qt']['application_widgets']}"
+        if checkpoint.get("rss_kb"):
+            line += f", RSS {checkpoint['rss_kb'] / 1024:.1f}MB"
+        return line
+
+    def export(self, filename):
+        """导出所有检查点为JSON文件"""
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump({"checkpoints": self.checkpoints}, f, ensure_ascii=False, indent=4)
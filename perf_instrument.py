@@ -0,0 +1,145 @@
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# 直方图桶的上界（毫秒），最后一个桶收集所有更慢的调用
+HISTOGRAM_BOUNDS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+# 每个指标保留最近多少次耗时用于计算p95
+RECENT_SAMPLES = 512
+# 最多保留多少条追踪事件
+MAX_TRACE_EVENTS = 100000
+
+
+class PerfRecorder:
+    """
+    热点路径性能记录器，记录调用次数、耗时直方图和处理的条目数，
+    并保留最近的调用事件以导出为Chrome追踪格式（chrome://tracing、Perfetto可直接打开）。
+
+    未启用时被 timed 装饰的函数只多一次属性判断。
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._metrics = {}
+        self._events = deque(maxlen=MAX_TRACE_EVENTS)
+
+    def reset(self):
+        """清空所有记录"""
+        with self._lock:
+            self._origin = time.perf_counter()
+            self._metrics = {}
+            self._events.clear()
+
+    def record(self, name, start, end, items=None):
+        """
+        记录一次调用
+
+        参数:
+            name (str): 指标名称
+            start (float): 开始时间（time.perf_counter）
+            end (float): 结束时间（time.perf_counter）
+            items (int): 本次调用处理的条目数，可为None
+        """
+        duration_ms = (end - start) * 1000
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = {
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "last_ms": 0.0,
+                    "items": 0,
+                    "histogram": [0] * (len(HISTOGRAM_BOUNDS_MS) + 1),
+                    "recent": deque(maxlen=RECENT_SAMPLES)
+                }
+                self._metrics[name] = metric
+
+            metric["count"] += 1
+            metric["total_ms"] += duration_ms
+            metric["last_ms"] = duration_ms
+            if items is not None:
+                metric["items"] += items
+            metric["histogram"][bisect.bisect_left(HISTOGRAM_BOUNDS_MS, duration_ms)] += 1
+            metric["recent"].append(duration_ms)
+
+            event = {
+                "name": name,
+                "ph": "X",
+                "ts": round((start - self._origin) * 1e6, 3),
+                "dur": round(duration_ms * 1000, 3),
+                "pid": os.getpid(),
+                "tid": threading.get_ident()
+            }
+            if items is not None:
+                event["args"] = {"items": items}
+            self._events.append(event)
+
+    def stats(self):
+        """
+        获取所有指标的统计
+
+        返回:
+            dict: 指标名称 -> {"count", "total_ms", "last_ms", "p95_ms", "items", "histogram"}
+        """
+        with self._lock:
+            result = {}
+            for name, metric in self._metrics.items():
+                recent = sorted(metric["recent"])
+                result[name] = {
+                    "count": metric["count"],
+                    "total_ms": metric["total_ms"],
+                    "last_ms": metric["last_ms"],
+                    "p95_ms": recent[min(len(recent) - 1, int(len(recent) * 0.95))],
+                    "items": metric["items"],
+                    "histogram": dict(zip([f"<={bound}ms" for bound in HISTOGRAM_BOUNDS_MS] + ["slower"],
+                                          metric["histogram"]))
+                }
+            return result
+
+    def export_chrome_trace(self, filename):
+        """
+        导出Chrome追踪格式的文件
+
+        参数:
+            filename (str): 文件名
+
+        返回:
+            int: 导出的事件数
+        """
+        with self._lock:
+            events = list(self._events)
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+        return len(events)
+
+
+# 全局记录器，设置环境变量 TASK_PERF=1 时启动即开始记录
+perf = PerfRecorder(enabled=os.environ.get("TASK_PERF") == "1")
+
+
+def timed(name, items=None):
+    """
+    记录函数耗时的装饰器
+
+    参数:
+        name (str): 指标名称
+        items (callable): 可选，items(args, result) 返回本次调用处理的条目数
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not perf.enabled:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            perf.record(name, start, time.perf_counter(), items(args, result) if items else None)
+            return result
+        return wrapper
+    return decorator
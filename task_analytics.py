@@ -0,0 +1,307 @@
+try:
+    import numpy as np
+except ImportError:  # numpy为可选依赖，只有统计报表需要
+    np = None
+
+from perf_instrument import timed
+
+
+class TaskTable:
+    """
+    任务的列式投影：每个字段一个NumPy数组，总标题和任务类型用整数编码，
+    统计报表直接对整列做向量化运算，不需要逐个遍历任务字典。
+
+    绑定任务存储后按变更通知增量更新：新增任务追加到数组末尾（容量按倍数扩展），
+    删除只标记为无效行，无效行过多时再压缩，修改完成状态只改一个元素。
+    """
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        if np is None:
+            raise ImportError("任务统计报表需要安装 numpy")
+
+        self._size = 0
+        self._deleted = 0
+        # 任务id -> 行号
+        self._rows = {}
+        # 总标题、任务类型 -> 编码，以及编码 -> 名称
+        self._group_codes = {}
+        self._type_codes = {}
+        self.group_names = []
+        self.type_names = []
+        self._allocate(max(capacity, 1))
+
+    def _allocate(self, capacity):
+        """分配（或扩展到）指定容量的列数组"""
+        columns = {
+            "id": np.zeros(capacity, dtype=np.int64),
+            "estimated_time": np.zeros(capacity, dtype=np.float64),
+            "weight": np.zeros(capacity, dtype=np.float64),
+            "completed": np.zeros(capacity, dtype=bool),
+            "branch_number": np.zeros(capacity, dtype=np.int64),
+            "group": np.zeros(capacity, dtype=np.int32),
+            "type": np.zeros(capacity, dtype=np.int32),
+            "valid": np.zeros(capacity, dtype=bool)
+        }
+        if self._size:
+            for name, column in columns.items():
+                column[:self._size] = self._columns[name][:self._size]
+        self._columns = columns
+
+    @classmethod
+    def from_tasks(cls, tasks):
+        """由任务列表（TaskDataHandler 加载得到的格式）创建列式表"""
+        table = cls(len(tasks))
+        table.append(tasks)
+        return table
+
+    @classmethod
+    def from_store(cls, task_store):
+        """由任务存储创建列式表，并注册变更回调保持同步"""
+        table = cls.from_tasks(task_store.tasks)
+        task_store.add_listener(table.on_store_changed)
+        return table
+
+    def __len__(self):
+        return self._size - self._deleted
+
+    @staticmethod
+    def _encode(names, codes, values):
+        """将名称编码为整数，新出现的名称分配新的编码"""
+        result = []
+        for value in values:
+            code = codes.get(value)
+            if code is None:
+                code = len(names)
+                codes[value] = code
+                names.append(value)
+            result.append(code)
+        return result
+
+    def append(self, tasks):
+        """在表末尾追加任务"""
+        count = len(tasks)
+        if count == 0:
+            return
+
+        end = self._size + count
+        if end > len(self._columns["id"]):
+            self._allocate(max(end, len(self._columns["id"]) * 2))
+
+        rows = slice(self._size, end)
+        columns = self._columns
+        columns["id"][rows] = [task.get("id") or 0 for task in tasks]
+        columns["estimated_time"][rows] = [task.get("estimated_time", 0) for task in tasks]
+        columns["weight"][rows] = [task.get("weight", 0) for task in tasks]
+        columns["completed"][rows] = [task.get("completed", False) for task in tasks]
+        columns["branch_number"][rows] = [task.get("branch_number", 0) for task in tasks]
+        columns["group"][rows] = self._encode(self.group_names, self._group_codes,
+                                              (task["main_task"] for task in tasks))
+        columns["type"][rows] = self._encode(self.type_names, self._type_codes,
+                                             (task["main_task_type"] for task in tasks))
+        columns["valid"][rows] = True
+
+        for row, task in enumerate(tasks, self._size):
+            if task.get("id") is not None:
+                self._rows[task["id"]] = row
+        self._size = end
+
+    def remove(self, tasks):
+        """将任务所在的行标记为无效，无效行超过一半时压缩"""
+        for task in tasks:
+            row = self._rows.pop(task.get("id"), None)
+            if row is not None:
+                self._columns["valid"][row] = False
+                self._deleted += 1
+
+        if self._deleted > self._size // 2:
+            self.compact()
+
+    def update(self, tasks):
+        """同步任务修改后的字段（总标题和分支序号不会通过修改变化）"""
+        columns = self._columns
+        for task in tasks:
+            row = self._rows.get(task.get("id"))
+            if row is not None:
+                columns["completed"][row] = task.get("completed", False)
+                columns["estimated_time"][row] = task.get("estimated_time", 0)
+                columns["weight"][row] = task.get("weight", 0)
+                columns["type"][row] = self._encode(self.type_names, self._type_codes, [task["main_task_type"]])[0]
+
+    def compact(self):
+        """移除无效行"""
+        valid = self._columns["valid"][:self._size].copy()
+        size = int(valid.sum())
+        for column in self._columns.values():
+            column[:size] = column[:self._size][valid]
+        self._columns["valid"][size:self._size] = False
+        self._size = size
+        self._deleted = 0
+        self._rows = {task_id: row for row, task_id in enumerate(self._columns["id"][:size].tolist()) if task_id}
+
+    def clear(self):
+        """清空所有行（保留已分配的容量）"""
+        self._columns["valid"][:] = False
+        self._size = 0
+        self._deleted = 0
+        self._rows = {}
+        self._group_codes = {}
+        self._type_codes = {}
+        self.group_names = []
+        self.type_names = []
+
+    def on_store_changed(self, event, tasks):
+        """任务存储的变更回调"""
+        if event == "reset":
+            self.clear()
+            self.append(tasks)
+        elif event == "add":
+            self.append(tasks)
+        elif event == "remove":
+            self.remove(tasks)
+        elif event == "update":
+            self.update(tasks)
+        elif event == "move":
+            for task in tasks:
+                row = self._rows.get(task.get("id"))
+                if row is not None:
+                    self._columns["branch_number"][row] = task["branch_number"]
+                    self._columns["group"][row] = self._encode(self.group_names, self._group_codes,
+                                                               [task["main_task"]])[0]
+
+    def columns(self):
+        """
+        获取所有有效行的列
+
+        返回:
+            dict: 字段名 -> NumPy数组。没有删除过任务时是数组视图，不会复制数据
+        """
+        if self._deleted == 0:
+            return {name: column[:self._size] for name, column in self._columns.items() if name != "valid"}
+
+        valid = self._columns["valid"][:self._size]
+        return {name: column[:self._size][valid] for name, column in self._columns.items() if name != "valid"}
+
+
+class TaskAnalytics:
+    """基于列式任务表的统计报表，所有统计都是整列的向量化运算"""
+
+    @staticmethod
+    def completion_by_type(table):
+        """
+        按任务类型统计完成情况
+
+        返回:
+            dict: 任务类型 -> {"count", "completed", "completion_rate", "weighted_completion"}
+        """
+        columns = table.columns()
+        size = len(table.type_names)
+        codes = columns["type"]
+        completed = columns["completed"]
+
+        counts = np.bincount(codes, minlength=size)
+        completed_counts = np.bincount(codes, weights=completed, minlength=size)
+        weights = np.bincount(codes, weights=columns["weight"], minlength=size)
+        completed_weights = np.bincount(codes, weights=columns["weight"] * completed, minlength=size)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rates = np.where(counts > 0, completed_counts / counts, 0.0)
+            weighted = np.where(weights > 0, completed_weights / weights, rates)
+
+        return {
+            name: {
+                "count": int(counts[code]),
+                "completed": int(completed_counts[code]),
+                "completion_rate": float(rates[code]),
+                "weighted_completion": float(weighted[code])
+            }
+            for code, name in enumerate(table.type_names) if counts[code] > 0
+        }
+
+    @staticmethod
+    def workload_by_group(table):
+        """
+        按总标题统计工作量
+
+        返回:
+            dict: 总标题 -> {"count", "hours", "remaining_hours", "weight", "remaining_weight"}
+        """
+        columns = table.columns()
+        size = len(table.group_names)
+        codes = columns["group"]
+        remaining = ~columns["completed"]
+
+        counts = np.bincount(codes, minlength=size)
+        hours = np.bincount(codes, weights=columns["estimated_time"], minlength=size)
+        remaining_hours = np.bincount(codes, weights=columns["estimated_time"] * remaining, minlength=size)
+        weights = np.bincount(codes, weights=columns["weight"], minlength=size)
+        remaining_weights = np.bincount(codes, weights=columns["weight"] * remaining, minlength=size)
+
+        return {
+            name: {
+                "count": int(counts[code]),
+                "hours": round(float(hours[code]), 4),
+                "remaining_hours": round(float(remaining_hours[code]), 4),
+                "weight": float(weights[code]),
+                "remaining_weight": float(remaining_weights[code])
+            }
+            for code, name in enumerate(table.group_names) if counts[code] > 0
+        }
+
+    @staticmethod
+    def weight_time_distribution(table, weight_bins=10, time_bins=10):
+        """
+        权重与预计时间的联合分布
+
+        参数:
+            weight_bins (int): 权重方向的分桶数
+            time_bins (int): 预计时间方向的分桶数
+
+        返回:
+            dict: {"weight_edges", "time_edges", "counts"（权重桶 x 时间桶）,
+                   "correlation", "weight_per_hour"（分位数）}
+        """
+        columns = table.columns()
+        weight = columns["weight"]
+        estimated_time = columns["estimated_time"]
+        if len(weight) == 0:
+            return {"weight_edges": [], "time_edges": [], "counts": [], "correlation": None, "weight_per_hour": {}}
+
+        counts, weight_edges, time_edges = np.histogram2d(weight, estimated_time, bins=(weight_bins, time_bins))
+
+        # 常数列没有相关系数
+        correlation = None
+        if weight.std() > 0 and estimated_time.std() > 0:
+            correlation = float(np.corrcoef(weight, estimated_time)[0, 1])
+
+        # 单位时间的权重，只统计有预计时间的任务
+        timed_rows = estimated_time > 0
+        weight_per_hour = {}
+        if timed_rows.any():
+            quantiles = np.quantile(weight[timed_rows] / estimated_time[timed_rows], [0.25, 0.5, 0.75, 0.95])
+            weight_per_hour = dict(zip(["p25", "p50", "p75", "p95"], (float(q) for q in quantiles)))
+
+        return {
+            "weight_edges": weight_edges.tolist(),
+            "time_edges": time_edges.tolist(),
+            "counts": counts.astype(np.int64).tolist(),
+            "correlation": correlation,
+            "weight_per_hour": weight_per_hour
+        }
+
+    @staticmethod
+    @timed("analytics", items=lambda args, result: len(args[0]))
+    def report(table):
+        """生成完整的统计报表（可直接序列化为JSON）"""
+        columns = table.columns()
+        completed = columns["completed"]
+        return {
+            "tasks": len(table),
+            "completed": int(completed.sum()),
+            "hours": round(float(columns["estimated_time"].sum()), 4),
+            "remaining_hours": round(float(columns["estimated_time"][~completed].sum()), 4),
+            "completion_by_type": TaskAnalytics.completion_by_type(table),
+            "workload_by_group": TaskAnalytics.workload_by_group(table),
+            "weight_time_distribution": TaskAnalytics.weight_time_distribution(table)
+        }
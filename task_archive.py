@@ -0,0 +1,200 @@
+import os
+
+from perf_instrument import timed
+from task_data_handler import TaskDataHandler
+from task_merge import file_signature
+
+
+class TaskArchive:
+    """
+    已完成分组的归档（冷数据层）。
+
+    全部完成的分组从工作集（任务存储和 tasks.json）移到旁边的压缩归档文件中（gzip，紧凑JSON），
+    日常的筛选、搜索、渲染和保存都不再处理这些任务。归档文件的内容与任务文件格式相同，
+    只有在浏览、搜索或恢复归档时才读取并解压，之后缓存在内存中。
+
+    其他任务中指向归档任务的依赖引用保留在 depends_on 中（前置任务已完成，视为已满足），
+    分组恢复后重新连接。
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        # 总标题 -> 分组数据，第一次访问时读取
+        self._groups = None
+        self._tasks = None
+        # 读取或写入归档文件时的文件签名，用于发现其他实例的修改
+        self._signature = None
+        # 已恢复到工作集、但还没有从归档文件中删除的分组
+        self._restored = set()
+
+    @staticmethod
+    def archive_filename(tasks_filename):
+        """任务文件对应的归档文件名，例如 tasks.json -> tasks_archive.json.gz"""
+        return os.path.splitext(tasks_filename)[0] + "_archive.json.gz"
+
+    @staticmethod
+    def completed_groups(task_store):
+        """工作集中所有任务都已完成的分组"""
+        return [main_task for main_task, stats in task_store.group_stats.items()
+                if stats["count"] and stats["completed"] == stats["count"]]
+
+    @staticmethod
+    def shift_branch_numbers(main_task, tasks, offset):
+        """分支序号整体加上 offset，同一分组内的依赖引用一并调整（合并同名分组时使用）"""
+        shifted = []
+        for task in tasks:
+            task = dict(task, branch_number=task["branch_number"] + offset)
+            if task.get("depends_on"):
+                task["depends_on"] = [[ref[0], ref[1] + offset] if ref[0] == main_task else ref
+                                      for ref in task["depends_on"]]
+            shifted.append(task)
+        return shifted
+
+    @property
+    def loaded(self):
+        """归档文件是否已经读取"""
+        return self._groups is not None
+
+    @timed("archive", items=lambda args, result: len(result[1]))
+    def _read(self):
+        signature = file_signature(self.filename)
+        try:
+            text = TaskDataHandler.read_tasks_text(self.filename)
+        except FileNotFoundError:
+            text = "{}"
+        return signature, dict(TaskDataHandler.iter_groups_from_text(text))
+
+    def groups(self):
+        """
+        归档中的分组（总标题 -> 分组数据，与任务文件中的格式相同），第一次调用时读取归档文件
+
+        异常:
+            OSError, ValueError: 归档文件无法读取或格式错误
+        """
+        if self._groups is None:
+            self._signature, self._groups = self._read()
+        return self._groups
+
+    def tasks(self):
+        """归档中的全部任务（不属于任务存储，只用于浏览和查询）"""
+        if self._tasks is None:
+            self._tasks = [task for main_task, group in self.groups().items()
+                           for task in TaskDataHandler.group_to_tasks(main_task, group)]
+        return self._tasks
+
+    def search(self, query, task_type="全部"):
+        """在归档的任务中按类型和关键词搜索，与列表视图的筛选条件相同"""
+        tasks = TaskDataHandler.filter_tasks_by_type(self.tasks(), task_type)
+        return TaskDataHandler.search_tasks(tasks, query)
+
+    @staticmethod
+    def _merge(groups, main_task, tasks):
+        """将任务作为一个分组加入归档，归档中已有同名分组时排在其后，分支序号顺延"""
+        archived = groups.get(main_task)
+        if archived is not None and archived["tasks"]:
+            offset = archived["tasks"][-1]["branch_number"] + 1 - tasks[0]["branch_number"]
+            tasks = TaskArchive.shift_branch_numbers(main_task, tasks, max(offset, 0))
+        group = TaskDataHandler.group_tasks(tasks)[main_task]
+        if archived is not None:
+            group["Types"] = archived["Types"] + [t for t in group["Types"] if t not in archived["Types"]]
+            group["describe"] = archived.get("describe", "")
+            group["tasks"] = archived["tasks"] + group["tasks"]
+            group["sub_task_number"] = len(group["tasks"])
+        groups[main_task] = group
+
+    def _update(self, apply):
+        """
+        加锁修改归档文件：文件在上次读取后被其他实例修改过时先重新读取，
+        再补上本实例已恢复的分组，然后执行 apply(groups) 并原子写入。
+        apply 只能加入或替换分组，不能修改已有的分组对象；写入成功后才更新内存中的缓存
+        """
+        with TaskDataHandler.lock_file(self.filename):
+            if self._groups is None or file_signature(self.filename) != self._signature:
+                _, groups = self._read()
+                for main_task in self._restored:
+                    groups.pop(main_task, None)
+            else:
+                groups = dict(self._groups)
+            apply(groups)
+            fragments = [TaskDataHandler.dump_group(main_task, group, compact=True)
+                         for main_task, group in groups.items()]
+            with TaskDataHandler.atomic_file(self.filename, 'wb') as raw:
+                TaskDataHandler.write_fragments(raw, fragments, "gzip", compact=True)
+            self._signature = file_signature(self.filename)
+            self._groups = groups
+        self._restored = set()
+        self._tasks = None
+
+    def archive(self, task_store, main_tasks):
+        """
+        将工作集中的分组移到归档：先写入归档文件，成功后再从任务存储中删除这些任务。
+        之后应保存任务文件，保存之前分组同时留在两个文件中，不会丢失。
+
+        参数:
+            task_store (TaskStore): 任务存储
+            main_tasks (iterable): 要归档的总标题
+
+        返回:
+            list: 从任务存储中移出的任务
+
+        异常:
+            OSError, ValueError: 归档文件无法读取或写入，此时任务存储没有被修改
+        """
+        moved = {}
+        for main_task in main_tasks:
+            group = task_store.groups.get(main_task)
+            if group is not None:
+                moved[main_task] = [{key: value for key, value in task_store.full_task(task_store.get(entry["id"])).items()
+                                     if key != "id"}
+                                    for entry in group["tasks"]]
+        if not moved:
+            return []
+
+        def apply(groups):
+            for main_task, tasks in moved.items():
+                TaskArchive._merge(groups, main_task, tasks)
+
+        self._update(apply)
+        task_ids = [entry["id"] for main_task in moved for entry in task_store.groups[main_task]["tasks"]]
+        return task_store.remove_tasks(task_ids, keep_references=True)
+
+    def restore(self, task_store, main_tasks):
+        """
+        将归档中的分组恢复到任务存储，工作集中已有同名分组时排在该分组末尾。
+        归档文件在 save 时才删除这些分组：调用方应先保存任务文件，成功后再调用 save，
+        中途退出时分组仍保留在归档中。
+
+        返回:
+            list: 恢复的任务
+        """
+        groups = self.groups()
+        restored = []
+        for main_task in main_tasks:
+            group = groups.pop(main_task, None)
+            if group is None or not group["tasks"]:
+                continue
+            self._restored.add(main_task)
+            tasks = TaskDataHandler.group_to_tasks(main_task, group)
+            if main_task in task_store.groups:
+                offset = task_store.next_branch_number(main_task) - tasks[0]["branch_number"]
+                tasks = self.shift_branch_numbers(main_task, tasks, max(offset, 0))
+            restored.extend(tasks)
+        self._tasks = None
+        if restored:
+            task_store.add_tasks(restored)
+        return restored
+
+    @property
+    def modified(self):
+        """是否有已恢复但尚未从归档文件中删除的分组"""
+        return bool(self._restored)
+
+    def save(self):
+        """
+        从归档文件中删除已恢复的分组
+
+        异常:
+            OSError, ValueError: 归档文件无法读取或写入
+        """
+        if self._restored:
+            self._update(lambda groups: None)
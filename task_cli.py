@@ -0,0 +1,425 @@
+"""
+任务管理系统命令行工具（不依赖PySide6，可在脚本和定时任务中使用）
+
+批量导入、导出、批量修改和查询 tasks.json 中的任务。
+修改后的保存与界面相同：加文件锁，文件被其他实例修改过时先合并再写入。
+
+用法:
+    python task_cli.py import tasks.csv
+    python task_cli.py export - --format jsonl --pending
+    python task_cli.py set completed=true --group "项目A"
+    python task_cli.py edit edits.jsonl
+    python task_cli.py query --type 学习 --ready --format table
+    python task_cli.py query --stats
+    python task_cli.py archive
+    python task_cli.py query --archived --search 报告
+    python task_cli.py restore "项目A"
+    python task_cli.py convert --compress gzip
+    python task_cli.py index archive.taskidx --archived
+    python task_cli.py --workspace 项目B query --count
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+
+from task_archive import TaskArchive
+from task_data_handler import CODECS, RECORD_FIELDS, TaskDataHandler
+from task_index import TaskIndex
+from task_merge import MERGE_FIELDS, TaskFileSync
+from task_store import TaskStore
+from task_workspace import WorkspaceRegistry
+
+# 可以通过 set / edit 修改的字段
+EDITABLE_FIELDS = list(MERGE_FIELDS)
+# 导入时每批写入存储的任务数
+IMPORT_CHUNK_SIZE = 2000
+
+
+def read_records(source, fmt):
+    """逐行读取CSV或JSONL记录（source 为 "-" 时读取标准输入），产生 (行号, 记录或解析异常)"""
+    stream = sys.stdin if source == "-" else open(source, 'r', encoding='utf-8-sig', newline='')
+    try:
+        yield from TaskDataHandler.iter_records(stream, fmt)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def guess_format(path, fmt):
+    return fmt or TaskDataHandler.record_format(path)
+
+
+def select_tasks(task_store, where):
+    """
+    按条件选择任务，分组内按存储维护的顺序
+
+    参数:
+        where (dict): 可包含 main_task、main_task_type、branch_number、completed、search、ready
+    """
+    if where.get("main_task") is not None:
+        group = task_store.groups.get(where["main_task"])
+        tasks = [task_store.get(entry["id"]) for entry in group["tasks"]] if group else []
+    else:
+        tasks = [task for group_tasks in task_store.grouped_tasks().values() for task in group_tasks]
+
+    for field in ("main_task_type", "branch_number", "completed"):
+        if where.get(field) is not None:
+            value = TaskDataHandler.parse_record_field(field, where[field])
+            tasks = [task for task in tasks if task.get(field, False if field == "completed" else None) == value]
+    if where.get("search"):
+        tasks = task_store.search_tasks(tasks, where["search"])
+    if where.get("ready"):
+        ready = task_store.dependencies.ready
+        tasks = [task for task in tasks if task["id"] in ready]
+    return tasks
+
+
+def filters_from_args(args):
+    """命令行筛选参数 -> select_tasks 的条件"""
+    completed = None
+    if args.completed:
+        completed = True
+    elif args.pending:
+        completed = False
+    return {
+        "main_task": args.group,
+        "main_task_type": args.type,
+        "branch_number": args.branch,
+        "completed": completed,
+        "search": args.search,
+        "ready": args.ready
+    }
+
+
+def write_records(tasks, dest, fmt):
+    """逐个写出任务（dest 为 "-" 时写到标准输出），返回写出的任务数"""
+    stream = sys.stdout if dest == "-" else open(dest, 'w', encoding='utf-8', newline='')
+    count = 0
+    try:
+        if fmt == "csv":
+            writer = csv.DictWriter(stream, fieldnames=RECORD_FIELDS)
+            writer.writeheader()
+            for task in tasks:
+                record = TaskDataHandler.task_to_record(task)
+                record["sub_task_tasks"] = json.dumps(record["sub_task_tasks"], ensure_ascii=False)
+                record["depends_on"] = json.dumps(record["depends_on"], ensure_ascii=False)
+                writer.writerow(record)
+                count += 1
+        elif fmt == "table":
+            for task in tasks:
+                minutes = round(task.get("estimated_time", 0) * 60)
+                mark = "x" if task.get("completed", False) else " "
+                stream.write(f"{task['main_task']} #{task['branch_number']} [{mark}] {task['sub_task']}"
+                             f"  ({task['main_task_type']}, {minutes // 60}h{minutes % 60:02d}m, 权重 {task.get('weight', 10)})\n")
+                count += 1
+        else:
+            for task in tasks:
+                stream.write(json.dumps(TaskDataHandler.task_to_record(task), ensure_ascii=False) + "\n")
+                count += 1
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    return count
+
+
+def message(text):
+    """提示信息输出到标准错误，不混入导出的数据"""
+    print(text, file=sys.stderr)
+
+
+def load_store(file_sync):
+    """加载任务文件，文件不存在时从空数据开始"""
+    # 加载时的提示（例如忽略循环依赖）输出到标准错误，不混入导出的数据
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            return TaskStore(file_sync.load())
+        except FileNotFoundError:
+            return TaskStore()
+
+
+def save_store(file_sync, task_store):
+    """有修改时保存，返回是否成功"""
+    if not task_store.modified:
+        return True
+    success, result = file_sync.save(task_store)
+    if result is not None:
+        message(f"已合并其他实例的修改：新增 {result['added']}，删除 {result['removed']}，修改 {result['updated']}")
+        for conflict in result["conflicts"]:
+            message(f"冲突（保留本次修改）: {conflict['main_task']} #{conflict['branch_number']} {conflict['reason']}")
+    if not success:
+        message("保存任务文件失败")
+    return success
+
+
+def command_import(args, file_sync, task_store):
+    """导入任务：已有的 (总标题, 分支序号) 按 --on-existing 处理，缺少分支序号时排在分组末尾"""
+    added = updated = skipped = invalid = 0
+
+    def flush(chunk):
+        nonlocal added, updated, skipped
+        result = task_store.import_tasks(chunk, args.on_existing)
+        added += len(result["added"])
+        updated += len(result["updated"])
+        skipped += result["skipped"]
+
+    chunk = []
+    for line_number, record in read_records(args.source, guess_format(args.source, args.format)):
+        try:
+            if isinstance(record, Exception):
+                raise record
+            chunk.append(TaskDataHandler.record_to_task(record))
+        except (ValueError, TypeError) as e:
+            message(f"第 {line_number} 行无效: {e}")
+            invalid += 1
+            continue
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+
+    message(f"导入完成：新增 {added}，更新 {updated}，跳过 {skipped}，无效 {invalid}")
+    return 0 if save_store(file_sync, task_store) else 1
+
+
+def archived_store(args, file_sync, task_store):
+    """--archived 时查询归档中的任务（只在这时读取归档文件），否则查询工作集"""
+    if not args.archived:
+        return task_store
+    with contextlib.redirect_stdout(sys.stderr):
+        return TaskStore(TaskArchive(TaskArchive.archive_filename(file_sync.filename)).tasks())
+
+
+def selected_full_tasks(args, file_sync, task_store):
+    """按命令行筛选条件选择任务，包含移出任务对象的细节描述"""
+    store = archived_store(args, file_sync, task_store)
+    return [store.full_task(task) for task in select_tasks(store, filters_from_args(args))]
+
+
+def command_export(args, file_sync, task_store):
+    tasks = selected_full_tasks(args, file_sync, task_store)
+    count = write_records(tasks, args.dest, guess_format(args.dest, args.format))
+    message(f"已导出 {count} 个任务")
+    return 0
+
+
+def apply_edit(task_store, edit):
+    """
+    执行一条批量修改：{"where": 条件, "set": {字段: 值}} 或 {"where": 条件, "delete": true}
+
+    返回:
+        int: 受影响的任务数
+    """
+    tasks = select_tasks(task_store, edit.get("where", {}))
+    if edit.get("delete"):
+        return len(task_store.remove_tasks([task["id"] for task in tasks]))
+
+    fields = edit.get("set", {})
+    unknown = set(fields) - set(EDITABLE_FIELDS)
+    if unknown:
+        raise ValueError(f"不能修改的字段: {', '.join(sorted(unknown))}")
+    fields = {field: TaskDataHandler.parse_record_field(field, value) for field, value in fields.items()}
+    return len(task_store.update_tasks({task["id"]: fields for task in tasks}))
+
+
+def command_edit(args, file_sync, task_store):
+    total = 0
+    for line_number, edit in read_records(args.edits, "jsonl"):
+        try:
+            if isinstance(edit, Exception):
+                raise edit
+            total += apply_edit(task_store, edit)
+        except (ValueError, KeyError) as e:
+            message(f"第 {line_number} 行: {e}")
+            return 1
+    message(f"已修改 {total} 个任务")
+    return 0 if save_store(file_sync, task_store) else 1
+
+
+def command_set(args, file_sync, task_store):
+    fields = {}
+    for assignment in args.assignments:
+        field, sep, value = assignment.partition("=")
+        if not sep:
+            message(f"格式应为 字段=值: {assignment}")
+            return 2
+        fields[field] = value
+
+    where = filters_from_args(args)
+    try:
+        count = apply_edit(task_store, {"where": where, "set": fields})
+    except (ValueError, KeyError) as e:
+        message(str(e))
+        return 1
+    message(f"已修改 {count} 个任务")
+    return 0 if save_store(file_sync, task_store) else 1
+
+
+def command_query(args, file_sync, task_store):
+    tasks = selected_full_tasks(args, file_sync, task_store)
+    if args.count:
+        print(len(tasks))
+    elif args.stats:
+        stats = TaskStore.aggregate(TaskDataHandler.task_to_entry(task) for task in tasks)
+        stats["weighted_completion"] = round(TaskStore.weighted_completion(stats), 4)
+        print(json.dumps(stats, ensure_ascii=False))
+    else:
+        write_records(tasks, "-", args.format or "table")
+    return 0
+
+
+def command_archive(args, file_sync, task_store):
+    """将全部完成的分组（或 --group 指定的分组）移到归档文件"""
+    completed = TaskArchive.completed_groups(task_store)
+    main_tasks = args.group or completed
+    pending = [main_task for main_task in main_tasks if main_task not in completed]
+    if pending:
+        message(f"分组中还有未完成的任务或分组不存在: {', '.join(pending)}")
+        return 1
+
+    archive = TaskArchive(TaskArchive.archive_filename(file_sync.filename))
+    removed = archive.archive(task_store, main_tasks)
+    message(f"已归档 {len(main_tasks)} 个分组，{len(removed)} 个任务")
+    return 0 if save_store(file_sync, task_store) else 1
+
+
+def command_restore(args, file_sync, task_store):
+    """将归档中的分组恢复到任务文件，保存任务文件成功后才从归档中删除"""
+    archive = TaskArchive(TaskArchive.archive_filename(file_sync.filename))
+    missing = [main_task for main_task in args.groups if main_task not in archive.groups()]
+    if missing:
+        message(f"归档中没有分组: {', '.join(missing)}")
+        return 1
+
+    restored = archive.restore(task_store, args.groups)
+    message(f"已恢复 {len(args.groups)} 个分组，{len(restored)} 个任务")
+    if not save_store(file_sync, task_store):
+        return 1
+    archive.save()
+    return 0
+
+
+def command_convert(args, file_sync, task_store):
+    """改变任务文件的格式（压缩容器、紧凑或缩进），之后界面和命令行保存时沿用新的格式"""
+    if args.compress is not None:
+        file_sync.compression = None if args.compress == "none" else args.compress
+    if args.compact is not None:
+        file_sync.compact = args.compact
+    success, _ = file_sync.save(task_store)
+    if not success:
+        message("保存任务文件失败")
+        return 1
+    compression = file_sync.compression or "无压缩"
+    message(f"已转换为 {compression}，{'紧凑' if file_sync.compact else '缩进'}格式，"
+            f"{os.path.getsize(file_sync.filename)} 字节")
+    return 0
+
+
+def command_index(args, file_sync, task_store):
+    """导出带索引的二进制文件，供任务查看器（task_display.py）只读分页浏览"""
+    if args.archived:
+        groups = TaskArchive(TaskArchive.archive_filename(file_sync.filename)).groups().items()
+    else:
+        groups = ((main_task, dict(group, tasks=[task_store.full_entry(entry) for entry in group["tasks"]]))
+                  for main_task, group in task_store.groups.items())
+    group_count, task_count = TaskIndex.write(groups, args.dest)
+    message(f"已导出 {group_count} 个分组，{task_count} 个任务，{os.path.getsize(args.dest)} 字节")
+    return 0
+
+
+def add_filter_arguments(parser):
+    parser.add_argument("--group", help="总标题")
+    parser.add_argument("--type", help="任务类型")
+    parser.add_argument("--branch", type=int, help="分支序号")
+    parser.add_argument("--search", help="关键词（与界面中的搜索相同）")
+    state = parser.add_mutually_exclusive_group()
+    state.add_argument("--completed", action="store_true", help="只选择已完成的任务")
+    state.add_argument("--pending", action="store_true", help="只选择未完成的任务")
+    parser.add_argument("--ready", action="store_true", help="只选择前置任务都已完成的任务")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="任务管理系统命令行工具")
+    parser.add_argument("--file", default="tasks.json", help="任务文件")
+    parser.add_argument("--workspace", help="workspaces.json 中的工作区名称，代替 --file 指定任务文件")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="从CSV/JSONL导入任务")
+    import_parser.add_argument("source", help="导入文件，- 表示标准输入")
+    import_parser.add_argument("--format", choices=["csv", "jsonl"], help="默认按扩展名判断")
+    import_parser.add_argument("--on-existing", choices=["update", "skip"], default="update",
+                               help="已有相同总标题和分支序号的任务时更新还是跳过")
+    import_parser.set_defaults(handler=command_import)
+
+    export_parser = commands.add_parser("export", help="导出任务为CSV/JSONL")
+    export_parser.add_argument("dest", help="导出文件，- 表示标准输出")
+    export_parser.add_argument("--format", choices=["csv", "jsonl"], help="默认按扩展名判断")
+    export_parser.add_argument("--archived", action="store_true", help="导出归档中的任务")
+    add_filter_arguments(export_parser)
+    export_parser.set_defaults(handler=command_export)
+
+    edit_parser = commands.add_parser("edit", help="执行JSONL文件中的批量修改")
+    edit_parser.add_argument("edits", help='每行 {"where": {...}, "set": {...}} 或 {"where": {...}, "delete": true}')
+    edit_parser.set_defaults(handler=command_edit)
+
+    set_parser = commands.add_parser("set", help="修改符合条件的任务的字段")
+    set_parser.add_argument("assignments", nargs="+", metavar="字段=值")
+    add_filter_arguments(set_parser)
+    set_parser.set_defaults(handler=command_set)
+
+    query_parser = commands.add_parser("query", help="查询任务")
+    query_parser.add_argument("--format", choices=["table", "jsonl", "csv"], help="默认为table")
+    query_parser.add_argument("--count", action="store_true", help="只输出任务数")
+    query_parser.add_argument("--stats", action="store_true", help="输出聚合统计")
+    query_parser.add_argument("--archived", action="store_true", help="查询归档中的任务")
+    add_filter_arguments(query_parser)
+    query_parser.set_defaults(handler=command_query)
+
+    archive_parser = commands.add_parser("archive", help="将全部完成的分组移到归档文件")
+    archive_parser.add_argument("--group", action="append", help="只归档指定的分组（可重复）")
+    archive_parser.set_defaults(handler=command_archive)
+
+    restore_parser = commands.add_parser("restore", help="将归档中的分组恢复到任务文件")
+    restore_parser.add_argument("groups", nargs="+", metavar="总标题")
+    restore_parser.set_defaults(handler=command_restore)
+
+    convert_parser = commands.add_parser("convert", help="改变任务文件的压缩和缩进格式")
+    convert_parser.add_argument("--compress", choices=["none"] + list(CODECS), help="默认保持原来的压缩格式")
+    layout = convert_parser.add_mutually_exclusive_group()
+    layout.add_argument("--compact", dest="compact", action="store_true", default=None, help="不缩进的紧凑JSON")
+    layout.add_argument("--pretty", dest="compact", action="store_false", help="缩进4个空格的JSON")
+    convert_parser.set_defaults(handler=command_convert)
+
+    index_parser = commands.add_parser("index", help="导出带索引的二进制文件，用于在任务查看器中只读浏览")
+    index_parser.add_argument("dest", help="索引文件，例如 archive.taskidx")
+    index_parser.add_argument("--archived", action="store_true", help="导出归档中的分组")
+    index_parser.set_defaults(handler=command_index)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.workspace is not None:
+        workspaces = WorkspaceRegistry()
+        if args.workspace not in workspaces.workspaces:
+            message(f"没有工作区: {args.workspace}（可用: {', '.join(workspaces.names())}）")
+            return 2
+        args.file = workspaces.task_file(args.workspace)
+    file_sync = TaskFileSync(args.file)
+    try:
+        task_store = load_store(file_sync)
+        return args.handler(args, file_sync, task_store)
+    except BrokenPipeError:
+        # 输出被提前关闭（例如管道到 head），之后的输出直接丢弃
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except (OSError, ValueError, KeyError) as e:
+        message(f"错误: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
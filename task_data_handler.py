@@ -1,6 +1,93 @@
+import bisect
+import contextlib
+import csv
+import gzip
+import io
 import json
+import lzma
 import os
+import tempfile
+import threading
 from datetime import datetime
+from json.decoder import scanstring
+
+try:
+    import fcntl
+except ImportError:  # Windows没有fcntl，此时写入不加文件锁（原子替换仍然有效）
+    fcntl = None
+
+from perf_instrument import timed
+
+# JSON空白字符
+_WHITESPACE = " \t\n\r"
+
+# CSV/JSONL 导入导出时每个任务的字段
+RECORD_FIELDS = ["main_task", "branch_number", "main_task_type", "sub_task", "details", "estimated_time",
+                 "completed", "weight", "sub_task_tasks", "depends_on"]
+# 表示“是”和“否”的文本（CSV中的完成状态），其他文本视为无效
+_TRUE_TEXTS = {"1", "true", "yes", "y", "是", "已完成"}
+_FALSE_TEXTS = {"0", "false", "no", "n", "否", "未完成", ""}
+
+
+def _check_int(value, field, minimum=None):
+    # JSON中的整数；整数值的浮点数（例如其他工具写出的 2.0）转换为整数
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError(f"字段 {field} 应为整数，实际为 {value!r}")
+    if minimum is not None and value < minimum:
+        raise ValueError(f"字段 {field} 不能小于 {minimum}，实际为 {value}")
+    return value
+
+
+def _check_number(value, field):
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        raise ValueError(f"字段 {field} 应为数字，实际为 {value!r}")
+    if value < 0:
+        raise ValueError(f"字段 {field} 不能为负数，实际为 {value}")
+    return value
+
+
+def _check_bool(value, field):
+    # 旧文件和其他工具可能用 0/1 表示完成状态
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    raise ValueError(f"字段 {field} 应为布尔值，实际为 {value!r}")
+
+
+def _check_str(value, field):
+    if not isinstance(value, str):
+        raise ValueError(f"字段 {field} 应为字符串，实际为 {value!r}")
+    return value
+
+
+
+def _open_gzip(fileobj, mode):
+    # 不写入文件名和时间戳，内容相同时压缩结果相同；
+    # 级别6比默认的9快得多，文件只大几个百分点
+    return gzip.GzipFile(filename="", mode=mode, fileobj=fileobj, mtime=0, compresslevel=6)
+
+
+def _open_lzma(fileobj, mode):
+    # 预设1的压缩率仍高于gzip，保存速度是默认预设6的数倍
+    return lzma.LZMAFile(fileobj, mode=mode, preset=1 if mode == 'wb' else None)
+
+
+# 任务文件的压缩容器：编解码器名称 -> (文件开头的魔数, 打开函数)。
+# 打开函数 opener(fileobj, mode) 在二进制文件对象上返回流式解压（'rb'）或压缩（'wb'）的文件对象，
+# 关闭时不关闭 fileobj。读取时按魔数自动识别，没有匹配的魔数时按未压缩的JSON读取。
+CODECS = {
+    "gzip": (b"\x1f\x8b", _open_gzip),
+    "lzma": (b"\xfd7zXZ\x00", _open_lzma)
+}
+
+# 本进程内各锁文件对应的线程锁：锁文件路径 -> RLock，同一时刻只有一个线程能持有文件锁
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+# 持有文件锁的线程的嵌套次数：(锁文件路径, 线程id) -> 嵌套次数，同一线程内可重入
+_held_locks = {}
 
 
 class TaskDataHandler:
@@ -16,17 +103,49 @@ class TaskDataHandler:
         return [task for task in tasks if task["main_task_type"] == task_type]
 
     @staticmethod
-    def save_tasks_to_json(tasks, filename):
+    def task_to_entry(task):
         """
-        保存任务，按总标题分类，按分支序号排序，包含完成状态和总任务类型。
+        将任务转换为按总标题分组后的文件格式（分支任务条目）
 
         参数:
-            tasks (list): 任务对象列表
-            filename (str): 保存的文件名
+            task (dict): 任务对象
+
+        返回:
+            dict: 分支任务条目，任务带有id时一并保留（写入文件时会去掉）
         """
-        # 创建备份
-        TaskDataHandler.backup_tasks_file(filename)
+        # 转换估计时间为小时和分钟
+        estimated_time = task["estimated_time"]
+        hours = int(estimated_time)
+        minutes = round((estimated_time - hours) * 60)
+
+        entry = {
+            "branch_number": task["branch_number"],
+            "sub_task_name": task["sub_task"],
+            "details": task["details"],
+            "sub_task_tasks": task["sub_task_tasks"],
+            "estimated_time_hours": hours,
+            "estimated_time_minutes": minutes,
+            "completed": task["completed"],
+            "weight": task["weight"]
+        }
+        # 前置任务引用 [总标题, 分支序号]，没有依赖时不写入文件
+        if task.get("depends_on"):
+            entry["depends_on"] = task["depends_on"]
+        if task.get("id") is not None:
+            entry["id"] = task["id"]
+        return entry
 
+    @staticmethod
+    def group_tasks(tasks):
+        """
+        按总标题分组任务，按分支序号排序，包含完成状态和总任务类型。
+
+        参数:
+            tasks (list): 任务对象列表
+
+        返回:
+            dict: 总标题 -> 分组数据
+        """
         organized_tasks = {}
 
         for task in tasks:
@@ -43,42 +162,243 @@ class TaskDataHandler:
             elif main_task_type and main_task_type not in organized_tasks[main_task]["Types"]:
                 organized_tasks[main_task]["Types"].append(main_task_type)
 
-            # 转换估计时间为小时和分钟
-            estimated_time = task["estimated_time"]
-            hours = int(estimated_time)
-            minutes = round((estimated_time - hours) * 60)
-
-            sub_task_data = {
-                "branch_number": task["branch_number"],
-                "sub_task_name": task["sub_task"],
-                "details": task["details"],
-                "sub_task_tasks": task.get("sub_task_tasks", {}),
-                "estimated_time_hours": hours,
-                "estimated_time_minutes": minutes,
-                "completed": task.get("completed", False),
-                "weight": task.get("weight", 10)
-            }
+            # 按branch_number二分插入，分组内的任务始终有序
+            bisect.insort_right(organized_tasks[main_task]["tasks"], TaskDataHandler.task_to_entry(task),
+                                key=lambda x: x["branch_number"])
 
-            organized_tasks[main_task]["tasks"].append(sub_task_data)
-
-        # 更新子任务数量并排序
+        # 更新子任务数量
         for main_task in organized_tasks:
             organized_tasks[main_task]["sub_task_number"] = len(organized_tasks[main_task]["tasks"])
-            # 按branch_number排序子任务
-            organized_tasks[main_task]["tasks"].sort(key=lambda x: x["branch_number"])
 
+        return organized_tasks
+
+    @staticmethod
+    def dump_group(main_task, group, compact=False):
+        """
+        序列化单个分组为JSON片段，拼接后与 json.dump(indent=4) 的整体输出一致，
+        因此未修改的分组可以缓存片段而不必重新序列化。
+        分组内的任务应已按分支序号排列（group_tasks 和 TaskStore 都会维护该顺序）。
+
+        参数:
+            main_task (str): 总标题
+            group (dict): 分组数据
+            compact (bool): 为True时不缩进、不加空格（紧凑格式，文件约小一半）
+
+        返回:
+            str: JSON片段
+        """
+        group_data = dict(group)
+        group_data["tasks"] = [
+            {key: value for key, value in entry.items() if key != "id"}
+            for entry in group["tasks"]
+        ]
+        group_data["sub_task_number"] = len(group_data["tasks"])
+        if compact:
+            body = json.dumps(group_data, ensure_ascii=False, separators=(",", ":"))
+            return f"{json.dumps(main_task, ensure_ascii=False)}:{body}"
+        body = json.dumps(group_data, ensure_ascii=False, indent=4).replace("\n", "\n    ")
+        return f"    {json.dumps(main_task, ensure_ascii=False)}: {body}"
+
+    @staticmethod
+    def iter_file_pieces(fragments, compact=False):
+        """依次产生完整文件内容的各个部分（分组片段及其间的分隔符），用于流式写入"""
+        if not fragments:
+            yield "{}"
+            return
+        yield "{" if compact else "{\n"
+        for index, fragment in enumerate(fragments):
+            if index:
+                yield "," if compact else ",\n"
+            yield fragment
+        yield "}" if compact else "\n}"
+
+    @staticmethod
+    def join_group_fragments(fragments, compact=False):
+        """将分组JSON片段拼接为完整的文件内容"""
+        return "".join(TaskDataHandler.iter_file_pieces(fragments, compact))
+
+    @staticmethod
+    def fragment_body(main_task, fragment, compact=False):
+        """dump_group 片段中分组数据部分的JSON文本（与从文件中解析出的分组原始文本一致）"""
+        name = json.dumps(main_task, ensure_ascii=False)
+        return fragment[len(f"{name}:" if compact else f"    {name}: "):]
+
+    @staticmethod
+    def is_compact(text):
+        """任务文件的文本是否为紧凑格式（没有缩进）"""
+        return len(text) > 2 and text[1] not in _WHITESPACE
+
+    @staticmethod
+    def register_codec(name, magic, opener):
+        """
+        注册压缩容器的编解码器（例如第三方的zstd），之后可以作为 compression 参数使用，读取时按魔数自动识别
+
+        参数:
+            name (str): 名称
+            magic (bytes): 压缩数据开头的魔数
+            opener (callable): opener(fileobj, mode) 返回流式读写的文件对象，参见 CODECS
+        """
+        CODECS[name] = (magic, opener)
+
+    @staticmethod
+    def detect_codec(head):
+        """按文件开头的字节识别编解码器，未压缩时返回None"""
+        for name, (magic, _) in CODECS.items():
+            if head.startswith(magic):
+                return name
+        return None
+
+    @staticmethod
+    def write_fragments(raw, fragments, compression=None, compact=False):
+        """
+        将分组片段逐个编码（和压缩）写入二进制文件对象，不需要先拼接出完整的文件内容
+
+        参数:
+            raw: 以二进制方式打开的文件对象
+            fragments (list): dump_group 生成的片段列表
+            compression (str): CODECS 中的编解码器名称，None表示不压缩
+            compact (bool): 片段是否为紧凑格式
+        """
+        stream = raw if compression is None else CODECS[compression][1](raw, 'wb')
+        try:
+            for piece in TaskDataHandler.iter_file_pieces(fragments, compact):
+                stream.write(piece.encode('utf-8'))
+        finally:
+            if stream is not raw:
+                stream.close()
+
+    @staticmethod
+    @contextlib.contextmanager
+    def lock_file(filename):
+        """
+        多个实例写同一个任务文件时使用的建议性排他锁（fcntl.flock）。
+        锁加在旁边的 .lock 文件上，任务文件本身会被原子替换，不能作为锁的对象。
+        同一线程内可以嵌套获取；同一进程的其他线程等待线程锁（flock 按进程生效，不能区分线程）。
+
+        参数:
+            filename (str): 任务文件名
+        """
+        lock_name = os.path.abspath(filename) + ".lock"
+        with _thread_locks_guard:
+            thread_lock = _thread_locks.setdefault(lock_name, threading.RLock())
+
+        with thread_lock:
+            # 持有线程锁后，该键只会被当前线程访问
+            key = (lock_name, threading.get_ident())
+            if key in _held_locks:
+                _held_locks[key] += 1
+                try:
+                    yield
+                finally:
+                    _held_locks[key] -= 1
+                return
+
+            with open(lock_name, 'a') as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                _held_locks[key] = 1
+                try:
+                    yield
+                finally:
+                    del _held_locks[key]
+                    if fcntl is not None:
+                        fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @staticmethod
+    def write_text_atomic(text, filename):
+        """
+        先写入同目录下的临时文件再替换目标文件，其他实例读取时不会看到写了一半的文件
+        """
+        with TaskDataHandler.atomic_file(filename) as f:
+            f.write(text)
+
+    @staticmethod
+    @contextlib.contextmanager
+    def atomic_file(filename, mode='w'):
+        """
+        打开同目录下的临时文件用于写入，正常结束时替换目标文件，出错时删除临时文件、目标文件保持不变
+
+        参数:
+            filename (str): 目标文件名
+            mode (str): 'w'（UTF-8文本）或 'wb'（二进制，例如压缩后的数据）
+        """
+        directory = os.path.dirname(os.path.abspath(filename))
+        fd, temp_name = tempfile.mkstemp(dir=directory, prefix=".tasks_", suffix=".tmp")
+        try:
+            with os.fdopen(fd, mode, encoding=None if 'b' in mode else 'utf-8') as f:
+                yield f
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(filename):
+                os.chmod(temp_name, os.stat(filename).st_mode & 0o777)
+            os.replace(temp_name, filename)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(temp_name)
+            raise
+
+    @staticmethod
+    def write_group_fragments(fragments, filename, compression=None, compact=False):
+        """
+        将分组JSON片段写入文件（加锁，写入前创建备份，原子替换）
+
+        参数:
+            fragments (list): dump_group 生成的片段列表
+            filename (str): 保存的文件名
+            compression (str): CODECS 中的编解码器名称，None表示不压缩
+            compact (bool): 片段是否为紧凑格式
+
+        返回:
+            bool: 是否保存成功
+        """
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(organized_tasks, f, ensure_ascii=False, indent=4)
+            with TaskDataHandler.lock_file(filename):
+                # 创建备份
+                TaskDataHandler.backup_tasks_file(filename)
+                with TaskDataHandler.atomic_file(filename, 'wb') as raw:
+                    TaskDataHandler.write_fragments(raw, fragments, compression, compact)
             return True
         except Exception as e:
             print(f"保存任务时出错: {e}")
             return False
 
     @staticmethod
+    @timed("save", items=lambda args, result: len(args[0]))
+    def save_tasks_to_json(tasks, filename, compression=None, compact=False):
+        """
+        保存任务，按总标题分类，按分支序号排序，包含完成状态和总任务类型。
+
+        参数:
+            tasks (list): 任务对象列表
+            filename (str): 保存的文件名
+            compression (str): 压缩容器的编解码器（"gzip"、"lzma" 或注册的名称），None表示不压缩
+            compact (bool): 为True时写入不缩进的紧凑JSON
+        """
+        organized_tasks = TaskDataHandler.group_tasks(tasks)
+        fragments = [TaskDataHandler.dump_group(main_task, group, compact)
+                     for main_task, group in organized_tasks.items()]
+        return TaskDataHandler.write_group_fragments(fragments, filename, compression, compact)
+
+    @staticmethod
+    @timed("save", items=lambda args, result: len(args[0]))
+    def save_store_to_json(task_store, filename, compression=None, compact=False):
+        """
+        保存共享任务存储，只重新序列化自上次保存以来有变化的分组
+
+        参数:
+            task_store (TaskStore): 任务存储
+            filename (str): 保存的文件名
+            compression (str): 压缩容器的编解码器，None表示不压缩
+            compact (bool): 为True时写入紧凑JSON
+        """
+        return TaskDataHandler.write_group_fragments(task_store.group_fragments(compact), filename,
+                                                     compression, compact)
+
+    @staticmethod
+    @timed("load", items=lambda args, result: len(result) if result else 0)
     def load_tasks_from_json(filename):
         """
-        加载任务，恢复原始格式，包含完成状态和总任务类型。
+        加载任务，恢复原始格式，包含完成状态和总任务类型。压缩的文件按魔数自动识别。
 
         参数:
             filename (str): 文件名
@@ -87,41 +407,422 @@ class TaskDataHandler:
             list: 任务列表，如果加载失败则返回None
         """
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                organized_tasks = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError) as e:
+            return list(TaskDataHandler.iter_tasks_from_json(filename))
+        except (FileNotFoundError, ValueError) as e:
             print(f"加载任务时出错: {e}")
             return None
 
+    @staticmethod
+    def read_tasks_text(filename):
+        """
+        读取任务文件的全部文本（压缩的文件边读边解压）
+
+        异常:
+            FileNotFoundError: 文件不存在
+        """
+        return TaskDataHandler.read_tasks_file(filename)[0]
+
+    @staticmethod
+    def read_tasks_file(filename):
+        """
+        读取任务文件，按文件开头的魔数识别压缩格式
+
+        返回:
+            tuple: (文件的全部文本, 编解码器名称，未压缩时为None)
+
+        异常:
+            FileNotFoundError: 文件不存在
+            ValueError: 压缩数据损坏或不是UTF-8文本
+        """
+        with open(filename, 'rb') as raw:
+            compression = TaskDataHandler.detect_codec(raw.read(max(len(magic) for magic, _ in CODECS.values())))
+            raw.seek(0)
+            stream = raw if compression is None else CODECS[compression][1](raw, 'rb')
+            try:
+                with io.TextIOWrapper(stream, encoding='utf-8') as f:
+                    return f.read(), compression
+            except (EOFError, gzip.BadGzipFile, lzma.LZMAError) as e:
+                raise ValueError(f"压缩数据损坏: {e}") from e
+
+    @staticmethod
+    def iter_groups_from_json(filename, group_texts=None):
+        """
+        逐个分组解析任务文件。每次只解码一个分组，后台线程加载时可以分批交出数据，
+        解码之间也会释放GIL，不会长时间阻塞界面线程。
+
+        参数:
+            filename (str): 文件名
+            group_texts (dict): 可选，填入 总标题 -> 分组的原始JSON文本
+
+        返回:
+            generator: 依次产生 (总标题, 分组数据)
+
+        异常:
+            FileNotFoundError: 文件不存在
+            json.JSONDecodeError: 文件格式错误
+            ValueError: 分组或任务的字段不符合格式（见 normalize_group）
+        """
+        return TaskDataHandler.iter_groups_from_text(TaskDataHandler.read_tasks_text(filename), group_texts)
+
+    @staticmethod
+    def iter_groups_from_text(text, group_texts=None):
+        """
+        逐个分组解析任务文件的文本，参见 iter_groups_from_json。
+        每个分组解析后立即经过 normalize_group 校验并转换为规范形式，之后的代码不再需要兼容旧格式
+
+        参数:
+            text (str): 文件内容
+            group_texts (dict): 可选，填入 总标题 -> 分组的原始JSON文本，
+                用于之后判断哪些分组发生了变化
+
+        返回:
+            generator: 依次产生 (总标题, 分组数据)
+        """
+        decoder = json.JSONDecoder()
+
+        def skip_whitespace(idx):
+            while idx < len(text) and text[idx] in _WHITESPACE:
+                idx += 1
+            return idx
+
+        idx = skip_whitespace(0)
+        if not text.startswith("{", idx):
+            raise json.JSONDecodeError("Expecting '{'", text, idx)
+        idx = skip_whitespace(idx + 1)
+        if text.startswith("}", idx):
+            return
+
+        while True:
+            if not text.startswith('"', idx):
+                raise json.JSONDecodeError("Expecting property name enclosed in double quotes", text, idx)
+            main_task, idx = scanstring(text, idx + 1)
+
+            idx = skip_whitespace(idx)
+            if not text.startswith(":", idx):
+                raise json.JSONDecodeError("Expecting ':' delimiter", text, idx)
+            start = skip_whitespace(idx + 1)
+            group, idx = decoder.raw_decode(text, start)
+            group = TaskDataHandler.normalize_group(main_task, group)
+            if group_texts is not None:
+                group_texts[main_task] = text[start:idx]
+            yield main_task, group
+
+            idx = skip_whitespace(idx)
+            if text.startswith(",", idx):
+                idx = skip_whitespace(idx + 1)
+            elif text.startswith("}", idx):
+                return
+            else:
+                raise json.JSONDecodeError("Expecting ',' delimiter", text, idx)
+
+    @staticmethod
+    def normalize_sub_tasks(value, field="sub_task_tasks"):
+        """
+        子任务的规范形式：{子任务名称: 是否完成}。
+        旧格式的名称列表转换为全部未完成的字典，缺少（None）时为空字典
+
+        异常:
+            ValueError: 不是字典或列表，或名称、完成状态的类型不对
+        """
+        if value is None:
+            return {}
+        if isinstance(value, list):
+            items = [(name, False) for name in value]
+        elif isinstance(value, dict):
+            items = value.items()
+        else:
+            raise ValueError(f"字段 {field} 应为对象或列表，实际为 {value!r}")
+        sub_tasks = {}
+        for name, completed in items:
+            sub_tasks[_check_str(name, f"{field} 的名称")] = _check_bool(completed, f"{field}.{name}")
+        return sub_tasks
+
+    @staticmethod
+    def normalize_refs(value, field="depends_on"):
+        """
+        前置任务引用的规范形式：[[总标题, 分支序号], ...]，没有引用时为空列表
+
+        异常:
+            ValueError: 引用的格式不对
+        """
+        if value is None:
+            return []
+        if not isinstance(value, list):
+            raise ValueError(f"字段 {field} 应为列表，实际为 {value!r}")
+        refs = []
+        for ref in value:
+            if not isinstance(ref, (list, tuple)) or len(ref) != 2:
+                raise ValueError(f"字段 {field} 中的引用应为 [总标题, 分支序号]，实际为 {ref!r}")
+            refs.append([_check_str(ref[0], field), _check_int(ref[1], field)])
+        return refs
+
+    @staticmethod
+    def normalize_entry(entry):
+        """
+        校验一个分支任务条目并转换为规范形式：字段齐全、类型确定、顺序与 task_to_entry 相同。
+        可选字段缺少或为null时使用默认值，未知字段丢弃（加载后本来也不会保存）
+
+        异常:
+            ValueError: 缺少分支序号或分支任务名称，或字段类型不对
+        """
+        if not isinstance(entry, dict):
+            raise ValueError(f"任务应为对象，实际为 {entry!r}")
+        for field in ("branch_number", "sub_task_name"):
+            if entry.get(field) is None:
+                raise ValueError(f"缺少字段 {field}")
+
+        get = entry.get
+        branch_number = entry["branch_number"]
+        sub_task_name = entry["sub_task_name"]
+        details = get("details", "")
+        sub_tasks = get("sub_task_tasks")
+        hours = get("estimated_time_hours", 0)
+        minutes = get("estimated_time_minutes", 0)
+        completed = get("completed", False)
+        weight = get("weight", 10)
+        # 本程序写出的文件字段类型都已正确，先整体判断一次，不逐个字段调用校验函数
+        if (type(branch_number) is int and type(sub_task_name) is str and type(details) is str and
+                type(hours) is int and hours >= 0 and type(minutes) is int and minutes >= 0 and
+                type(completed) is bool and type(weight) in (int, float) and weight >= 0 and
+                type(sub_tasks) is dict and all(type(done) is bool for done in sub_tasks.values())):
+            sub_tasks = dict(sub_tasks)
+        else:
+            branch_number = _check_int(branch_number, "branch_number")
+            sub_task_name = _check_str(sub_task_name, "sub_task_name")
+            details = _check_str(details or "", "details")
+            sub_tasks = TaskDataHandler.normalize_sub_tasks(sub_tasks)
+            hours = _check_int(hours or 0, "estimated_time_hours", 0)
+            minutes = _check_int(minutes or 0, "estimated_time_minutes", 0)
+            completed = _check_bool(completed or False, "completed")
+            weight = _check_number(10 if weight is None else weight, "weight")
+
+        normalized = {
+            "branch_number": branch_number,
+            "sub_task_name": sub_task_name,
+            "details": details,
+            "sub_task_tasks": sub_tasks,
+            "estimated_time_hours": hours,
+            "estimated_time_minutes": minutes,
+            "completed": completed,
+            "weight": weight
+        }
+        depends_on = get("depends_on")
+        if depends_on:
+            normalized["depends_on"] = TaskDataHandler.normalize_refs(depends_on)
+        return normalized
+
+    @staticmethod
+    def normalize_group(main_task, group):
+        """
+        校验一个分组并转换为规范形式（加载时对每个分组执行一次）：
+        Types 为字符串列表，describe 为字符串，任务条目见 normalize_entry 并按分支序号排列，
+        sub_task_number 与任务数一致。不修改传入的数据。
+
+        参数:
+            main_task (str): 总标题
+            group (dict): 从文件中解析出的分组数据
+
+        返回:
+            dict: 规范形式的分组数据
+
+        异常:
+            ValueError: 分组或其中的任务格式错误，错误信息包含总标题和任务的位置
+        """
+        if not isinstance(group, dict):
+            raise ValueError(f"分组 {main_task!r} 应为对象，实际为 {group!r}")
+        try:
+            types = group.get("Types") or []
+            if isinstance(types, str):
+                types = [types]
+            elif not isinstance(types, list):
+                raise ValueError(f"字段 Types 应为列表，实际为 {types!r}")
+            types = [_check_str(task_type, "Types") for task_type in types]
+            describe = _check_str(group.get("describe") or "", "describe")
+            entries = group.get("tasks") or []
+            if not isinstance(entries, list):
+                raise ValueError(f"字段 tasks 应为列表，实际为 {entries!r}")
+        except ValueError as e:
+            raise ValueError(f"分组 {main_task!r}: {e}") from None
+
         tasks = []
-        for main_task, data in organized_tasks.items():
-            # 获取主任务类型，如果有多个则使用第一个
-            main_task_type = data["Types"][0] if data["Types"] else ""
+        for position, entry in enumerate(entries, 1):
+            try:
+                tasks.append(TaskDataHandler.normalize_entry(entry))
+            except ValueError as e:
+                raise ValueError(f"分组 {main_task!r} 的第 {position} 个任务: {e}") from None
+        tasks.sort(key=lambda x: x["branch_number"])
+        return {"Types": types, "describe": describe, "tasks": tasks, "sub_task_number": len(tasks)}
 
-            for sub_task in data["tasks"]:
-                # 计算小时和分钟为估计时间
-                hours = sub_task.get("estimated_time_hours", 0)
-                minutes = sub_task.get("estimated_time_minutes", 0)
+    @staticmethod
+    def group_to_tasks(main_task, data):
+        """
+        将一个规范形式的分组（见 normalize_group）恢复为任务列表
 
+        参数:
+            main_task (str): 总标题
+            data (dict): 分组数据
+
+        返回:
+            list: 任务列表
+        """
+        # 获取主任务类型，如果有多个则使用第一个
+        main_task_type = data["Types"][0] if data["Types"] else ""
+
+        tasks = []
+        for sub_task in data["tasks"]:
+            task = {
+                "main_task": main_task,
+                "main_task_type": main_task_type,
+                "sub_task": sub_task["sub_task_name"],
+                "details": sub_task["details"],
                 # 转换为小时为单位的浮点数
-                estimated_time = hours + (minutes / 60)
-
-                task = {
-                    "main_task": main_task,
-                    "main_task_type": main_task_type,
-                    "sub_task": sub_task["sub_task_name"],
-                    "details": sub_task["details"],
-                    "estimated_time": estimated_time,
-                    "branch_number": sub_task["branch_number"],
-                    "completed": sub_task["completed"],
-                    "weight": sub_task.get("weight", 10),
-                    "sub_task_tasks": sub_task.get("sub_task_tasks", {})
-                }
-                tasks.append(task)
+                "estimated_time": sub_task["estimated_time_hours"] + sub_task["estimated_time_minutes"] / 60,
+                "branch_number": sub_task["branch_number"],
+                "completed": sub_task["completed"],
+                "weight": sub_task["weight"],
+                "sub_task_tasks": sub_task["sub_task_tasks"]
+            }
+            if "depends_on" in sub_task:
+                task["depends_on"] = sub_task["depends_on"]
+            tasks.append(task)
 
         return tasks
 
     @staticmethod
+    def iter_tasks_from_json(filename, group_texts=None):
+        """
+        逐个分组加载任务，产生的任务格式与 load_tasks_from_json 相同
+
+        参数:
+            filename (str): 文件名
+            group_texts (dict): 可选，填入 总标题 -> 分组的原始JSON文本
+
+        返回:
+            generator: 依次产生任务对象
+        """
+        return TaskDataHandler.iter_tasks_from_text(TaskDataHandler.read_tasks_text(filename), group_texts)
+
+    @staticmethod
+    def iter_tasks_from_text(text, group_texts=None):
+        """逐个分组从任务文件的文本加载任务，参见 iter_tasks_from_json"""
+        for main_task, data in TaskDataHandler.iter_groups_from_text(text, group_texts):
+            yield from TaskDataHandler.group_to_tasks(main_task, data)
+
+    @staticmethod
+    def record_format(filename):
+        """按扩展名判断导入导出文件的格式（csv 或 jsonl）"""
+        return "csv" if filename.lower().endswith(".csv") else "jsonl"
+
+    @staticmethod
+    def iter_records(stream, fmt):
+        """
+        逐行读取CSV或JSONL记录
+
+        参数:
+            stream: 文本流
+            fmt (str): "csv" 或 "jsonl"
+
+        返回:
+            generator: 依次产生 (行号, 记录)，JSONL中无法解析的行产生 (行号, 异常)
+        """
+        if fmt == "csv":
+            reader = csv.DictReader(stream)
+            for record in reader:
+                yield reader.line_num, record
+            return
+
+        for line_number, line in enumerate(stream, 1):
+            if line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError as e:
+                    yield line_number, e
+
+    @staticmethod
+    def parse_record_field(field, value):
+        """
+        将CSV或命令行中的文本转换为字段的值，JSON中的值校验类型，结果与加载文件后的规范形式相同
+
+        异常:
+            ValueError: 值无法转换或类型不对
+        """
+        if isinstance(value, str):
+            if field == "completed":
+                text = value.strip().lower()
+                if text in _TRUE_TEXTS:
+                    return True
+                if text in _FALSE_TEXTS:
+                    return False
+                raise ValueError(f"字段 completed 应为是/否，实际为 {value!r}")
+            if field == "branch_number":
+                return int(value)
+            if field in ("estimated_time", "weight"):
+                number = float(value) if value.strip() else 0.0
+                value = int(number) if field == "weight" and number.is_integer() else number
+            elif field == "sub_task_tasks":
+                value = json.loads(value) if value.strip() else {}
+            elif field == "depends_on":
+                value = json.loads(value) if value.strip() else []
+            else:
+                return value
+
+        if field == "completed":
+            return _check_bool(value, field)
+        if field == "branch_number":
+            return _check_int(value, field)
+        if field in ("estimated_time", "weight"):
+            return _check_number(value, field)
+        if field == "sub_task_tasks":
+            return TaskDataHandler.normalize_sub_tasks(value)
+        if field == "depends_on":
+            return TaskDataHandler.normalize_refs(value)
+        return _check_str(value, field)
+
+    @staticmethod
+    def record_to_task(record):
+        """
+        由导入的记录创建任务对象并校验，缺少的字段使用默认值，缺少分支序号时为None
+
+        异常:
+            ValueError: 记录无效（缺少总标题或子任务标题、数值格式错误等）
+        """
+        if not isinstance(record, dict):
+            raise ValueError("记录格式错误")
+
+        task = {
+            "main_task": "",
+            "main_task_type": "",
+            "sub_task": "",
+            "details": "",
+            "estimated_time": 0.0,
+            "branch_number": None,
+            "completed": False,
+            "weight": 10,
+            "sub_task_tasks": {}
+        }
+        for field in RECORD_FIELDS:
+            value = record.get(field)
+            if value is not None and value != "":
+                task[field] = TaskDataHandler.parse_record_field(field, value)
+
+        if not task["main_task"].strip() or not task["sub_task"].strip():
+            raise ValueError("缺少任务总标题或子任务标题")
+        if not task.get("depends_on"):
+            task.pop("depends_on", None)
+        return task
+
+    @staticmethod
+    def task_to_record(task):
+        """任务导出时的字段（不含内存中的id）"""
+        record = {field: task.get(field) for field in RECORD_FIELDS}
+        record["completed"] = task.get("completed", False)
+        record["weight"] = task.get("weight", 10)
+        record["sub_task_tasks"] = task.get("sub_task_tasks") or {}
+        record["depends_on"] = task.get("depends_on") or []
+        return record
+
+    @staticmethod
+    @timed("filter", items=lambda args, result: len(args[0]))
     def filter_tasks_by_type(tasks, task_type):
         """
         按类型筛选任务
@@ -136,16 +837,18 @@ class TaskDataHandler:
         if not task_type or task_type == "全部":
             return tasks
 
-        return [task for task in tasks if task.get("main_task_type") == task_type]
+        return [task for task in tasks if task["main_task_type"] == task_type]
 
     @staticmethod
-    def search_tasks(tasks, query):
+    @timed("search", items=lambda args, result: len(args[0]))
+    def search_tasks(tasks, query, matched_ids=()):
         """
         在任务中搜索关键词
 
         参数:
             tasks (list): 任务对象列表
             query (str): 搜索关键词
+            matched_ids (set): 细节描述不在任务对象中、已经另行搜索到的任务id（见 TaskStore.search_tasks）
 
         返回:
             list: 匹配的任务列表
@@ -157,15 +860,18 @@ class TaskDataHandler:
         results = []
 
         for task in tasks:
-            if (query in task.get("main_task_type", "").lower() or
-                    query in task.get("main_task", "").lower() or
-                    query in task.get("sub_task", "").lower() or
-                    query in task.get("details", "").lower()):
+            # 较长的细节描述可能不在任务对象中（见 matched_ids）
+            if (query in task["main_task_type"].lower() or
+                    query in task["main_task"].lower() or
+                    query in task["sub_task"].lower() or
+                    query in task.get("details", "").lower() or
+                    (matched_ids and task.get("id") in matched_ids)):
                 results.append(task)
 
         return results
 
     @staticmethod
+    @timed("backup")
     def backup_tasks_file(filename):
         """
         创建任务文件的备份
@@ -180,14 +886,22 @@ class TaskDataHandler:
             return None
 
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_name = f"{os.path.splitext(filename)[0]}_{timestamp}.bak"
-
-            with open(filename, 'r', encoding='utf-8') as src:
-                with open(backup_name, 'w', encoding='utf-8') as dst:
-                    dst.write(src.read())
-
-            return backup_name
+            # 时间戳精确到微秒并以独占方式创建，多个实例同时备份也不会互相覆盖
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            base_name = f"{os.path.splitext(filename)[0]}_{timestamp}"
+            # 按字节复制，压缩的任务文件备份后仍是原来的格式
+            with open(filename, 'rb') as src:
+                content = src.read()
+
+            for attempt in range(100):
+                backup_name = f"{base_name}.bak" if attempt == 0 else f"{base_name}_{attempt}.bak"
+                try:
+                    with open(backup_name, 'xb') as dst:
+                        dst.write(content)
+                    return backup_name
+                except FileExistsError:
+                    continue
+            return None
         except Exception as e:
             print(f"备份任务文件时出错: {e}")
             return None
\ No newline at end of file
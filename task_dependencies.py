@@ -0,0 +1,343 @@
+import bisect
+
+
+class DependencyGraph:
+    """
+    分支任务之间的依赖图，增量维护拓扑顺序和“可立即开始”的任务集合。
+
+    边有两种：
+        - 显式依赖：前置任务 -> 依赖它的任务，影响任务是否可以开始
+        - 同一总标题内按分支序号排列的隐式顺序（链），只约束顺序，不影响是否可以开始
+    因此拓扑顺序在每个总标题内总是与分支序号一致，与之矛盾的显式依赖视为循环依赖。
+
+    拓扑顺序用 Pearce-Kelly 算法维护：新增的边与当前顺序矛盾时，
+    只在两端位置之间受影响的节点内部重新分配位置，同时完成循环检测。
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """删除所有节点和边"""
+        # 拓扑顺序：位置 -> 节点（删除的节点留下None），以及节点 -> 位置
+        self._order = []
+        self._position = {}
+        self._holes = 0
+        # 显式依赖：节点 -> 前置节点集合 / 依赖它的节点集合
+        self._prerequisites = {}
+        self._dependents = {}
+        # 链：链名（总标题） -> (分支序号列表, 节点列表)，按分支序号排列
+        self._chains = {}
+        self._node_chain = {}
+        # 完成状态、未完成的前置任务数，以及可立即开始的节点
+        self._completed = {}
+        self._unmet = {}
+        self.ready = set()
+
+    def __contains__(self, node):
+        return node in self._position
+
+    def __len__(self):
+        return len(self._position)
+
+    def position(self, node):
+        """节点在拓扑顺序中的位置，只用于比较先后"""
+        return self._position[node]
+
+    def order(self):
+        """按拓扑顺序返回所有节点"""
+        return [node for node in self._order if node is not None]
+
+    def prerequisites(self, node):
+        """节点的显式前置节点"""
+        return set(self._prerequisites.get(node, ()))
+
+    def dependents(self, node):
+        """显式依赖该节点的节点"""
+        return set(self._dependents.get(node, ()))
+
+    def unmet_prerequisites(self, node):
+        """节点尚未完成的显式前置节点"""
+        return {prerequisite for prerequisite in self._prerequisites.get(node, ())
+                if not self._completed[prerequisite]}
+
+    def is_ready(self, node):
+        return node in self.ready
+
+    def chain_index(self, node):
+        """节点在所属链中的下标"""
+        chain, rank = self._node_chain[node]
+        ranks, nodes = self._chains[chain]
+        index = bisect.bisect_left(ranks, rank)
+        while nodes[index] != node:
+            index += 1
+        return index
+
+    def _chain_neighbors(self, node):
+        """节点在链中的前一个和后一个节点（不存在时为None）"""
+        chain, _ = self._node_chain[node]
+        nodes = self._chains[chain][1]
+        index = self.chain_index(node)
+        previous = nodes[index - 1] if index > 0 else None
+        following = nodes[index + 1] if index + 1 < len(nodes) else None
+        return previous, following
+
+    def _successors(self, node):
+        following = self._chain_neighbors(node)[1]
+        if following is not None:
+            yield following
+        yield from self._dependents[node]
+
+    def _predecessors(self, node):
+        previous = self._chain_neighbors(node)[0]
+        if previous is not None:
+            yield previous
+        yield from self._prerequisites[node]
+
+    def _update_ready(self, node):
+        if not self._completed[node] and self._unmet[node] == 0:
+            self.ready.add(node)
+        else:
+            self.ready.discard(node)
+
+    def add_node(self, node, chain, rank, completed=False):
+        """
+        添加节点
+
+        参数:
+            node: 节点（任务id）
+            chain: 所属的链（总标题）
+            rank: 在链中的排序依据（分支序号），相同时按添加顺序
+
+        返回:
+            int: 节点在所属链中的下标
+        """
+        self._position[node] = len(self._order)
+        self._order.append(node)
+        self._prerequisites[node] = set()
+        self._dependents[node] = set()
+        self._completed[node] = completed
+        self._unmet[node] = 0
+        self._update_ready(node)
+
+        ranks, nodes = self._chains.setdefault(chain, ([], []))
+        index = bisect.bisect_right(ranks, rank)
+        ranks.insert(index, rank)
+        nodes.insert(index, node)
+        self._node_chain[node] = (chain, rank)
+
+        # 新节点位于顺序末尾，若链中还有后继节点需要调整顺序
+        if index + 1 < len(nodes):
+            self._restore_order(node, nodes[index + 1])
+        return index
+
+    def _check_chain_order(self, node):
+        """节点在链中的位置变化后，保证它与前后节点的顺序约束成立"""
+        previous, following = self._chain_neighbors(node)
+        if previous is not None and self._position[previous] > self._position[node]:
+            self._restore_order(previous, node)
+        if following is not None and self._position[node] > self._position[following]:
+            self._restore_order(node, following)
+
+    def set_rank(self, node, rank):
+        """
+        修改节点在链中的排序依据（重新编号），节点移动到新的位置
+
+        返回:
+            tuple: (原下标, 新下标)
+
+        异常:
+            ValueError: 新的位置与显式依赖矛盾（会形成循环），此时不做任何修改
+        """
+        chain, old_rank = self._node_chain[node]
+        ranks, nodes = self._chains[chain]
+        old_index = self.chain_index(node)
+        del ranks[old_index]
+        del nodes[old_index]
+
+        index = bisect.bisect_right(ranks, rank)
+        ranks.insert(index, rank)
+        nodes.insert(index, node)
+        self._node_chain[node] = (chain, rank)
+        try:
+            self._check_chain_order(node)
+        except ValueError:
+            del ranks[index]
+            del nodes[index]
+            ranks.insert(old_index, old_rank)
+            nodes.insert(old_index, node)
+            self._node_chain[node] = (chain, old_rank)
+            # 回到原位置，撤销过程中可能已调整的顺序
+            self._check_chain_order(node)
+            raise
+        return old_index, index
+
+    def move_node(self, node, index):
+        """
+        将节点移动到链中的指定下标。链中的排序依据集合保持不变，
+        只在原下标和新下标之间的节点重新分配，其他节点不受影响
+
+        返回:
+            list: [(节点, 新的排序依据)]，只包含排序依据变化的节点
+
+        异常:
+            ValueError: 新的位置与显式依赖矛盾（会形成循环），此时不做任何修改
+        """
+        chain, _ = self._node_chain[node]
+        ranks, nodes = self._chains[chain]
+        old_index = self.chain_index(node)
+        index = max(0, min(index, len(nodes) - 1))
+        if index == old_index:
+            return []
+
+        affected = range(min(index, old_index), max(index, old_index) + 1)
+        nodes.insert(index, nodes.pop(old_index))
+        changed = self._assign_ranks(chain, affected)
+        try:
+            self._check_chain_order(node)
+        except ValueError:
+            nodes.insert(old_index, nodes.pop(index))
+            self._assign_ranks(chain, affected)
+            self._check_chain_order(node)
+            raise
+        return changed
+
+    def _assign_ranks(self, chain, positions):
+        """按链中的下标重新分配排序依据，返回排序依据变化的 [(节点, 新的排序依据)]"""
+        ranks, nodes = self._chains[chain]
+        changed = []
+        for position in positions:
+            node, rank = nodes[position], ranks[position]
+            if self._node_chain[node][1] != rank:
+                self._node_chain[node] = (chain, rank)
+                changed.append((node, rank))
+        return changed
+
+    def remove_node(self, node):
+        """
+        删除节点及其所有边
+
+        返回:
+            set: 失去前置节点的依赖节点（其可开始状态可能变化）
+        """
+        dependents = set(self._dependents[node])
+        for dependent in dependents:
+            self.remove_edge(node, dependent)
+        for prerequisite in list(self._prerequisites[node]):
+            self.remove_edge(prerequisite, node)
+
+        chain, _ = self._node_chain[node]
+        ranks, nodes = self._chains[chain]
+        index = self.chain_index(node)
+        del ranks[index]
+        del nodes[index]
+        if not nodes:
+            del self._chains[chain]
+
+        self._order[self._position.pop(node)] = None
+        self._holes += 1
+        for mapping in (self._prerequisites, self._dependents, self._node_chain, self._completed, self._unmet):
+            del mapping[node]
+        self.ready.discard(node)
+
+        if self._holes > len(self._order) // 2:
+            self._compact()
+        return dependents
+
+    def _compact(self):
+        """去掉顺序中删除节点留下的空位"""
+        self._order = [node for node in self._order if node is not None]
+        self._position = {node: index for index, node in enumerate(self._order)}
+        self._holes = 0
+
+    def add_edge(self, prerequisite, dependent):
+        """
+        添加显式依赖：prerequisite 完成后 dependent 才能开始
+
+        异常:
+            ValueError: 添加后会形成循环依赖
+        """
+        if prerequisite == dependent:
+            raise ValueError("任务不能依赖自身")
+        if dependent in self._dependents[prerequisite]:
+            return
+
+        if self._position[prerequisite] > self._position[dependent]:
+            self._restore_order(prerequisite, dependent)
+
+        self._dependents[prerequisite].add(dependent)
+        self._prerequisites[dependent].add(prerequisite)
+        if not self._completed[prerequisite]:
+            self._unmet[dependent] += 1
+            self._update_ready(dependent)
+
+    def remove_edge(self, prerequisite, dependent):
+        """删除显式依赖"""
+        if dependent not in self._dependents.get(prerequisite, ()):
+            return
+        self._dependents[prerequisite].discard(dependent)
+        self._prerequisites[dependent].discard(prerequisite)
+        if not self._completed[prerequisite]:
+            self._unmet[dependent] -= 1
+            self._update_ready(dependent)
+
+    def _restore_order(self, before, after):
+        """
+        Pearce-Kelly：新增约束 before -> after 与当前顺序矛盾时，
+        只重新排列两者位置之间受影响的节点
+
+        异常:
+            ValueError: 约束会形成循环
+        """
+        lower, upper = self._position[after], self._position[before]
+
+        # 从after出发向后搜索位置不超过upper的节点，遇到before说明存在循环
+        forward = self._collect(after, self._successors, lambda position: position <= upper, before)
+        # 从before出发向前搜索位置不小于lower的节点
+        backward = self._collect(before, self._predecessors, lambda position: position >= lower)
+
+        backward.sort(key=self._position.get)
+        forward.sort(key=self._position.get)
+        nodes = backward + forward
+        positions = sorted(self._position[node] for node in nodes)
+        for node, position in zip(nodes, positions):
+            self._position[node] = position
+            self._order[position] = node
+
+    def _collect(self, start, neighbors, in_range, forbidden=None):
+        """深度优先搜索范围内可达的节点"""
+        visited = {start}
+        stack = [start]
+        while stack:
+            for neighbor in neighbors(stack.pop()):
+                if neighbor == forbidden:
+                    raise ValueError("添加该依赖会形成循环依赖")
+                if neighbor not in visited and in_range(self._position[neighbor]):
+                    visited.add(neighbor)
+                    stack.append(neighbor)
+        return list(visited)
+
+    def set_completed(self, node, completed):
+        """
+        更新节点的完成状态，只调整直接依赖它的节点
+
+        返回:
+            list: 可开始状态发生变化的节点
+        """
+        if self._completed[node] == completed:
+            return []
+
+        changed = []
+        was_ready = node in self.ready
+        self._completed[node] = completed
+        self._update_ready(node)
+        if was_ready != (node in self.ready):
+            changed.append(node)
+
+        for dependent in self._dependents[node]:
+            was_ready = dependent in self.ready
+            self._unmet[dependent] += -1 if completed else 1
+            self._update_ready(dependent)
+            if was_ready != (dependent in self.ready):
+                changed.append(dependent)
+        return changed
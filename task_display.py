@@ -2,40 +2,81 @@ import sys
 import json
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                                QHBoxLayout, QLabel, QPushButton, QScrollArea,
-                               QFrame, QSplitter, QGroupBox)
-from PySide6.QtCore import Qt, Signal, Slot, QObject
-from PySide6.QtWebEngineWidgets import QWebEngineView
-from PySide6.QtWebChannel import QWebChannel
+                               QFrame, QSplitter, QGroupBox, QLineEdit)
+from PySide6.QtCore import Qt, Signal, Slot, QObject, QTimer
+
+from perf_instrument import timed
+from task_data_handler import TaskDataHandler
+from task_history import UpdateTasksCommand
+from task_index import TaskIndex
+from task_store import TaskStore
+
+# 只读查看索引文件时每页显示的分组数
+VIEWER_PAGE_GROUPS = 50
 
 
 class TaskDisplayBridge(QObject):
     """JavaScript和Python之间的通信桥接"""
     # 定义信号
-    taskStatusChanged = Signal(str, int, bool)
-    subTaskStatusChanged = Signal(str, int, str, bool)
+    # 参数依次为任务id（独立查看器中没有id的任务为-1）、主题、分支序号，之后是子任务名和完成状态
+    taskStatusChanged = Signal(int, str, int, bool)
+    subTaskStatusChanged = Signal(int, str, int, str, bool)
+    taskClicked = Signal(int, bool)
 
     def __init__(self, parent=None):
         super().__init__(parent)
 
-    @Slot(str, int, bool)
-    def updateTaskStatus(self, subject, branch_number, completed):
+    @Slot(int, str, int, bool)
+    def updateTaskStatus(self, task_id, subject, branch_number, completed):
         """更新任务状态"""
-        self.taskStatusChanged.emit(subject, branch_number, completed)
+        self.taskStatusChanged.emit(task_id, subject, branch_number, completed)
 
-    @Slot(str, int, str, bool)
-    def updateSubTaskStatus(self, subject, branch_number, sub_task_name, completed):
+    @Slot(int, str, int, str, bool)
+    def updateSubTaskStatus(self, task_id, subject, branch_number, sub_task_name, completed):
         """更新子任务状态"""
-        self.subTaskStatusChanged.emit(subject, branch_number, sub_task_name, completed)
+        self.subTaskStatusChanged.emit(task_id, subject, branch_number, sub_task_name, completed)
+
+    @Slot(int, bool)
+    def selectTask(self, task_id, extend):
+        """点击任务卡片（extend 表示按住了Ctrl/Shift，切换选择而不是只选中该任务）"""
+        self.taskClicked.emit(task_id, extend)
+
+    @Slot(int, result=str)
+    def taskDetails(self, task_id):
+        """展开卡片时读取不在页面中的细节描述"""
+        return self.parent().task_details(task_id)
 
 
 class TaskDisplayPanel(QWidget):
-    """任务显示面板"""
+    """
+    任务显示面板
 
-    def __init__(self, parent=None):
+    参数:
+        lazy (bool): 为True时先显示占位控件，首次调用 ensure_web_view 时才导入并启动
+            QtWebEngine（Chromium进程、GPU合成等），避免拖慢主窗口的首次显示
+    """
+
+    # 点击任务卡片：任务id，是否扩展选择（按住Ctrl/Shift）
+    taskClicked = Signal(int, bool)
+
+    def __init__(self, parent=None, lazy=False):
         super().__init__(parent)
+        self.lazy = lazy
 
         # 初始化数据
         self.task_data = {}
+        # 主题 -> 分组版本号，以及按版本号缓存的主题卡片HTML
+        self.group_versions = {}
+        self._html_cache = {}
+        # 主题 -> 聚合统计（由共享存储增量维护），为None时按显示的任务计算
+        self.group_stats = None
+        # 共享任务存储，为None时只修改本地数据（独立查看器）
+        self.task_store = None
+        self.undo_stack = None
+        # 多选中的任务id，页面重新生成后恢复
+        self.selected_ids = set()
+        # 只读时不能勾选任务和子任务（查看索引文件时，显示的分组只是按页读取的副本）
+        self.read_only = False
 
         # 创建通信桥接
         self.bridge = TaskDisplayBridge(self)
@@ -46,20 +87,20 @@ class TaskDisplayPanel(QWidget):
         # 连接信号
         self.bridge.taskStatusChanged.connect(self.on_task_status_changed)
         self.bridge.subTaskStatusChanged.connect(self.on_subtask_status_changed)
+        self.bridge.taskClicked.connect(self.taskClicked)
 
     def setup_ui(self):
         """设置UI布局"""
         layout = QVBoxLayout(self)
         layout.setContentsMargins(0, 0, 0, 0)
 
-        # 创建Web视图 - 增加比例
-        self.web_view = QWebEngineView()
-        layout.addWidget(self.web_view, 95)  # 设置更大的伸缩因子，例如95%
-
-        # 设置Web通道
-        self.web_channel = QWebChannel()
-        self.web_channel.registerObject("taskBridge", self.bridge)
-        self.web_view.page().setWebChannel(self.web_channel)
+        # Web视图和Web通道在 ensure_web_view 中创建，之前先显示轻量的占位控件
+        self.web_view = None
+        self.web_channel = None
+        self.placeholder = QLabel("卡片视图加载中...")
+        self.placeholder.setAlignment(Qt.AlignCenter)
+        self.placeholder.setStyleSheet("color: #7f8c8d; font-size: 16px; padding: 20px;")
+        layout.addWidget(self.placeholder, 95)  # 设置更大的伸缩因子，例如95%
 
         # 创建控制按钮区域 - 减少比例
         control_frame = QFrame()
@@ -83,17 +124,130 @@ class TaskDisplayPanel(QWidget):
 
         layout.addWidget(control_frame, 5)  # 设置较小的伸缩因子，例如5%
 
-    def set_task_data(self, data):
-        """设置任务数据并更新显示"""
+        if not self.lazy:
+            self.ensure_web_view()
+
+    def ensure_web_view(self):
+        """创建Web视图和Web通道（只在第一次调用时导入并启动QtWebEngine），并显示当前数据"""
+        if self.web_view is not None:
+            return
+
+        from PySide6.QtWebChannel import QWebChannel
+        from PySide6.QtWebEngineWidgets import QWebEngineView
+
+        # 创建Web视图 - 替换占位控件
+        self.web_view = QWebEngineView()
+        layout = self.layout()
+        layout.removeWidget(self.placeholder)
+        self.placeholder.deleteLater()
+        self.placeholder = None
+        layout.insertWidget(0, self.web_view, 95)
+
+        # 设置Web通道
+        self.web_channel = QWebChannel()
+        self.web_channel.registerObject("taskBridge", self.bridge)
+        self.web_view.page().setWebChannel(self.web_channel)
+
+        self.refresh_display()
+
+    def set_task_data(self, data, versions=None, stats=None):
+        """
+        设置任务数据并更新显示
+
+        参数:
+            data (dict): 按主题分组的任务数据
+            versions (dict): 主题 -> 分组版本号。版本号未变化的主题直接复用缓存的HTML，
+                为None时不使用缓存
+            stats (dict): 主题 -> 聚合统计，与 data 中的分组一一对应时传入，
+                为None时按显示的任务计算（例如筛选后的子集）
+        """
         self.task_data = data
+        self.group_versions = versions or {}
+        self.group_stats = stats
+        self._html_cache = {
+            subject: cached for subject, cached in self._html_cache.items()
+            if subject in self.group_versions
+        }
         self.refresh_display()
 
+    def set_task_store(self, task_store, undo_stack=None):
+        """绑定共享任务存储，卡片视图中的修改将直接写入该存储（传入撤销栈时作为可撤销的命令执行）"""
+        self.task_store = task_store
+        self.undo_stack = undo_stack
+        if task_store is not None:
+            task_store.add_listener(self.on_store_changed)
+
+    def on_store_changed(self, event, tasks):
+        """共享存储变更时只同步被修改的任务"""
+        if event == "update":
+            self.sync_tasks(tasks)
+
+    def sync_tasks(self, tasks):
+        """
+        将共享存储中任务的状态同步到卡片视图，只更新对应的DOM节点而不重新生成整个页面，
+        批量修改时也只调用一次JavaScript
+
+        参数:
+            tasks (list): TaskListApp格式的任务对象
+        """
+        # 卡片数据就是存储中的分组投影，存储已更新条目，这里只需更新页面
+        if self.web_view is None:
+            return
+
+        updates = [
+            [task["id"], task["completed"], task["sub_task_tasks"],
+             self.format_stats(self.get_group_stats(task["main_task"]))]
+            for task in tasks if task["main_task"] in self.task_data
+        ]
+        if updates:
+            self.web_view.page().runJavaScript(f"syncTasks({json.dumps(updates, ensure_ascii=False)});")
+
+    def set_selection(self, task_ids):
+        """设置多选中的任务并同步到页面"""
+        self.selected_ids = set(task_ids)
+        if self.web_view is not None:
+            self.web_view.page().runJavaScript(f"setSelectedTasks({json.dumps(sorted(self.selected_ids))});")
+
+    def task_details(self, task_id):
+        """任务的细节描述（来自共享存储）"""
+        task = self.task_store.get(task_id) if self.task_store is not None else None
+        return self.task_store.details(task) if task is not None else ""
+
+    def get_group_stats(self, subject):
+        """获取主题的聚合统计，没有增量维护的统计时遍历显示的任务计算"""
+        if self.group_stats is not None and subject in self.group_stats:
+            return self.group_stats[subject]
+        return TaskStore.aggregate(self.task_data.get(subject, {}).get("tasks", []))
+
+    @staticmethod
+    def format_minutes(minutes):
+        """将分钟数格式化为“X小时Y分钟”"""
+        hours, minutes = divmod(minutes, 60)
+        if hours > 0 and minutes > 0:
+            return f"{hours}小时{minutes}分钟"
+        if hours > 0:
+            return f"{hours}小时"
+        return f"{minutes}分钟"
+
+    @staticmethod
+    def format_stats(stats):
+        """将聚合统计格式化为卡片头部显示的文本"""
+        return {
+            "completed": f"{stats['completed']}/{stats['count']}",
+            "remaining": TaskDisplayPanel.format_minutes(stats["remaining_minutes"]),
+            "progress": f"{TaskStore.weighted_completion(stats):.0%}"
+        }
+
     def refresh_display(self):
         """刷新任务显示"""
+        # Web视图尚未创建时只保留数据，创建后再生成页面
+        if self.web_view is None:
+            return
         html_content = self.generate_html()
         self.web_view.setHtml(html_content)
 
 
+    @timed("html", items=lambda args, result: len(args[0].task_data))
     def generate_html(self):
         """生成HTML内容"""
         # 开始HTML文档
@@ -182,6 +336,7 @@ class TaskDisplayPanel(QWidget):
                     right: 20px;
                     display: flex;
                     align-items: center;
+                    gap: 8px;
                 }
     
                 .stat-item {
@@ -224,6 +379,11 @@ class TaskDisplayPanel(QWidget):
                     box-shadow: 0 4px 12px rgba(0,0,0,0.05);
                     transform: translateY(-2px);
                 }
+
+                .branch-task.selected {
+                    border: 2px solid #f39c12;
+                    background-color: #fef5e7;
+                }
     
                 .branch-header {
                     padding: 10px 12px;
@@ -439,176 +599,17 @@ class TaskDisplayPanel(QWidget):
         else:
             # 遍历并生成每个主题的卡片
             for subject, subject_data in self.task_data.items():
-                # 获取主题信息
-                types = subject_data.get("Types", [])
-                sub_task_number = subject_data.get("sub_task_number", 0)
-                tasks = subject_data.get("tasks", [])
-
-                # 计算已完成任务数
-                completed_tasks = sum(1 for task in tasks if task.get("completed", False))
-
-                # 生成主题卡片头部
-                html += f"""
-                    <div class="task-card">
-                        <div class="task-header">
-                            <div>
-                                <div class="task-title">{subject}</div>
-                                <div class="task-meta">
-                    """
-
-                # 添加类型标签
-                for task_type in types:
-                    html += f'            <span class="task-type-badge">{task_type}</span>\n'
-
-                # 添加子任务数量信息
-                html += f"""
-                                <div class="task-meta-item">
-                                    <span class="task-meta-label">分支任务总数:</span>
-                                    <span>{sub_task_number}</span>
-                                </div>
-                            </div>
-                        </div>
-                        <div class="task-stats">
-                            <div class="stat-item">
-                                <span class="stat-value">{completed_tasks}/{sub_task_number}</span>
-                                <span class="stat-label">已完成</span>
-                            </div>
-                        </div>
-                    </div>
-                    <div class="task-content">
-                    """
-
-                # 按分支号排序任务
-                sorted_tasks = sorted(tasks, key=lambda x: x.get("branch_number", 0))
-
-                # 生成每个分支任务的HTML
-                for task in sorted_tasks:
-                    # 获取分支任务信息
-                    branch_number = task.get("branch_number", 0)
-                    sub_task_name = task.get("sub_task_name", "")
-                    details = task.get("details", "")
-                    estimated_hours = task.get("estimated_time_hours", 0)
-                    estimated_minutes = task.get("estimated_time_minutes", 0)
-                    completed = task.get("completed", False)
-                    weight = task.get("weight", 0)
-                    sub_tasks = task.get("sub_task_tasks", {})
-
-                    # 设置样式类
-                    completed_class = "completed" if completed else ""
-                    checked_class = "checked" if completed else ""
-
-                    # 格式化时间显示
-                    time_str = ""
-                    if estimated_hours > 0:
-                        time_str += f"{estimated_hours}小时"
-                    if estimated_minutes > 0 or (estimated_hours == 0 and estimated_minutes == 0):
-                        if time_str:
-                            time_str += " "
-                        time_str += f"{estimated_minutes}分钟"
-                    if not time_str:
-                        time_str = "无预计时间"
-
-                    # 生成分支任务HTML
-                    html += f"""
-                        <div class="branch-task" data-subject="{subject}" data-branch="{branch_number}">
-                            <div class="branch-header">
-                                <div class="branch-left">
-                                    <div class="branch-checkbox {checked_class}" onclick="toggleTaskCompleted(event, '{subject}', {branch_number})">
-                                        <span class="checkmark">✓</span>
-                                    </div>
-                                    <span class="branch-name {completed_class}">{sub_task_name}</span>
-                                </div>
-                                <span class="branch-number">#{branch_number}</span>
-                                <div class="branch-toggle" onclick="toggleBranchDetails(this)">
-                                    <svg width="12" height="12" viewBox="0 0 24 24" fill="none" xmlns="http://www.w3.org/2000/svg">
-                                        <path d="M6 9L12 15L18 9" stroke="#4A5568" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"/>
-                                    </svg>
-                                </div>
-                            </div>
-                            <div class="branch-details">
-                        """
-
-                    # 添加详情内容
-                    if details:
-                        html += f"""
-                                <div class="detail-item">
-                                    <span class="detail-icon">📝</span>
-                                    <span class="detail-label">详情:</span>
-                                    <span class="detail-value">{details}</span>
-                                </div>
-                            """
-
-                    # 添加时间和权重信息
-                    html += f"""
-                                <div class="detail-item">
-                                    <span class="detail-icon">⏱️</span>
-                                    <span class="detail-label">预计时间:</span>
-                                    <span class="detail-value">{time_str}</span>
-                                </div>
-                                <div class="detail-item">
-                                    <span class="detail-icon">⚖️</span>
-                                    <span class="detail-label">权重:</span>
-                                    <span class="detail-value">{weight}</span>
-                                </div>
-                        """
-
-                    # 添加子任务列表
-                    if sub_tasks and ((isinstance(sub_tasks, dict) and len(sub_tasks) > 0) or
-                                      (isinstance(sub_tasks, list) and len(sub_tasks) > 0)):
-                        html += """
-                                    <div class="subtasks-list">
-                                        <div class="subtasks-header">子任务列表:</div>
-                            """
-
-                        # 处理子任务 - 字典形式
-                        if isinstance(sub_tasks, dict):
-                            for sub_task_name, sub_task_completed in sub_tasks.items():
-                                sub_completed_class = "completed" if sub_task_completed else ""
-                                sub_checked_class = "checked" if sub_task_completed else ""
-
-                                html += f"""
-                                        <div class="subtask-item">
-                                            <div class="subtask-checkbox {sub_checked_class}" 
-                                                 onclick="toggleSubTaskCompleted(event, '{subject}', {branch_number}, '{sub_task_name}')">
-                                                <span class="checkmark">✓</span>
-                                            </div>
-                                            <span class="subtask-name {sub_completed_class}">{sub_task_name}</span>
-                                        </div>
-                                    """
-                        # 处理子任务 - 列表形式
-                        elif isinstance(sub_tasks, list):
-                            for sub_task_name in sub_tasks:
-                                html += f"""
-                                        <div class="subtask-item">
-                                            <div class="subtask-checkbox" 
-                                                 onclick="toggleSubTaskCompleted(event, '{subject}', {branch_number}, '{sub_task_name}')">
-                                                <span class="checkmark">✓</span>
-                                            </div>
-                                            <span class="subtask-name">{sub_task_name}</span>
-                                        </div>
-                                    """
-
-                        html += """
-                                    </div>
-                            """
-
-                    # 关闭分支任务详情和分支任务div
-                    html += """
-                                </div>
-                            </div>
-                        """
-
-                # 关闭当前主题的task-content和task-card
-                html += """
-                        </div>
-                    </div>
-                    """
+                html += self.get_subject_html(subject, subject_data)
 
         # 所有主题循环结束后，再添加JavaScript代码
-        html += """
+        html += f"""
                 </div>
 
                 <script>
+                    const SELECTED_TASKS = {json.dumps(sorted(self.selected_ids))};
+                    const READ_ONLY = {json.dumps(self.read_only)};
+"""
+        html += """
                     // 初始化与Python的通信
                     function initializeChannel() {
                         if (typeof window.taskBridge !== 'undefined') {
@@ -635,14 +636,36 @@ class TaskDisplayPanel(QWidget):
                             detailsElement.classList.remove('visible');
                             element.classList.remove('expanded');
                         } else {
+                            loadLazyDetails(detailsElement);
                             detailsElement.classList.add('visible');
                             element.classList.add('expanded');
                         }
                     }
 
+                    // 较长的细节描述不在页面中，第一次展开时再向Python读取
+                    function loadLazyDetails(detailsElement) {
+                        const lazy = detailsElement.querySelector('.lazy-details');
+                        if (!lazy || !window.taskBridge) {
+                            return;
+                        }
+                        lazy.classList.remove('lazy-details');
+                        window.taskBridge.taskDetails(parseInt(lazy.dataset.id), function(text) {
+                            lazy.textContent = text;
+                        });
+                    }
+
+                    // 卡片对应的任务id，独立查看器中的任务没有id时为-1
+                    function cardTaskId(branchTask) {
+                        const taskId = parseInt(branchTask.dataset.id);
+                        return isNaN(taskId) ? -1 : taskId;
+                    }
+
                     // 切换任务完成状态
                     function toggleTaskCompleted(event, subject, branchNumber) {
                         event.stopPropagation();  // 防止触发详情展开
+                        if (READ_ONLY) {
+                            return;
+                        }
 
                         const branchTask = event.target.closest('.branch-task');
                         const checkbox = branchTask.querySelector('.branch-checkbox');
@@ -658,16 +681,21 @@ class TaskDisplayPanel(QWidget):
                             taskName.classList.add('completed');
                         }
 
-                        // 通知Python
+                        // 通知Python（同一分组中的分支序号可能重复，按卡片的任务id定位任务）
                         if (window.taskBridge) {
-                            window.taskBridge.updateTaskStatus(subject, branchNumber, !isCompleted);
+                            window.taskBridge.updateTaskStatus(
+                                cardTaskId(branchTask), subject, branchNumber, !isCompleted);
                         }
                     }
 
                     // 切换子任务完成状态
                     function toggleSubTaskCompleted(event, subject, branchNumber, subTaskName) {
                         event.stopPropagation();
+                        if (READ_ONLY) {
+                            return;
+                        }
 
+                        const branchTask = event.target.closest('.branch-task');
                         const subTaskItem = event.target.closest('.subtask-item');
                         const checkbox = subTaskItem.querySelector('.subtask-checkbox');
                         const taskName = subTaskItem.querySelector('.subtask-name');
@@ -684,16 +712,68 @@ class TaskDisplayPanel(QWidget):
 
                         // 通知Python
                         if (window.taskBridge) {
-                            window.taskBridge.updateSubTaskStatus(subject, branchNumber, subTaskName, !isCompleted);
+                            window.taskBridge.updateSubTaskStatus(
+                                cardTaskId(branchTask), subject, branchNumber, subTaskName, !isCompleted);
+                        }
+                    }
+
+                    // 同步任务及其子任务的完成状态和所在卡片的统计（由Python调用）
+                    function syncTaskStatus(taskId, completed, subTasks, stats) {
+                        const branchTask = document.querySelector('.branch-task[data-id="' + taskId + '"]');
+                        if (!branchTask) {
+                            return;
+                        }
+
+                        branchTask.querySelector('.branch-checkbox').classList.toggle('checked', completed);
+                        branchTask.querySelector('.branch-name').classList.toggle('completed', completed);
+
+                        branchTask.querySelectorAll('.subtask-item').forEach(item => {
+                            const taskName = item.querySelector('.subtask-name');
+                            const subCompleted = !Array.isArray(subTasks) && subTasks[taskName.textContent] === true;
+                            item.querySelector('.subtask-checkbox').classList.toggle('checked', subCompleted);
+                            taskName.classList.toggle('completed', subCompleted);
+                        });
+
+                        const card = branchTask.closest('.task-card');
+                        Object.keys(stats).forEach(key => {
+                            const statValue = card.querySelector('.stat-value[data-stat="' + key + '"]');
+                            if (statValue) {
+                                statValue.textContent = stats[key];
+                            }
+                        });
+                    }
+
+                    // 批量同步多个任务（由Python调用），每项为 syncTaskStatus 的参数
+                    function syncTasks(updates) {
+                        updates.forEach(args => syncTaskStatus(...args));
+                    }
+
+                    // 点击任务卡片选择任务，按住Ctrl/Shift时切换选择（勾选框和展开按钮除外）
+                    function selectTask(event, element) {
+                        if (event.target.closest('.branch-checkbox, .branch-toggle, .subtask-item')) {
+                            return;
+                        }
+                        const taskId = parseInt(element.dataset.id);
+                        if (window.taskBridge && !isNaN(taskId)) {
+                            window.taskBridge.selectTask(taskId, event.ctrlKey || event.metaKey || event.shiftKey);
                         }
                     }
 
+                    // 设置多选中的任务（由Python调用）
+                    function setSelectedTasks(taskIds) {
+                        const selected = new Set(taskIds.map(String));
+                        document.querySelectorAll('.branch-task').forEach(branchTask => {
+                            branchTask.classList.toggle('selected', selected.has(branchTask.dataset.id));
+                        });
+                    }
+
                     // 展开所有分支任务详情
                     function expandAllTasks() {
                         const details = document.querySelectorAll('.branch-details');
                         const toggles = document.querySelectorAll('.branch-toggle');
 
                         details.forEach(detail => {
+                            loadLazyDetails(detail);
                             detail.classList.add('visible');
                         });
 
@@ -716,9 +796,10 @@ class TaskDisplayPanel(QWidget):
                         });
                     }
 
-                    // 页面加载完成后初始化
+                    // 页面加载完成后初始化，并恢复重新生成页面前的选择
                     document.addEventListener('DOMContentLoaded', function() {
                         initializeChannel();
+                        setSelectedTasks(SELECTED_TASKS);
                     });
                 </script>
             </body>
@@ -727,69 +808,286 @@ class TaskDisplayPanel(QWidget):
 
         return html
 
-    def on_task_status_changed(self, subject, branch_number, completed):
+    def get_subject_html(self, subject, subject_data):
+        """
+        获取单个主题卡片的HTML，分组版本号未变化时直接使用缓存
+
+        参数:
+            subject (str): 主题（总标题）
+            subject_data (dict): 主题数据
+
+        返回:
+            str: 主题卡片HTML
+        """
+        version = self.group_versions.get(subject)
+        cached = self._html_cache.get(subject)
+        if version is not None and cached is not None and cached[0] == version:
+            return cached[1]
+
+        html = self.generate_subject_html(subject, subject_data)
+        if version is not None:
+            self._html_cache[subject] = (version, html)
+        return html
+
+    def generate_subject_html(self, subject, subject_data):
+        """生成单个主题卡片的HTML"""
+        html = ""
+
+        # 获取主题信息（分组在加载时已转换为规范形式，见 TaskDataHandler.normalize_group）
+        types = subject_data["Types"]
+        sub_task_number = subject_data["sub_task_number"]
+        tasks = subject_data["tasks"]
+
+        # 已完成数、剩余时间和加权完成度
+        stats = self.format_stats(self.get_group_stats(subject))
+
+        # 生成主题卡片头部
+        html += f"""
+            <div class="task-card">
+                <div class="task-header">
+                    <div>
+                        <div class="task-title">{subject}</div>
+                        <div class="task-meta">
+            """
+
+        # 添加类型标签
+        for task_type in types:
+            html += f'            <span class="task-type-badge">{task_type}</span>\n'
+
+        # 添加子任务数量信息
+        html += f"""
+                        <div class="task-meta-item">
+                            <span class="task-meta-label">分支任务总数:</span>
+                            <span>{sub_task_number}</span>
+                        </div>
+                    </div>
+                </div>
+                <div class="task-stats">
+                    <div class="stat-item">
+                        <span class="stat-value" data-stat="completed">{stats['completed']}</span>
+                        <span class="stat-label">已完成</span>
+                    </div>
+                    <div class="stat-item">
+                        <span class="stat-value" data-stat="remaining">{stats['remaining']}</span>
+                        <span class="stat-label">剩余时间</span>
+                    </div>
+                    <div class="stat-item">
+                        <span class="stat-value" data-stat="progress">{stats['progress']}</span>
+                        <span class="stat-label">加权完成</span>
+                    </div>
+                </div>
+            </div>
+            <div class="task-content">
+            """
+
+        # 生成每个分支任务的HTML，分组内的任务已按分支号排列
+        for task in tasks:
+            # 获取分支任务信息
+            branch_number = task["branch_number"]
+            sub_task_name = task["sub_task_name"]
+            # 条目中没有细节描述时（较长的描述移出了任务存储）展开后再读取
+            lazy_details = "details" not in task and task.get("id") is not None
+            details = task.get("details", "")
+            estimated_hours = task["estimated_time_hours"]
+            estimated_minutes = task["estimated_time_minutes"]
+            completed = task["completed"]
+            weight = task["weight"]
+            sub_tasks = task["sub_task_tasks"]
+
+            # 设置样式类
+            completed_class = "completed" if completed else ""
+            checked_class = "checked" if completed else ""
+
+            # 格式化时间显示
+            time_str = ""
+            if estimated_hours > 0:
+                time_str += f"{estimated_hours}小时"
+            if estimated_minutes > 0 or (estimated_hours == 0 and estimated_minutes == 0):
+                if time_str:
+                    time_str += " "
+                time_str += f"{estimated_minutes}分钟"
+            if not time_str:
+                time_str = "无预计时间"
+
+            # 生成分支任务HTML
+            html += f"""
+                <div class="branch-task" data-subject="{subject}" data-branch="{branch_number}" data-id="{task.get('id') or ''}" onclick="selectTask(event, this)">
+                    <div class="branch-header">
+                        <div class="branch-left">
+                            <div class="branch-checkbox {checked_class}" onclick="toggleTaskCompleted(event, '{subject}', {branch_number})">
+                                <span class="checkmark">✓</span>
+                            </div>
+                            <span class="branch-name {completed_class}">{sub_task_name}</span>
+                        </div>
+                        <span class="branch-number">#{branch_number}</span>
+                        <div class="branch-toggle" onclick="toggleBranchDetails(this)">
+                            <svg width="12" height="12" viewBox="0 0 24 24" fill="none" xmlns="http://www.w3.org/2000/svg">
+                                <path d="M6 9L12 15L18 9" stroke="#4A5568" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"/>
+                            </svg>
+                        </div>
+                    </div>
+                    <div class="branch-details">
+                """
+
+            # 添加详情内容
+            if lazy_details:
+                html += f"""
+                        <div class="detail-item">
+                            <span class="detail-icon">📝</span>
+                            <span class="detail-label">详情:</span>
+                            <span class="detail-value lazy-details" data-id="{task['id']}">加载中...</span>
+                        </div>
+                    """
+            elif details:
+                html += f"""
+                        <div class="detail-item">
+                            <span class="detail-icon">📝</span>
+                            <span class="detail-label">详情:</span>
+                            <span class="detail-value">{details}</span>
+                        </div>
+                    """
+
+            # 添加时间和权重信息
+            html += f"""
+                        <div class="detail-item">
+                            <span class="detail-icon">⏱️</span>
+                            <span class="detail-label">预计时间:</span>
+                            <span class="detail-value">{time_str}</span>
+                        </div>
+                        <div class="detail-item">
+                            <span class="detail-icon">⚖️</span>
+                            <span class="detail-label">权重:</span>
+                            <span class="detail-value">{weight}</span>
+                        </div>
+                """
+
+            # 添加子任务列表
+            if sub_tasks:
+                html += """
+                            <div class="subtasks-list">
+                                <div class="subtasks-header">子任务列表:</div>
+                    """
+
+                for sub_task_name, sub_task_completed in sub_tasks.items():
+                    sub_completed_class = "completed" if sub_task_completed else ""
+                    sub_checked_class = "checked" if sub_task_completed else ""
+
+                    html += f"""
+                            <div class="subtask-item">
+                                <div class="subtask-checkbox {sub_checked_class}" 
+                                     onclick="toggleSubTaskCompleted(event, '{subject}', {branch_number}, '{sub_task_name}')">
+                                    <span class="checkmark">✓</span>
+                                </div>
+                                <span class="subtask-name {sub_completed_class}">{sub_task_name}</span>
+                            </div>
+                        """
+
+                html += """
+                            </div>
+                    """
+
+            # 关闭分支任务详情和分支任务div
+            html += """
+                        </div>
+                    </div>
+                """
+
+        # 关闭当前主题的task-content和task-card
+        html += """
+                </div>
+            </div>
+            """
+
+        return html
+
+    @timed("bridge")
+    def on_task_status_changed(self, task_id, subject, branch_number, completed):
         """处理任务状态变更"""
-        # 更新数据模型
-        if subject in self.task_data:
+        if self.read_only:
+            return
+        if self.task_store is not None and task_id >= 0:
+            # 按id写入共享存储，卡片数据由存储的变更通知同步
+            task = self.task_store.get(task_id)
+            if task is None:
+                return
+            if self.undo_stack is not None:
+                self.undo_stack.push(UpdateTasksCommand.completion(task, completed))
+            else:
+                self.task_store.set_completed(task_id, completed)
+            print(f"任务 '{subject}:{task['sub_task']}' 状态已更新为: {'已完成' if completed else '未完成'}")
+        elif subject in self.task_data:
+            # 独立查看器中的任务没有id，按分支序号修改本地数据
             for task in self.task_data[subject]["tasks"]:
-                if task.get("branch_number") == branch_number:
+                if task["branch_number"] == branch_number:
                     task["completed"] = completed
                     print(
                         f"任务 '{subject}:{task['sub_task_name']}' 状态已更新为: {'已完成' if completed else '未完成'}")
-                    # 可能需要刷新显示
-                    # self.refresh_display()  # 取消注释如果需要刷新整个视图
                     break
 
-    def on_subtask_status_changed(self, subject, branch_number, sub_task_name, completed):
+    @timed("bridge")
+    def on_subtask_status_changed(self, task_id, subject, branch_number, sub_task_name, completed):
         """处理子任务状态变更"""
-        # 更新数据模型
-        if subject in self.task_data:
+        if self.read_only:
+            return
+        if self.task_store is not None and task_id >= 0:
+            # 按id写入共享存储，卡片数据由存储的变更通知同步
+            task = self.task_store.get(task_id)
+            if task is None:
+                return
+            if self.undo_stack is not None:
+                self.undo_stack.push(UpdateTasksCommand.subtask_completion(task, sub_task_name, completed))
+            else:
+                self.task_store.set_subtask_completed(task_id, sub_task_name, completed)
+            print(
+                f"子任务 '{subject}:{task['sub_task']}:{sub_task_name}' 状态已更新为: {'已完成' if completed else '未完成'}")
+        elif subject in self.task_data:
+            # 独立查看器中的任务没有id，按分支序号修改本地数据
             for task in self.task_data[subject]["tasks"]:
-                if task.get("branch_number") == branch_number:
-                    # 检查子任务存储格式
-                    if isinstance(task.get("sub_task_tasks"), dict):
-                        task["sub_task_tasks"][sub_task_name] = completed
-                    elif isinstance(task.get("sub_task_tasks"), list):
-                        # 如果是列表，转换为字典
-                        sub_tasks_dict = {}
-                        for st in task["sub_task_tasks"]:
-                            sub_tasks_dict[st] = False
-                        sub_tasks_dict[sub_task_name] = completed
-                        task["sub_task_tasks"] = sub_tasks_dict
-
+                if task["branch_number"] == branch_number:
+                    task["sub_task_tasks"][sub_task_name] = completed
                     print(
                         f"子任务 '{subject}:{task['sub_task_name']}:{sub_task_name}' 状态已更新为: {'已完成' if completed else '未完成'}")
-                    # 可能需要刷新显示
-                    # self.refresh_display()  # 取消注释如果需要刷新整个视图
                     break
 
     def expand_all_tasks(self):
         """展开所有任务详情"""
-        self.web_view.page().runJavaScript("expandAllTasks();")
+        if self.web_view is not None:
+            self.web_view.page().runJavaScript("expandAllTasks();")
 
     def collapse_all_tasks(self):
         """折叠所有任务详情"""
-        self.web_view.page().runJavaScript("collapseAllTasks();")
+        if self.web_view is not None:
+            self.web_view.page().runJavaScript("collapseAllTasks();")
 
     def load_from_json(self, file_path):
-        """从JSON文件加载任务数据"""
+        """从JSON文件加载任务数据（压缩的文件自动识别）"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                self.set_task_data(data)
-                return True
+            # 逐个分组校验并转换为规范形式，任务也在这时按分支号排列，之后每次渲染直接使用
+            data = dict(TaskDataHandler.iter_groups_from_text(TaskDataHandler.read_tasks_text(file_path)))
+            self.set_task_data(data)
+            return True
         except Exception as e:
             print(f"加载JSON数据失败: {e}")
             return False
 
 class TaskViewerApp(QMainWindow):
-    """任务查看器应用"""
+    """
+    任务查看器应用
+
+    打开任务文件时整体加载并显示；打开索引文件（task_cli.py index 导出）时进入只读的分页模式：
+    文件只做内存映射，每页只解析显示的分组，搜索使用文件中的索引。
+    """
 
     def __init__(self):
         super().__init__()
         self.setWindowTitle("任务查看器")
         self.setGeometry(100, 100, 1000, 700)
 
+        # 分页模式下打开的索引文件，当前页，以及搜索结果（分组序号 -> 命中的任务序号，未搜索时为None）
+        self.task_index = None
+        self.page = 0
+        self.matches = None
+
         # 创建中央部件
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -809,6 +1107,31 @@ class TaskViewerApp(QMainWindow):
         self.load_btn.clicked.connect(self.load_task_data)
         control_layout.addWidget(self.load_btn)
 
+        # 分页模式的搜索和翻页控件，打开索引文件后显示
+        self.index_frame = QFrame()
+        index_layout = QHBoxLayout(self.index_frame)
+        index_layout.setContentsMargins(0, 0, 0, 0)
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("搜索索引文件中的任务")
+        index_layout.addWidget(self.search_input)
+        self.prev_btn = QPushButton("上一页")
+        self.prev_btn.clicked.connect(lambda: self.show_page(self.page - 1))
+        index_layout.addWidget(self.prev_btn)
+        self.page_label = QLabel()
+        index_layout.addWidget(self.page_label)
+        self.next_btn = QPushButton("下一页")
+        self.next_btn.clicked.connect(lambda: self.show_page(self.page + 1))
+        index_layout.addWidget(self.next_btn)
+        self.index_frame.hide()
+        control_layout.addWidget(self.index_frame, 1)
+
+        # 输入停止后再搜索，很大的文件不会每输入一个字就扫描一遍
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(300)
+        self.search_timer.timeout.connect(self.search_index)
+        self.search_input.textChanged.connect(self.search_timer.start)
+
         layout.addWidget(control_frame)
 
         # 加载示例数据
@@ -879,66 +1202,122 @@ class TaskViewerApp(QMainWindow):
         from PySide6.QtWidgets import QFileDialog
 
         file_path, _ = QFileDialog.getOpenFileName(
-            self, "选择任务数据文件", "", "JSON文件 (*.json)")
+            self, "选择任务数据文件", "",
+            "任务文件 (*.json *.json.gz *.json.xz *.taskidx);;所有文件 (*)")
 
         if file_path:
-            success = self.task_display.load_from_json(file_path)
+            try:
+                is_index = TaskIndex.is_index_file(file_path)
+            except OSError as e:
+                print(f"读取文件失败: {e}")
+                return
+            if is_index:
+                success = self.open_index(file_path)
+            else:
+                self.close_index()
+                success = self.task_display.load_from_json(file_path)
             if success:
                 from PySide6.QtWidgets import QMessageBox
                 QMessageBox.information(self, "加载成功", "任务数据已成功加载")
 
+    def open_index(self, file_path):
+        """以只读分页模式打开索引文件，只映射文件并显示第一页"""
+        try:
+            task_index = TaskIndex(file_path)
+        except (OSError, ValueError) as e:
+            print(f"打开索引文件失败: {e}")
+            return False
+        self.close_index()
+        self.task_index = task_index
+        self.task_display.read_only = True
+        self.index_frame.show()
+        self.search_input.blockSignals(True)
+        self.search_input.clear()
+        self.search_input.blockSignals(False)
+        self.setWindowTitle(f"任务查看器 - {file_path}（只读）")
+        self.show_page(0)
+        return True
+
+    def close_index(self):
+        """退出分页模式"""
+        if self.task_index is None:
+            return
+        self.search_timer.stop()
+        # 先丢弃显示的数据，再关闭映射
+        self.task_display.set_task_data({})
+        self.task_index.close()
+        self.task_index = None
+        self.matches = None
+        self.task_display.read_only = False
+        self.index_frame.hide()
+        self.setWindowTitle("任务查看器")
+
+    def search_index(self):
+        """在索引文件中搜索，之后只分页显示有命中任务的分组"""
+        if self.task_index is None:
+            return
+        query = self.search_input.text().strip()
+        self.matches = self.task_index.search(query) if query else None
+        self.show_page(0)
+
+    def show_page(self, page):
+        """显示第 page 页：只读取并解析这一页的分组，搜索时只保留命中的任务"""
+        if self.task_index is None:
+            return
+        group_indexes = sorted(self.matches) if self.matches is not None else range(len(self.task_index))
+        page_count = max(1, -(-len(group_indexes) // VIEWER_PAGE_GROUPS))
+        self.page = min(max(page, 0), page_count - 1)
+
+        data = {}
+        start = self.page * VIEWER_PAGE_GROUPS
+        for group_index in group_indexes[start:start + VIEWER_PAGE_GROUPS]:
+            subject, subject_data = self.task_index.group(group_index)
+            if self.matches is not None:
+                tasks = subject_data["tasks"]
+                subject_data["tasks"] = [tasks[i] for i in self.matches[group_index]]
+            subject_data["tasks"].sort(key=lambda x: x["branch_number"])
+            data[subject] = subject_data
+        self.task_display.set_task_data(data)
+
+        if self.matches is not None:
+            summary = f"找到 {sum(map(len, self.matches.values()))} 个任务，{len(group_indexes)} 个分组"
+        else:
+            summary = f"共 {len(group_indexes)} 个分组，{self.task_index.task_count} 个任务"
+        self.page_label.setText(f"第 {self.page + 1}/{page_count} 页，{summary}")
+        self.prev_btn.setEnabled(self.page > 0)
+        self.next_btn.setEnabled(self.page < page_count - 1)
+
 # 集成到现有程序的辅助类
 class TaskDisplayIntegration:
     """任务显示集成类"""
 
     @staticmethod
-    def create_display_tab(parent=None):
-        """创建任务显示标签页"""
+    def create_display_tab(parent=None, task_store=None, lazy=False, undo_stack=None):
+        """创建任务显示标签页，lazy为True时延迟创建Web视图，传入撤销栈时卡片中的修改可以撤销"""
         display_widget = QWidget(parent)
         layout = QVBoxLayout(display_widget)
         layout.setContentsMargins(0, 0, 0, 0)
 
-        task_display = TaskDisplayPanel(display_widget)
+        task_display = TaskDisplayPanel(display_widget, lazy=lazy)
+        task_display.set_task_store(task_store, undo_stack)
         layout.addWidget(task_display)
 
         return display_widget, task_display
 
     @staticmethod
+    @timed("convert", items=lambda args, result: len(args[0]))
     def convert_task_format(tasks):
-        """将TaskListApp格式的任务转换为TaskDisplayPanel格式"""
-        # 按主任务分组
-        task_groups = {}
-
-        for task in tasks:
-            main_task = task["main_task"]
-            if main_task not in task_groups:
-                task_groups[main_task] = {
-                    "Types": [task["main_task_type"]],
-                    "describe": "",
-                    "tasks": [],
-                    "sub_task_number": 0
-                }
-
-            # 转换任务格式
-            formatted_task = {
-                "branch_number": task["branch_number"],
-                "sub_task_name": task["sub_task"],
-                "details": task["details"],
-                "sub_task_tasks": task.get("sub_task_tasks", {}),
-                "estimated_time_hours": int(task["estimated_time"]),
-                "estimated_time_minutes": int((task["estimated_time"] - int(task["estimated_time"])) * 60),
-                "completed": task["completed"],
-                "weight": task["weight"]
-            }
-
-            task_groups[main_task]["tasks"].append(formatted_task)
-            task_groups[main_task]["sub_task_number"] += 1
-
-        return task_groups
+        """
+        将TaskListApp格式的任务转换为TaskDisplayPanel格式。
+        使用共享存储时应改用 TaskStore.grouped_view，它增量维护同样的分组数据。
+        """
+        return TaskDataHandler.group_tasks(tasks)
 
 
 # 如果直接运行此文件
 if __name__ == "__main__":
+    # QtWebEngine在QApplication创建之后才导入，需要提前开启OpenGL上下文共享
+    QApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
     app = QApplication(sys.argv)
     window = TaskViewerApp()
     window.show()
@@ -0,0 +1,147 @@
+import bisect
+import mmap
+import os
+import tempfile
+from collections import OrderedDict
+
+# 超过该字数的细节描述移出任务对象，保存在 DetailStore 中
+DETAIL_SPILL_CHARS = 256
+# 最近读取的细节描述的缓存条数
+DETAIL_CACHE_SIZE = 256
+
+
+class DetailStore:
+    """
+    大段细节描述的旁路存储。
+
+    文本以UTF-8追加写入临时文件，内存中每段只保留 (偏移, 长度)；展开卡片、显示任务详情、
+    保存或导出时按偏移读取，最近读取的文本保留在有界的LRU缓存中。
+    另外追加一份小写的文本，搜索时在内存映射的文件中直接查找关键词，
+    只把命中位置换算成任务，不需要把每段文本读回内存。
+
+    修改或删除后旧的文本留在文件中成为空洞，空洞超过文件的一半时整理一次。
+    """
+
+    def __init__(self, cache_size=DETAIL_CACHE_SIZE):
+        self.cache_size = cache_size
+        # 键（任务id） -> (文本偏移, 文本长度, 小写文本偏移, 小写文本长度)，均以字节计
+        self._refs = {}
+        self._cache = OrderedDict()
+        # 临时文件，第一次写入时创建
+        self._text_file = None
+        self._folded_file = None
+        # 小写文本文件中各段的起始偏移（递增）和对应的键，用于把搜索命中位置换算成键
+        self._starts = []
+        self._keys = []
+        # 已失效的字节数
+        self.dead_bytes = 0
+
+    def __contains__(self, key):
+        return key in self._refs
+
+    def __len__(self):
+        return len(self._refs)
+
+    @staticmethod
+    def _append(f, data):
+        f.seek(0, os.SEEK_END)
+        offset = f.tell()
+        f.write(data)
+        return offset
+
+    def put(self, key, text):
+        """保存（或替换）一段文本"""
+        if self._text_file is None:
+            self._text_file = tempfile.TemporaryFile()
+            self._folded_file = tempfile.TemporaryFile()
+        self.discard(key)
+        data = text.encode("utf-8")
+        folded = text.lower().encode("utf-8")
+        offset = self._append(self._text_file, data)
+        folded_offset = self._append(self._folded_file, folded)
+        self._refs[key] = (offset, len(data), folded_offset, len(folded))
+        self._starts.append(folded_offset)
+        self._keys.append(key)
+        self._compact_if_needed()
+
+    def get(self, key):
+        """
+        读取一段文本
+
+        异常:
+            KeyError: 没有该键
+        """
+        text = self._cache.get(key)
+        if text is not None:
+            self._cache.move_to_end(key)
+            return text
+        offset, length = self._refs[key][:2]
+        self._text_file.seek(offset)
+        text = self._text_file.read(length).decode("utf-8")
+        self._cache[key] = text
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return text
+
+    def pop(self, key):
+        """读取并删除一段文本"""
+        text = self.get(key)
+        self.discard(key)
+        return text
+
+    def discard(self, key):
+        """删除一段文本（不存在时忽略）"""
+        ref = self._refs.pop(key, None)
+        if ref is not None:
+            self._cache.pop(key, None)
+            self.dead_bytes += ref[1] + ref[3]
+
+    def search(self, query):
+        """
+        在全部文本中查找关键词（不区分大小写，与 TaskDataHandler.search_tasks 相同）
+
+        返回:
+            set: 文本包含关键词的键
+        """
+        if not query or not self._refs:
+            return set()
+        self._folded_file.flush()
+        if os.fstat(self._folded_file.fileno()).st_size == 0:
+            return set()
+        needle = query.lower().encode("utf-8")
+        matched = set()
+        with mmap.mmap(self._folded_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            position = data.find(needle)
+            while position != -1:
+                index = bisect.bisect_right(self._starts, position) - 1
+                key = self._keys[index]
+                ref = self._refs.get(key)
+                # 命中位置必须完整落在一段仍然有效的文本中
+                if ref is not None and ref[2] == self._starts[index] and position + len(needle) <= ref[2] + ref[3]:
+                    matched.add(key)
+                    # 同一段中的其余命中不需要再换算
+                    position = data.find(needle, ref[2] + ref[3])
+                else:
+                    position = data.find(needle, position + 1)
+        return matched
+
+    def _compact_if_needed(self):
+        total = self._text_file.tell() + self._folded_file.tell()
+        if self.dead_bytes > 1024 * 1024 and self.dead_bytes * 2 > total:
+            texts = {key: self.get(key) for key in self._refs}
+            self.clear()
+            for key, text in texts.items():
+                self.put(key, text)
+
+    def clear(self):
+        """删除全部文本并关闭临时文件"""
+        for f in (self._text_file, self._folded_file):
+            if f is not None:
+                f.close()
+        self._text_file = None
+        self._folded_file = None
+        self._refs = {}
+        self._cache = OrderedDict()
+        self._starts = []
+        self._keys = []
+        self.dead_bytes = 0
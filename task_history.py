@@ -0,0 +1,378 @@
+import copy
+
+# 撤销栈中保留的命令数
+UNDO_LIMIT = 100
+
+# 修改后只需就地同步控件、不需要重建列表视图中分组的字段
+IN_PLACE_FIELDS = ("completed", "sub_task_tasks")
+
+
+class TaskCommand:
+    """
+    可撤销的修改。命令只记录受影响任务的变化（修改前后的字段、被删除的任务对象），
+    不复制整个任务列表，占用的内存与修改的规模成正比。
+
+    redo / undo 直接作用于任务存储，返回界面需要刷新的内容：
+        {"groups": 需要重建的分组（总标题集合）, "added": 新增的任务, "removed": 被删除的任务}
+    第一次执行时没有任何修改（例如勾选状态本来就相同）则 redo 返回None，命令不加入撤销栈。
+    涉及的任务可能已被合并进来的外部修改删除，此时跳过这些任务。
+    """
+
+    text = ""
+
+    def redo(self, task_store):
+        raise NotImplementedError
+
+    def undo(self, task_store):
+        raise NotImplementedError
+
+    @staticmethod
+    def changes(groups=(), added=(), removed=()):
+        return {"groups": set(groups), "added": list(added), "removed": list(removed)}
+
+
+class UpdateTasksCommand(TaskCommand):
+    """修改一批任务的字段（完成状态、任务类型等）"""
+
+    def __init__(self, text, changes):
+        """
+        参数:
+            text (str): 显示在撤销按钮上的描述
+            changes (dict): 任务id -> {字段名: 新的值}，批量设置同一字段时可共用同一个字典
+        """
+        self.text = text
+        self.after = changes
+        # 任务id -> {字段名: 原来的值}，执行后记录
+        self.before = {}
+
+    @staticmethod
+    def completion(task, completed):
+        """勾选或取消勾选一个任务"""
+        text = f"{'完成' if completed else '取消完成'} {task['sub_task']}"
+        return UpdateTasksCommand(text, {task["id"]: {"completed": completed}})
+
+    @staticmethod
+    def subtask_completion(task, sub_task_name, completed):
+        """勾选或取消勾选一个子任务（写入新的子任务字典，撤销时换回原来的字典）"""
+        sub_tasks = dict(task["sub_task_tasks"], **{sub_task_name: completed})
+        text = f"{'完成' if completed else '取消完成'}子任务 {sub_task_name}"
+        return UpdateTasksCommand(text, {task["id"]: {"sub_task_tasks": sub_tasks}})
+
+    def _apply(self, task_store, changes):
+        previous = task_store.update_tasks(changes)
+        structural = {name for fields in previous.values() for name in fields} - set(IN_PLACE_FIELDS)
+        groups = {task_store.get(task_id)["main_task"] for task_id in previous} if structural else ()
+        return previous, self.changes(groups)
+
+    def redo(self, task_store):
+        self.before, changes = self._apply(task_store, self.after)
+        return changes if self.before else None
+
+    def undo(self, task_store):
+        return self._apply(task_store, self.before)[1]
+
+
+class AddTasksCommand(TaskCommand):
+    """添加一批任务，重做时以第一次分配的id恢复"""
+
+    def __init__(self, text, tasks):
+        self.text = text
+        self.tasks = list(tasks)
+        self.done = False
+
+    def redo(self, task_store):
+        if self.done:
+            task_store.restore_tasks(self.tasks)
+        else:
+            task_store.add_tasks(self.tasks)
+            self.done = True
+        return self.changes(added=self.tasks)
+
+    def undo(self, task_store):
+        return self.changes(removed=task_store.remove_tasks([task["id"] for task in self.tasks]))
+
+
+class ImportTasksCommand(TaskCommand):
+    """
+    分块导入的任务。导入在后台分块进行，每块写入存储后调用 record_chunk，
+    导入结束后通过 UndoStack.record 加入撤销栈，整个导入作为一条记录撤销。
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.added = []
+        # 任务id -> {字段名: 导入前的值} / {字段名: 导入后的值}，只包含被导入更新的任务
+        self.before = {}
+        self.after = {}
+
+    def record_chunk(self, task_store, result):
+        """记录一块导入的结果（TaskStore.import_tasks 的返回值）"""
+        self.added.extend(result["added"])
+        for task_id, fields in result["previous"].items():
+            before = self.before.setdefault(task_id, {})
+            for name, value in fields.items():
+                before.setdefault(name, value)
+            task = task_store.full_task(task_store.get(task_id))
+            self.after[task_id] = {name: task.get(name) for name in before}
+
+    def redo(self, task_store):
+        task_store.restore_tasks(self.added)
+        task_store.update_tasks(self.after)
+        # 其他实例的修改合并进来时可能已经删除了其中的任务
+        groups = {task["main_task"] for task in map(task_store.get, self.after) if task is not None}
+        return self.changes(groups, added=self.added)
+
+    def undo(self, task_store):
+        # 先恢复更新过的字段（同一次导入中可能先新增后更新），再删除新增的任务
+        task_store.update_tasks(self.before)
+        groups = {task["main_task"] for task in map(task_store.get, self.before) if task is not None}
+        removed = task_store.remove_tasks([task["id"] for task in self.added])
+        return self.changes(groups, removed=removed)
+
+
+class DependencyCommand(TaskCommand):
+    """添加或移除一个前置任务，撤销时恢复原来的 depends_on（包括引用的顺序）"""
+
+    def __init__(self, text, task_id, prerequisite_id, add=True):
+        self.text = text
+        self.task_id = task_id
+        self.prerequisite_id = prerequisite_id
+        self.add = add
+        self.before = None
+
+    def redo(self, task_store):
+        task = task_store.get(self.task_id)
+        if task is None:
+            return None
+        self.before = copy.deepcopy(task.get("depends_on", []))
+        if self.add:
+            # 会形成循环依赖时抛出 ValueError，命令不会加入撤销栈
+            changed = task_store.add_dependency(self.task_id, self.prerequisite_id)
+        else:
+            changed = task_store.remove_dependency(self.task_id, self.prerequisite_id)
+        return self.changes() if changed else None
+
+    def undo(self, task_store):
+        # 任务已被删除时 update_tasks 直接跳过
+        task_store.update_tasks({self.task_id: {"depends_on": self.before}})
+        return self.changes()
+
+
+class MoveTaskCommand(TaskCommand):
+    """在分组中移动任务（上移、下移）或修改分支序号，撤销时移回原来的位置和序号"""
+
+    def __init__(self, text, task_id, index=None, branch_number=None):
+        self.text = text
+        self.task_id = task_id
+        self.index = index
+        self.branch_number = branch_number
+        self.old_index = None
+        self.old_branch_number = None
+
+    def redo(self, task_store):
+        task = task_store.get(self.task_id)
+        if task is None:
+            return None
+        self.old_index = task_store.dependencies.chain_index(self.task_id)
+        self.old_branch_number = task["branch_number"]
+        if self.branch_number is not None:
+            changed = task_store.renumber_task(self.task_id, self.branch_number)
+        else:
+            changed = task_store.move_task(self.task_id, self.index)
+        return self.changes([task["main_task"]]) if changed else None
+
+    def undo(self, task_store):
+        task = task_store.get(self.task_id)
+        if task is None:
+            return self.changes()
+        if self.branch_number is not None:
+            task_store.renumber_task(self.task_id, self.old_branch_number)
+        else:
+            task_store.move_task(self.task_id, self.old_index)
+        return self.changes([task["main_task"]])
+
+
+class RemoveTasksCommand(TaskCommand):
+    """删除一批任务，撤销时以原来的id恢复，并恢复其他任务中指向它们的依赖"""
+
+    def __init__(self, text, task_ids):
+        self.text = text
+        self.task_ids = list(task_ids)
+        self.removed = []
+        # 任务id -> 删除前的 depends_on（被删除的任务及依赖它们的任务）
+        self.references = {}
+
+    def redo(self, task_store):
+        self.references = {}
+        for task_id in self.task_ids:
+            task = task_store.get(task_id)
+            if task is None:
+                continue
+            for related_id in task_store.dependencies.dependents(task_id) | {task_id}:
+                related = task_store.get(related_id)
+                if related_id not in self.references and related.get("depends_on"):
+                    self.references[related_id] = copy.deepcopy(related["depends_on"])
+        self.removed = task_store.remove_tasks(self.task_ids)
+        return self.changes(removed=self.removed)
+
+    def undo(self, task_store):
+        task_store.restore_tasks(self.removed)
+        task_store.update_tasks({task_id: {"depends_on": refs} for task_id, refs in self.references.items()})
+        return self.changes(task["main_task"] for task in self.removed)
+
+
+class RegroupTasksCommand(TaskCommand):
+    """将一批任务移动到另一个分组的末尾，保持它们原来的先后顺序"""
+
+    def __init__(self, text, task_ids, main_task):
+        self.text = text
+        self.task_ids = list(task_ids)
+        self.main_task = main_task
+        # 任务id -> 原来的 (总标题, 分支序号)
+        self.before = {}
+
+    def redo(self, task_store):
+        tasks = [task_store.get(task_id) for task_id in self.task_ids]
+        tasks = [task for task in tasks if task is not None and task["main_task"] != self.main_task]
+        tasks.sort(key=lambda task: (task["main_task"], task["branch_number"]))
+        first = task_store.next_branch_number(self.main_task)
+        targets = {task["id"]: (self.main_task, first + index) for index, task in enumerate(tasks)}
+        groups = {task["main_task"] for task in tasks} | {self.main_task}
+        self.before = task_store.regroup_tasks(targets)
+        return self.changes(groups) if self.before else None
+
+    def undo(self, task_store):
+        groups = {main_task for main_task, _ in self.before.values()} | {self.main_task}
+        task_store.regroup_tasks(self.before)
+        return self.changes(groups)
+
+
+class UndoStack:
+    """
+    撤销栈和重做栈：按执行顺序保存命令，撤销时按相反顺序执行，撤销的命令可以重做，
+    执行新的命令后清空重做栈。
+
+    执行、撤销和重做后通知监听者 callback(action, command, changes)，
+    action 为 "do"、"undo" 或 "redo"，changes 为命令返回的需要刷新的内容；
+    清空时 action 为 "clear"，command 和 changes 为None；
+    命令与合并进来的外部修改冲突而被丢弃时 action 为 "drop"，changes 为None。
+    """
+
+    def __init__(self, task_store, limit=UNDO_LIMIT):
+        self.task_store = task_store
+        self.limit = limit
+        self._undo_commands = []
+        self._redo_commands = []
+        self._listeners = []
+        # 正在执行命令（命令中的存储变更由命令结束后统一刷新）
+        self.applying = False
+        task_store.add_listener(self._on_store_changed)
+
+    def _on_store_changed(self, event, tasks):
+        # 数据被整体替换（例如重新加载）后之前的命令不再适用
+        if event == "reset":
+            self.clear()
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def _notify(self, action, command, changes):
+        for callback in self._listeners:
+            callback(action, command, changes)
+
+    def _run(self, method):
+        self.applying = True
+        try:
+            return method(self.task_store)
+        finally:
+            self.applying = False
+
+    def __len__(self):
+        return len(self._undo_commands)
+
+    def _append(self, command):
+        self._undo_commands.append(command)
+        if len(self._undo_commands) > self.limit:
+            del self._undo_commands[0]
+        self._redo_commands = []
+
+    def push(self, command):
+        """
+        执行命令并加入撤销栈
+
+        返回:
+            dict: 界面需要刷新的内容，命令没有任何修改时为None
+
+        异常:
+            ValueError: 命令无法执行（例如会形成循环依赖），此时存储没有被修改
+        """
+        changes = self._run(command.redo)
+        if changes is None:
+            return None
+        self._append(command)
+        self._notify("do", command, changes)
+        return changes
+
+    def record(self, command):
+        """将已经执行过的命令（例如分块完成的导入）加入撤销栈"""
+        self._append(command)
+        self._notify("do", command, TaskCommand.changes())
+
+    def undo_text(self):
+        """下一次撤销的命令描述，没有可撤销的命令时为None"""
+        return self._undo_commands[-1].text if self._undo_commands else None
+
+    def redo_text(self):
+        """下一次重做的命令描述，没有可重做的命令时为None"""
+        return self._redo_commands[-1].text if self._redo_commands else None
+
+    def _drop(self, commands, command):
+        # 命令已不适用（外部修改以 modified=False 合并进来，不经过撤销栈），丢弃而不是反复出错
+        commands.remove(command)
+        self._notify("drop", command, None)
+
+    def undo(self):
+        """
+        撤销最近的命令，返回界面需要刷新的内容，没有可撤销的命令时返回None
+
+        异常:
+            ValueError: 命令与合并进来的外部修改冲突，无法撤销，此时存储没有被修改，命令被丢弃
+        """
+        if not self._undo_commands:
+            return None
+        command = self._undo_commands[-1]
+        # 执行成功后才移到重做栈
+        try:
+            changes = self._run(command.undo)
+        except ValueError:
+            self._drop(self._undo_commands, command)
+            raise
+        self._undo_commands.pop()
+        self._redo_commands.append(command)
+        self._notify("undo", command, changes)
+        return changes
+
+    def redo(self):
+        """
+        重做最近撤销的命令，返回界面需要刷新的内容，没有可重做的命令时返回None
+
+        异常:
+            ValueError: 命令与合并进来的外部修改冲突，无法重做，此时存储没有被修改，命令被丢弃
+        """
+        if not self._redo_commands:
+            return None
+        command = self._redo_commands[-1]
+        try:
+            changes = self._run(command.redo) or TaskCommand.changes()
+        except ValueError:
+            self._drop(self._redo_commands, command)
+            raise
+        self._redo_commands.pop()
+        self._undo_commands.append(command)
+        self._notify("redo", command, changes)
+        return changes
+
+    def clear(self):
+        self._undo_commands = []
+        self._redo_commands = []
+        self._notify("clear", None, None)
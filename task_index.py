@@ -0,0 +1,224 @@
+import bisect
+import json
+import mmap
+import shutil
+import struct
+import sys
+import tempfile
+
+from perf_instrument import timed
+from task_data_handler import TaskDataHandler
+
+# 索引文件的魔数（最后一个字节为格式版本）
+INDEX_MAGIC = b"TASKIDX\x01"
+# 文件头：魔数，分组数，任务数，总标题段偏移，搜索文本段偏移，搜索文本段长度，
+# 分组表偏移，任务搜索文本偏移列的偏移，任务位置列的偏移
+_HEADER = struct.Struct("<8sQQQQQQQQ")
+# 分组表的一行：分组数据偏移，长度，总标题在总标题段内的偏移，长度，任务数，已完成数
+_GROUP_RECORD = struct.Struct("<QIQIII")
+# 任务搜索文本偏移列的一项：在搜索文本段内的偏移（递增）
+_TASK_OFFSET = struct.Struct("<Q")
+# 任务位置列的一项：所属分组序号，分组内的序号
+_TASK_LOCATION = struct.Struct("<II")
+# 搜索文本中字段之间的分隔符（搜索框中无法输入，关键词不会跨字段命中）
+_FIELD_SEPARATOR = "\x00"
+
+
+class _TaskOffsets:
+    """大端序平台上任务搜索文本偏移列的只读序列视图（小端序平台直接转换内存视图）"""
+
+    def __init__(self, data, offset, count):
+        self._data = data
+        self._offset = offset
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        return _TASK_OFFSET.unpack_from(self._data, self._offset + index * _TASK_OFFSET.size)[0]
+
+    def release(self):
+        pass
+
+
+class TaskIndex:
+    """
+    带索引的二进制任务文件，用于只读浏览很大的历史归档。
+
+    文件依次包含：文件头、各分组的紧凑JSON、总标题、搜索文本（每个任务一段小写的
+    类型/总标题/分支任务名/细节描述）、定长的分组表、任务的搜索文本偏移列和位置列。
+    打开时只映射文件（mmap），不读取内容：分组表按序号直接定位，显示哪些分组才解析哪些分组；
+    搜索在映射的搜索文本中查找关键词，再在偏移列上二分把命中位置换算成任务，
+    内存占用与文件大小无关。
+    """
+
+    def __init__(self, filename):
+        """
+        打开索引文件
+
+        异常:
+            OSError: 文件无法读取
+            ValueError: 不是索引文件或文件不完整
+        """
+        self.filename = filename
+        self._file = open(filename, 'rb')
+        self._data = None
+        self._task_offsets = None
+        try:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件不能映射
+            self.close()
+            raise ValueError(f"不是任务索引文件: {filename}")
+        if len(self._data) < _HEADER.size or self._data[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+            self.close()
+            raise ValueError(f"不是任务索引文件: {filename}")
+        (_, self.group_count, self.task_count, self._names_offset, self._folded_offset, self._folded_length,
+         self._groups_offset, offsets_offset, self._locations_offset) = _HEADER.unpack_from(self._data)
+        if (self._groups_offset + self.group_count * _GROUP_RECORD.size > len(self._data) or
+                offsets_offset + self.task_count * _TASK_OFFSET.size > len(self._data) or
+                self._locations_offset + self.task_count * _TASK_LOCATION.size > len(self._data)):
+            self.close()
+            raise ValueError(f"任务索引文件不完整: {filename}")
+        if sys.byteorder == "little":
+            self._task_offsets = memoryview(self._data)[
+                offsets_offset:offsets_offset + self.task_count * _TASK_OFFSET.size].cast("Q")
+        else:
+            self._task_offsets = _TaskOffsets(self._data, offsets_offset, self.task_count)
+
+    def __len__(self):
+        return self.group_count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        # 内存视图释放后才能关闭映射
+        if self._task_offsets is not None:
+            self._task_offsets.release()
+            self._task_offsets = None
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+        self._file.close()
+
+    @staticmethod
+    def is_index_file(filename):
+        """按魔数判断文件是否为索引文件"""
+        with open(filename, 'rb') as f:
+            return f.read(len(INDEX_MAGIC)) == INDEX_MAGIC
+
+    def _group_record(self, index):
+        if not 0 <= index < self.group_count:
+            raise IndexError(index)
+        return _GROUP_RECORD.unpack_from(self._data, self._groups_offset + index * _GROUP_RECORD.size)
+
+    def name(self, index):
+        """第 index 个分组的总标题"""
+        record = self._group_record(index)
+        start = self._names_offset + record[2]
+        return self._data[start:start + record[3]].decode("utf-8")
+
+    def counts(self, index):
+        """第 index 个分组的 (任务数, 已完成数)"""
+        return self._group_record(index)[4:]
+
+    def group(self, index):
+        """读取并解析第 index 个分组，返回 (总标题, 分组数据)，分组数据与任务文件中的格式相同"""
+        record = self._group_record(index)
+        return self.name(index), json.loads(self._data[record[0]:record[0] + record[1]])
+
+    @timed("index_search", items=lambda args, result: args[0].task_count)
+    def search(self, query):
+        """
+        搜索关键词（不区分大小写，匹配的字段与 TaskDataHandler.search_tasks 相同）
+
+        返回:
+            dict: 分组序号 -> 命中的任务在分组内的序号列表（递增）
+        """
+        matched = {}
+        if not query or not self.task_count:
+            return matched
+        needle = query.lower().encode("utf-8")
+        start = self._folded_offset
+        end = start + self._folded_length
+        position = self._data.find(needle, start, end)
+        while position != -1:
+            # 偏移列中的偏移相对于搜索文本段的开头
+            index = bisect.bisect_right(self._task_offsets, position - start) - 1
+            task_end = start + self._task_offsets[index + 1] if index + 1 < self.task_count else end
+            if position + len(needle) <= task_end:
+                group_index, task_index = _TASK_LOCATION.unpack_from(
+                    self._data, self._locations_offset + index * _TASK_LOCATION.size)
+                matched.setdefault(group_index, []).append(task_index)
+                # 同一任务中的其余命中不需要再换算
+                position = self._data.find(needle, task_end, end)
+            else:
+                position = self._data.find(needle, position + 1, end)
+        return matched
+
+    @staticmethod
+    def search_text(main_task, group, entry):
+        """任务的搜索文本：类型、总标题、分支任务名和细节描述，小写后以分隔符连接"""
+        main_task_type = group["Types"][0] if group["Types"] else ""
+        return _FIELD_SEPARATOR.join(
+            (main_task_type, main_task, entry["sub_task_name"], entry["details"])).lower()
+
+    @staticmethod
+    @timed("index_write", items=lambda args, result: result[1])
+    def write(groups, filename):
+        """
+        将分组逐个写入索引文件（原子替换）。总标题、搜索文本和各个表先写入各自的临时文件，
+        最后依次拼接到分组数据之后，写入过程中不在内存中累积。
+
+        参数:
+            groups (iterable): 依次产生 (总标题, 分组数据)，例如 TaskDataHandler.iter_groups_from_json
+            filename (str): 索引文件名
+
+        返回:
+            tuple: (分组数, 任务数)
+        """
+        group_count = task_count = 0
+        with TaskDataHandler.atomic_file(filename, 'wb') as out, \
+                tempfile.TemporaryFile() as names, tempfile.TemporaryFile() as folded, \
+                tempfile.TemporaryFile() as group_table, tempfile.TemporaryFile() as task_offsets, \
+                tempfile.TemporaryFile() as task_locations:
+            out.write(b"\0" * _HEADER.size)
+            for main_task, group in groups:
+                body = TaskDataHandler.fragment_body(
+                    main_task, TaskDataHandler.dump_group(main_task, group, compact=True), compact=True)
+                body = body.encode("utf-8")
+                name = main_task.encode("utf-8")
+                body_offset = out.tell()
+                out.write(body)
+                name_offset = names.tell()
+                names.write(name)
+                completed = 0
+                for task_index, entry in enumerate(group["tasks"]):
+                    task_offsets.write(_TASK_OFFSET.pack(folded.tell()))
+                    task_locations.write(_TASK_LOCATION.pack(group_count, task_index))
+                    folded.write(TaskIndex.search_text(main_task, group, entry).encode("utf-8"))
+                    completed += entry["completed"]
+                    task_count += 1
+                group_table.write(_GROUP_RECORD.pack(
+                    body_offset, len(body), name_offset, len(name), len(group["tasks"]), completed))
+                group_count += 1
+
+            # 各段依次拼接在分组数据之后，段内的偏移不需要改写
+            offsets = []
+            for section in (names, folded, group_table, task_offsets, task_locations):
+                offsets.append(out.tell())
+                section.seek(0)
+                shutil.copyfileobj(section, out)
+            names_offset, folded_offset, groups_offset, offsets_offset, locations_offset = offsets
+
+            out.seek(0)
+            out.write(_HEADER.pack(INDEX_MAGIC, group_count, task_count, names_offset, folded_offset,
+                                   groups_offset - folded_offset, groups_offset, offsets_offset, locations_offset))
+        return group_count, task_count
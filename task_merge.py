@@ -0,0 +1,276 @@
+import hashlib
+import json
+import os
+
+from perf_instrument import timed
+from task_data_handler import TaskDataHandler
+
+# 参与三方合并的任务字段（总标题和分支序号用于匹配任务，不参与合并）
+MERGE_FIELDS = ("main_task_type", "sub_task", "details", "estimated_time", "completed",
+                "weight", "sub_task_tasks", "depends_on")
+
+
+def file_signature(filename):
+    """文件的 (修改时间, 大小)，用于快速判断文件是否可能被修改，文件不存在时返回None"""
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def text_digest(text):
+    """文件内容的摘要"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class TaskMerger:
+    """按字段对任务做三方合并：基准版本（上次加载/保存的文件）、本地版本和文件中的新版本"""
+
+    @staticmethod
+    def field_value(task, field):
+        """用于比较的字段值，与写入文件时的精度一致"""
+        if field == "estimated_time":
+            return round(task["estimated_time"] * 60)
+        if field == "depends_on":
+            return task.get("depends_on") or []
+        return task[field]
+
+    @staticmethod
+    def differs(first, second):
+        """两个版本的任务是否有字段不同"""
+        return any(TaskMerger.field_value(first, field) != TaskMerger.field_value(second, field)
+                   for field in MERGE_FIELDS)
+
+    @staticmethod
+    def keyed(tasks):
+        """按 (分支序号, 同序号中的出现次序) 索引任务"""
+        result = {}
+        occurrences = {}
+        for task in tasks:
+            branch_number = task["branch_number"]
+            occurrence = occurrences.get(branch_number, 0)
+            occurrences[branch_number] = occurrence + 1
+            result[(branch_number, occurrence)] = task
+        return result
+
+    @staticmethod
+    def merge_fields(base, ours, theirs):
+        """
+        合并一个任务的字段：只有一方修改的字段取修改后的值，双方改成不同的值时保留本地版本
+
+        返回:
+            tuple: (需要写入本地任务的字段, 冲突的字段列表)
+        """
+        changes = {}
+        conflicts = []
+        for field in MERGE_FIELDS:
+            base_value = TaskMerger.field_value(base, field) if base is not None else None
+            our_value = TaskMerger.field_value(ours, field)
+            their_value = TaskMerger.field_value(theirs, field)
+            if their_value == our_value or their_value == base_value:
+                continue
+            if our_value == base_value:
+                changes[field] = theirs.get(field) if field != "depends_on" else their_value
+            else:
+                conflicts.append(field)
+        return changes, conflicts
+
+    @staticmethod
+    def merge_group(task_store, main_task, base_tasks, their_tasks, result):
+        """
+        将文件中一个分组的修改合并到任务存储，结果累加到 result 中
+
+        参数:
+            task_store (TaskStore): 任务存储
+            main_task (str): 总标题
+            base_tasks (list): 基准版本的任务
+            their_tasks (list): 文件中新版本的任务
+            result (dict): 合并结果，见 TaskFileSync.merge
+        """
+        group = task_store.groups.get(main_task)
+        our_tasks = [task_store.full_task(task_store.get(entry["id"])) for entry in group["tasks"]] if group else []
+        base, ours, theirs = (TaskMerger.keyed(tasks) for tasks in (base_tasks, our_tasks, their_tasks))
+
+        def conflict(key, task, reason):
+            result["conflicts"].append({
+                "main_task": main_task,
+                "branch_number": key[0],
+                "sub_task": task["sub_task"],
+                "reason": reason
+            })
+
+        added = []
+        for key in list(ours) + [key for key in theirs if key not in ours]:
+            base_task, our_task, their_task = base.get(key), ours.get(key), theirs.get(key)
+            if our_task is None:
+                if base_task is None:
+                    added.append(their_task)
+                elif TaskMerger.differs(base_task, their_task):
+                    conflict(key, their_task, "本地已删除，文件中被修改")
+            elif their_task is None:
+                if base_task is None:
+                    continue
+                if TaskMerger.differs(base_task, our_task):
+                    conflict(key, our_task, "文件中已删除，本地被修改")
+                else:
+                    task_store.remove_task(our_task["id"], modified=False)
+                    result["removed"] += 1
+                    result["groups"].add(main_task)
+            else:
+                changes, fields = TaskMerger.merge_fields(base_task, our_task, their_task)
+                if fields:
+                    conflict(key, our_task, "双方都修改了: " + ", ".join(fields))
+                if changes and task_store.update_task(our_task["id"], changes, modified=False):
+                    result["updated"] += 1
+                    result["groups"].add(main_task)
+
+        if added:
+            task_store.add_tasks(added, modified=False)
+            result["added"] += len(added)
+            result["groups"].add(main_task)
+
+
+class TaskFileSync:
+    """
+    检测任务文件被外部修改（其他编辑器、同步工具或另一个实例），并增量合并到任务存储。
+
+    记录上次加载/保存时文件的签名、内容摘要和每个分组的原始JSON文本作为基准。
+    文件变化后先比较签名和摘要排除无效通知，再逐个分组比较原始文本，
+    只有文本变化的分组才转换为任务并与本地版本做三方合并，其余分组不需要任何处理。
+
+    保存时沿用加载到的文件格式（压缩容器和是否紧凑），也可以通过 compression / compact 指定。
+    """
+
+    def __init__(self, filename, compression=None, compact=False):
+        self.filename = filename
+        self.compression = compression
+        self.compact = compact
+        self.signature = None
+        self.digest = None
+        # 总标题 -> 基准版本中该分组的原始JSON文本
+        self.group_texts = {}
+
+    def record(self, signature, digest, group_texts, file_format=None):
+        """记录加载得到的基准版本，file_format 为文件的 (压缩编解码器, 是否紧凑)"""
+        self.signature = signature
+        self.digest = digest
+        self.group_texts = group_texts
+        if file_format is not None:
+            self.compression, self.compact = file_format
+
+    @staticmethod
+    def file_format(text, compression):
+        """由读取到的文本和编解码器得到 record 使用的文件格式"""
+        return compression, TaskDataHandler.is_compact(text)
+
+    @timed("load", items=lambda args, result: len(result))
+    def load(self):
+        """
+        加载任务文件并记录为基准版本
+
+        返回:
+            list: 任务列表
+
+        异常:
+            FileNotFoundError: 文件不存在
+            ValueError, KeyError: 文件格式错误
+        """
+        signature = file_signature(self.filename)
+        text, compression = TaskDataHandler.read_tasks_file(self.filename)
+        group_texts = {}
+        tasks = list(TaskDataHandler.iter_tasks_from_text(text, group_texts))
+        self.record(signature, text_digest(text), group_texts, self.file_format(text, compression))
+        return tasks
+
+    def record_store(self, task_store):
+        """保存后以写入的内容作为基准版本，自己写入文件引起的变化通知会被忽略"""
+        fragments = task_store.group_fragments(self.compact)
+        group_texts = {
+            main_task: TaskDataHandler.fragment_body(main_task, fragment, self.compact)
+            for main_task, fragment in zip(task_store.groups, fragments)
+        }
+        self.record(file_signature(self.filename),
+                    text_digest(TaskDataHandler.join_group_fragments(fragments, self.compact)), group_texts)
+
+    def check(self):
+        """
+        检查文件是否被外部修改
+
+        返回:
+            str: 内容发生变化时返回新的文件内容，否则返回None
+        """
+        signature = file_signature(self.filename)
+        if signature is None or signature == self.signature:
+            return None
+        try:
+            text = TaskDataHandler.read_tasks_text(self.filename)
+        except OSError:
+            return None
+
+        self.signature = signature
+        if text_digest(text) == self.digest:
+            return None
+        return text
+
+    def save(self, task_store):
+        """
+        加锁保存任务存储。文件自上次加载/保存后被其他实例改过时（内容摘要不同），
+        先把对方的修改三方合并到任务存储再写入，而不是直接覆盖。
+
+        返回:
+            tuple: (是否保存成功, 合并结果，文件没有被其他实例修改时为None)
+        """
+        result = None
+        with TaskDataHandler.lock_file(self.filename):
+            text = self.check()
+            if text is not None:
+                try:
+                    result = self.merge(task_store, text)
+                except (ValueError, KeyError) as e:
+                    # 无法解析的文件只能覆盖，写入前的备份中保留了原内容
+                    print(f"任务文件格式错误，无法合并其他实例的修改: {e}")
+
+            success = TaskDataHandler.save_store_to_json(task_store, self.filename, self.compression, self.compact)
+            if success:
+                self.record_store(task_store)
+        return success, result
+
+    @timed("merge", items=lambda args, result: len(result["groups"]))
+    def merge(self, task_store, text):
+        """
+        将文件的新内容合并到任务存储，并将其作为新的基准版本。
+        合并写入的修改不标记为未保存；与本地修改冲突时保留本地版本并记录冲突。
+
+        返回:
+            dict: {"groups": 内容变化的总标题集合, "added", "removed", "updated": 任务数,
+                   "conflicts": [{"main_task", "branch_number", "sub_task", "reason"}]}
+
+        异常:
+            ValueError, KeyError: 文件格式错误（例如其他程序写到一半），此时不做任何修改
+        """
+        group_texts = {}
+        changed = {}
+        for main_task, data in TaskDataHandler.iter_groups_from_text(text, group_texts):
+            if self.group_texts.get(main_task) != group_texts[main_task]:
+                changed[main_task] = data
+        # 从文件中删除的分组
+        for main_task in self.group_texts:
+            if main_task not in group_texts:
+                changed[main_task] = None
+
+        # 先转换所有变化的分组，格式错误时不会只合并了一部分
+        versions = []
+        for main_task, data in changed.items():
+            base_text = self.group_texts.get(main_task)
+            base_tasks = TaskDataHandler.group_to_tasks(
+                main_task, TaskDataHandler.normalize_group(main_task, json.loads(base_text))) if base_text else []
+            their_tasks = TaskDataHandler.group_to_tasks(main_task, data) if data is not None else []
+            versions.append((main_task, base_tasks, their_tasks))
+
+        result = {"groups": set(), "added": 0, "removed": 0, "updated": 0, "conflicts": []}
+        for main_task, base_tasks, their_tasks in versions:
+            TaskMerger.merge_group(task_store, main_task, base_tasks, their_tasks, result)
+
+        self.record(self.signature, text_digest(text), group_texts)
+        return result
@@ -0,0 +1,230 @@
+import heapq
+import math
+
+from perf_instrument import timed
+
+# 精确求解（动态规划）允许的最大状态数：候选任务数 x 时间单位数，超过时使用贪心算法
+EXACT_SOLVER_MAX_CELLS = 200000
+
+
+class DailyPlanner:
+    """
+    每日计划：在给定的时间预算内，从未完成的分支任务中选出总权重最大的一组并排好顺序。
+
+    候选较少时用0/1背包动态规划精确求解（时间按所有任务时间的最大公约数离散化），
+    候选较多时按单位时间权重用堆做贪心选择，数万个候选也能保持交互速度。
+    选出的任务按依赖图的拓扑顺序排列。
+    之后任务的完成、新增和删除只对计划做增量调整，不重新求解。
+    """
+
+    def __init__(self, task_store, budget_minutes=480):
+        self.task_store = task_store
+        self.budget_minutes = budget_minutes
+        # 计划中的任务id（按执行顺序），以及其中今天已完成的任务
+        self.plan = []
+        self.done = set()
+        self.used_minutes = 0
+        # 计划中的任务入选时计入的时间（分钟），任务修改或删除时按它调整已用时间
+        self._minutes = {}
+        # 当前计划是否由精确算法得到
+        self.exact = False
+        # 未入选的候选：(排序键, 任务id) 组成的堆，失效的条目在弹出时跳过
+        self._heap = []
+        self._queued = set()
+
+    @staticmethod
+    def task_minutes(task):
+        """任务的预计时间（分钟）"""
+        return max(0, round(task.get("estimated_time", 0) * 60))
+
+    @staticmethod
+    def is_candidate(task):
+        """未完成且有权重的任务才参与计划"""
+        return not task.get("completed", False) and task.get("weight", 0) > 0
+
+    @staticmethod
+    def sort_key(task):
+        """按单位时间权重从高到低排列，不需要时间的任务排在最前"""
+        minutes = DailyPlanner.task_minutes(task)
+        density = math.inf if minutes == 0 else task["weight"] / minutes
+        return (-density, -task["weight"], task["main_task"], task["branch_number"])
+
+    @property
+    def total_weight(self):
+        """计划中所有任务的总权重"""
+        return sum(self.task_store.get(task_id)["weight"] for task_id in self.plan)
+
+    def plan_tasks(self):
+        """按执行顺序返回计划中的任务"""
+        return [self.task_store.get(task_id) for task_id in self.plan]
+
+    def set_budget(self, budget_minutes):
+        """修改时间预算并重新规划"""
+        self.budget_minutes = budget_minutes
+        self.replan()
+
+    @timed("plan", items=lambda args, result: len(args[0].task_store))
+    def replan(self):
+        """根据当前数据重新求解整个计划"""
+        candidates = [task for task in self.task_store if self.is_candidate(task)]
+        # 不需要时间的任务总是入选
+        chosen = [task for task in candidates if self.task_minutes(task) == 0]
+        items = [task for task in candidates
+                 if 0 < self.task_minutes(task) <= self.budget_minutes]
+
+        granularity = math.gcd(self.budget_minutes, *(self.task_minutes(task) for task in items))
+        capacity = self.budget_minutes // granularity if granularity else 0
+        self.exact = len(items) * capacity <= EXACT_SOLVER_MAX_CELLS
+        if self.exact:
+            chosen.extend(self._solve_exact(items, granularity, capacity))
+        else:
+            chosen.extend(self._solve_greedy(items))
+
+        self.plan = [task["id"] for task in chosen]
+        self.done = set()
+        self._minutes = {task["id"]: self.task_minutes(task) for task in chosen}
+        self.used_minutes = sum(self._minutes.values())
+        self._sort_plan()
+
+        planned = set(self.plan)
+        self._heap = [(self.sort_key(task), task["id"]) for task in candidates if task["id"] not in planned]
+        heapq.heapify(self._heap)
+        self._queued = {task_id for _, task_id in self._heap}
+
+    def _solve_exact(self, items, granularity, capacity):
+        """0/1背包动态规划，返回总权重最大的任务组合"""
+        costs = [self.task_minutes(task) // granularity for task in items]
+        best = [0] * (capacity + 1)
+        choices = []
+        for task, cost in zip(items, costs):
+            value = task["weight"]
+            keep = bytearray(capacity + 1)
+            for used in range(capacity, cost - 1, -1):
+                candidate = best[used - cost] + value
+                if candidate > best[used]:
+                    best[used] = candidate
+                    keep[used] = 1
+            choices.append(keep)
+
+        chosen = []
+        used = capacity
+        for index in range(len(items) - 1, -1, -1):
+            if choices[index][used]:
+                chosen.append(items[index])
+                used -= costs[index]
+        return chosen
+
+    def _solve_greedy(self, items):
+        """按单位时间权重贪心选择，并与能放下的单个最大权重任务比较（保证不差于最优解的一半）"""
+        heap = [(self.sort_key(task), index) for index, task in enumerate(items)]
+        heapq.heapify(heap)
+
+        chosen = []
+        remaining = self.budget_minutes
+        while heap and remaining > 0:
+            _, index = heapq.heappop(heap)
+            minutes = self.task_minutes(items[index])
+            if minutes <= remaining:
+                chosen.append(items[index])
+                remaining -= minutes
+
+        heaviest = max(items, key=lambda task: task["weight"], default=None)
+        if heaviest is not None and heaviest["weight"] > sum(task["weight"] for task in chosen):
+            return [heaviest]
+        return chosen
+
+    def _sort_plan(self):
+        """按依赖图的拓扑顺序排列计划，前置任务排在前面"""
+        self.plan.sort(key=self.task_store.dependencies.position)
+
+    def _queue(self, task):
+        if task["id"] not in self._queued:
+            heapq.heappush(self._heap, (self.sort_key(task), task["id"]))
+            self._queued.add(task["id"])
+
+    def _fill(self):
+        """用堆中的候选填充剩余的时间预算，返回是否有任务加入计划"""
+        remaining = self.budget_minutes - self.used_minutes
+        planned = set(self.plan)
+        added = False
+        skipped = []
+        while self._heap and remaining > 0:
+            key, task_id = heapq.heappop(self._heap)
+            self._queued.discard(task_id)
+            task = self.task_store.get(task_id)
+            # 已删除、已完成或已入选的任务是失效条目
+            if task is None or task_id in planned or not self.is_candidate(task):
+                continue
+
+            minutes = self.task_minutes(task)
+            if minutes <= remaining:
+                self.plan.append(task_id)
+                planned.add(task_id)
+                self._minutes[task_id] = minutes
+                self.used_minutes += minutes
+                remaining -= minutes
+                added = True
+            else:
+                skipped.append((key, task_id))
+
+        for key, task_id in skipped:
+            heapq.heappush(self._heap, (key, task_id))
+            self._queued.add(task_id)
+        if added:
+            self._sort_plan()
+        return added
+
+    def on_store_changed(self, event, tasks):
+        """
+        根据任务存储的变更增量调整计划
+
+        返回:
+            bool: 计划是否发生了变化
+        """
+        if event == "reset":
+            self.replan()
+            return True
+
+        changed = False
+        if event == "add":
+            for task in tasks:
+                if self.is_candidate(task):
+                    self._queue(task)
+            changed = self._fill()
+
+        elif event == "remove":
+            for task in tasks:
+                if task["id"] in self.plan:
+                    self.plan.remove(task["id"])
+                    minutes = self._minutes.pop(task["id"])
+                    # 今天已完成的任务占用的时间不再释放
+                    if task["id"] not in self.done:
+                        self.used_minutes -= minutes
+                    self.done.discard(task["id"])
+                    changed = True
+            changed = self._fill() or changed
+
+        elif event == "update":
+            for task in tasks:
+                if task["id"] in self.plan:
+                    # 计划中的任务完成后保留在计划里并标记为已完成
+                    if task.get("completed", False):
+                        self.done.add(task["id"])
+                    else:
+                        self.done.discard(task["id"])
+                    # 预计时间被修改时调整已用时间，不重新求解
+                    minutes = self.task_minutes(task)
+                    self.used_minutes += minutes - self._minutes[task["id"]]
+                    self._minutes[task["id"]] = minutes
+                    changed = True
+                elif self.is_candidate(task):
+                    self._queue(task)
+            changed = self._fill() or changed
+
+        elif event == "move":
+            # 分组内顺序变化可能改变计划中任务的先后
+            if any(task["id"] in self.plan for task in tasks):
+                self._sort_plan()
+                changed = True
+
+        return changed
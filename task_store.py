@@ -0,0 +1,969 @@
+import itertools
+
+from perf_instrument import timed
+from task_data_handler import TaskDataHandler
+from task_dependencies import DependencyGraph
+from task_fields import DETAIL_SPILL_CHARS, DetailStore
+
+# 聚合统计的字段：任务数、已完成数、预计总时间与剩余时间（分钟）、总权重与已完成权重
+STAT_FIELDS = ("count", "completed", "minutes", "remaining_minutes", "weight", "completed_weight")
+
+
+class TaskStore:
+    """
+    任务存储类，列表视图和卡片视图共享的唯一数据源。
+    每个任务分配一个内存中的id，所有修改都通过id直接作用在同一个任务对象上。
+
+    同时增量维护一份按总标题分组的投影（与 tasks.json 的格式一致），
+    卡片视图和保存都直接使用它。每个分组有一个版本号，分组内容变化时递增，
+    使用方记录自己处理过的版本即可判断哪些分组需要重新生成。
+
+    另外按总标题和任务类型增量维护聚合统计（见 STAT_FIELDS），
+    每次修改只加减受影响任务的贡献，读取统计不需要遍历任务。
+
+    任务之间可以有依赖（任务的 depends_on 保存前置任务的 [总标题, 分支序号]），
+    依赖图增量维护拓扑顺序和可立即开始的任务集合；每个分组内的条目始终按分支序号排列，
+    视图直接按此顺序遍历，不需要每次排序。
+
+    较长的细节描述（超过 DETAIL_SPILL_CHARS 字）不保存在任务对象和分组条目中，
+    而是放在 detail_store 里按需读取（见 details / full_task），筛选、统计和列表渲染不会触及这些文本。
+    需要完整字段的地方（保存、导出、合并、同步）使用 full_task / group_fragments。
+
+    存入的任务应为规范形式（字段齐全，sub_task_tasks 为字典），
+    即 TaskDataHandler.group_to_tasks 或 record_to_task 的输出，存储内部不再做兼容处理。
+    """
+
+    def __init__(self, tasks=None):
+        # id -> 任务对象，保持插入顺序
+        self._tasks = {}
+        self._next_id = itertools.count(1)
+        self._listeners = []
+        # 自上次加载/保存以来是否有未保存的修改
+        self.modified = False
+        # 每次修改递增的全局版本号
+        self.revision = 0
+
+        # 按总标题分组的投影：总标题 -> {"Types", "describe", "tasks", "sub_task_number"}
+        self.groups = {}
+        # 任务id -> 分组投影中的分支任务条目
+        self._entries = {}
+        # 总标题 -> {任务类型: 任务数}，用于维护分组的 Types
+        self._group_types = {}
+        # 总标题 -> 分组版本号
+        self.group_versions = {}
+        # 保存时使用的分组JSON片段缓存：总标题 -> (版本号, 片段)
+        self._fragment_cache = {}
+
+        # 聚合统计：总标题 -> 统计，任务类型 -> 统计，以及全部任务的统计
+        self.group_stats = {}
+        self.type_stats = {}
+        self.totals = self.new_stats()
+
+        # 依赖图，以及 (总标题, 分支序号) -> 任务id 的索引和尚未加载到的前置任务引用
+        self.dependencies = DependencyGraph()
+        self._ref_index = {}
+        self._pending_refs = {}
+        # 移出任务对象的较长细节描述：任务id -> 文本
+        self.detail_store = DetailStore()
+
+        if tasks:
+            self.reset(tasks)
+
+    @property
+    def tasks(self):
+        """按插入顺序返回任务列表"""
+        return list(self._tasks.values())
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def __iter__(self):
+        return iter(self._tasks.values())
+
+    def get(self, task_id):
+        """按id获取任务，不存在时返回None"""
+        return self._tasks.get(task_id)
+
+    def find_task(self, main_task, branch_number):
+        """按 (总标题, 分支序号) 获取任务（与依赖引用的方式相同），不存在时返回None"""
+        task_id = self._ref_index.get((main_task, branch_number))
+        return self._tasks.get(task_id) if task_id is not None else None
+
+    def add_listener(self, callback):
+        """
+        注册数据变更回调
+
+        参数:
+            callback (callable): 回调函数，签名为 callback(event, tasks)，
+                event 为 "reset"、"add"、"remove"、"update" 或 "move"
+                （任务的分支序号、在分组中的位置或所属分组变化）
+        """
+        self._listeners.append(callback)
+
+    def _notify(self, event, tasks):
+        for callback in self._listeners:
+            callback(event, tasks)
+
+    def _touch(self, main_task):
+        """标记分组已修改"""
+        self.revision += 1
+        self.group_versions[main_task] = self.revision
+
+    @staticmethod
+    def new_stats():
+        """创建一份空的聚合统计"""
+        return dict.fromkeys(STAT_FIELDS, 0)
+
+    @staticmethod
+    def entry_contribution(entry):
+        """单个分支任务条目对聚合统计的贡献，顺序与 STAT_FIELDS 一致"""
+        completed = entry["completed"]
+        minutes = entry["estimated_time_hours"] * 60 + entry["estimated_time_minutes"]
+        weight = entry["weight"]
+        return (1, 1 if completed else 0, minutes, 0 if completed else minutes,
+                weight, weight if completed else 0)
+
+    @staticmethod
+    def aggregate(entries):
+        """
+        遍历分支任务条目计算聚合统计，用于筛选后的子集等没有增量维护的场合
+
+        参数:
+            entries (iterable): 分支任务条目（tasks.json 格式）
+
+        返回:
+            dict: 聚合统计
+        """
+        stats = TaskStore.new_stats()
+        for entry in entries:
+            for field, value in zip(STAT_FIELDS, TaskStore.entry_contribution(entry)):
+                stats[field] += value
+        return stats
+
+    @staticmethod
+    def weighted_completion(stats):
+        """按权重计算的完成比例（0~1），所有任务权重为0时按任务数计算"""
+        if stats["weight"] > 0:
+            return stats["completed_weight"] / stats["weight"]
+        if stats["count"] > 0:
+            return stats["completed"] / stats["count"]
+        return 0.0
+
+    def _apply_stats(self, task, entry, sign):
+        """将条目的贡献加到（sign=1）或从（sign=-1）所属分组、类型和总计的统计中"""
+        main_task = task["main_task"]
+        task_type = task["main_task_type"]
+        if main_task not in self.group_stats:
+            self.group_stats[main_task] = self.new_stats()
+        if task_type not in self.type_stats:
+            self.type_stats[task_type] = self.new_stats()
+
+        contribution = self.entry_contribution(entry)
+        for stats in (self.group_stats[main_task], self.type_stats[task_type], self.totals):
+            for field, value in zip(STAT_FIELDS, contribution):
+                stats[field] += sign * value
+
+    def _update_group_types(self, main_task):
+        group = self.groups[main_task]
+        group["Types"] = [task_type for task_type in self._group_types[main_task] if task_type]
+
+    def _register(self, task, task_id=None):
+        """注册任务，task_id 为None时分配新的id（恢复删除或移动分组的任务时保留原id）"""
+        task["id"] = next(self._next_id) if task_id is None else task_id
+        self._tasks[task["id"]] = task
+
+        main_task = task["main_task"]
+        if main_task not in self.groups:
+            self.groups[main_task] = {
+                "Types": [],
+                "describe": "",
+                "tasks": [],
+                "sub_task_number": 0
+            }
+            self._group_types[main_task] = {}
+
+        entry = self._make_entry(task)
+        self._entries[task["id"]] = entry
+        group = self.groups[main_task]
+        # 依赖图中同一总标题的任务按分支序号排列，分组条目使用相同的位置
+        index = self.dependencies.add_node(task["id"], main_task, task["branch_number"], task["completed"])
+        group["tasks"].insert(index, entry)
+        group["sub_task_number"] = len(group["tasks"])
+
+        type_counts = self._group_types[main_task]
+        if task["main_task_type"] not in type_counts:
+            type_counts[task["main_task_type"]] = 0
+            self._update_group_types(main_task)
+        type_counts[task["main_task_type"]] += 1
+        self._apply_stats(task, entry, 1)
+        self._touch(main_task)
+        self._link_dependencies(task)
+
+    def _make_entry(self, task):
+        """
+        生成任务的分组条目。较长的细节描述移到 detail_store，任务对象和条目中都不保留；
+        已经移出的（重新注册或修改其他字段时）保持不变
+        """
+        details = task.get("details")
+        if details is None:
+            entry = TaskDataHandler.task_to_entry(dict(task, details=""))
+            del entry["details"]
+        elif len(details) > DETAIL_SPILL_CHARS:
+            entry = TaskDataHandler.task_to_entry(task)
+            self.detail_store.put(task["id"], task.pop("details"))
+            del entry["details"]
+        else:
+            entry = TaskDataHandler.task_to_entry(task)
+        return entry
+
+    def details(self, task):
+        """任务的细节描述，移出任务对象的从 detail_store 读取"""
+        if "details" in task:
+            return task["details"]
+        return self.detail_store.get(task["id"])
+
+    def full_task(self, task):
+        """包含细节描述的任务：没有移出时就是任务对象本身，否则返回带有细节描述的副本"""
+        if "details" in task:
+            return task
+        return dict(task, details=self.detail_store.get(task["id"]))
+
+    def full_entry(self, entry):
+        """包含细节描述的分组条目（字段顺序与文件中相同）"""
+        if "details" in entry:
+            return entry
+        full = {}
+        for key, value in entry.items():
+            full[key] = value
+            if key == "sub_task_name":
+                full["details"] = self.detail_store.get(entry["id"])
+        return full
+
+    def search_tasks(self, tasks, query):
+        """与 TaskDataHandler.search_tasks 相同，移出的细节描述在 detail_store 中搜索"""
+        if not query:
+            return tasks
+        return TaskDataHandler.search_tasks(tasks, query, self.detail_store.search(query))
+
+    def _link_dependencies(self, task):
+        """解析任务的前置任务引用，前置任务尚未加载时等它注册后再连接"""
+        key = (task["main_task"], task["branch_number"])
+        self._ref_index.setdefault(key, task["id"])
+        self._resolve_pending(key, task["id"])
+        self._link_prerequisites(task)
+
+    def _link_prerequisites(self, task):
+        """连接任务 depends_on 中引用的前置任务"""
+        for ref in task.get("depends_on", []):
+            prerequisite_id = self._ref_index.get(tuple(ref))
+            if prerequisite_id is None:
+                self._pending_refs.setdefault(tuple(ref), []).append(task["id"])
+            else:
+                self._add_edge_from_file(prerequisite_id, task["id"])
+
+    def _resolve_pending(self, key, task_id):
+        """引用 key 的任务出现后，连接等待它的依赖（之后被改掉的引用跳过）"""
+        for dependent_id in self._pending_refs.pop(key, []):
+            dependent = self._tasks.get(dependent_id)
+            if dependent is not None and list(key) in dependent.get("depends_on", []):
+                self._add_edge_from_file(task_id, dependent_id)
+
+    def _add_edge_from_file(self, prerequisite_id, task_id):
+        """添加文件中记录的依赖，循环依赖只提示而不中断加载"""
+        try:
+            self.dependencies.add_edge(prerequisite_id, task_id)
+        except ValueError as e:
+            task = self._tasks[task_id]
+            print(f"忽略任务 '{task['main_task']}:{task['sub_task']}' 的依赖: {e}")
+
+    def _unregister(self, task, keep_references=False):
+        """
+        从分组投影、统计和依赖图中移除任务
+
+        参数:
+            keep_references (bool): 为True时依赖它的任务保留 depends_on 中的引用，
+                等同名同序号的任务重新注册（例如从归档恢复）后再连接
+
+        返回:
+            list: 因前置任务被删除而修改了 depends_on 的任务
+        """
+        main_task = task["main_task"]
+        entry = self._entries.pop(task["id"])
+        self._apply_stats(task, entry, -1)
+        if self.type_stats[task["main_task_type"]]["count"] == 0:
+            del self.type_stats[task["main_task_type"]]
+        group = self.groups[main_task]
+        del group["tasks"][self.dependencies.chain_index(task["id"])]
+        group["sub_task_number"] = len(group["tasks"])
+
+        key = (main_task, task["branch_number"])
+        if self._ref_index.get(key) == task["id"]:
+            del self._ref_index[key]
+        ref = [main_task, task["branch_number"]]
+        changed = []
+        for dependent_id in self.dependencies.remove_node(task["id"]):
+            if keep_references:
+                self._pending_refs.setdefault(key, []).append(dependent_id)
+                continue
+            dependent = self._tasks[dependent_id]
+            self._remove_ref(dependent, ref)
+            changed.append(dependent)
+
+        type_counts = self._group_types[main_task]
+        type_counts[task["main_task_type"]] -= 1
+        if type_counts[task["main_task_type"]] == 0:
+            del type_counts[task["main_task_type"]]
+            self._update_group_types(main_task)
+
+        if not group["tasks"]:
+            del self.groups[main_task]
+            del self._group_types[main_task]
+            del self.group_versions[main_task]
+            del self.group_stats[main_task]
+            self._fragment_cache.pop(main_task, None)
+            self.revision += 1
+        else:
+            self._touch(main_task)
+        return changed
+
+    def _remove_ref(self, task, ref):
+        """从任务的 depends_on 中删除一个前置任务引用"""
+        refs = task.get("depends_on", [])
+        if ref in refs:
+            refs.remove(ref)
+        if not refs:
+            task.pop("depends_on", None)
+            self._entries[task["id"]].pop("depends_on", None)
+        self._touch(task["main_task"])
+
+    def reset(self, tasks):
+        """用新的任务列表替换全部数据（例如从文件加载后）"""
+        self._tasks = {}
+        self.groups = {}
+        self._entries = {}
+        self._group_types = {}
+        self.group_versions = {}
+        self._fragment_cache = {}
+        # 统计字典原地清空，视图持有的引用保持有效
+        self.group_stats.clear()
+        self.type_stats.clear()
+        self.totals.update(self.new_stats())
+        self.dependencies.clear()
+        self._ref_index = {}
+        self._pending_refs = {}
+        details = self.detail_store
+        self.detail_store = DetailStore()
+        for task in tasks:
+            # 传入的任务可能来自本存储（细节描述已经移出）
+            if "details" not in task and task.get("id") in details:
+                task["details"] = details.get(task["id"])
+            self._register(task)
+        details.clear()
+        self.modified = False
+        self._notify("reset", self.tasks)
+
+    def swap(self, other):
+        """
+        与另一个存储交换全部数据（监听者不交换），例如切换工作区时换入已经建好索引的数据，
+        不需要重新注册任务。统计字典原地交换内容，视图持有的引用保持有效；
+        换入的分组从两者中较大的全局版本号继续编号，使用方按版本号缓存的内容不会误用。
+        之后向双方的监听者发送 "reset"。
+        """
+        for name in ("_tasks", "_next_id", "modified", "groups", "_entries", "_group_types", "group_versions",
+                     "_fragment_cache", "dependencies", "_ref_index", "_pending_refs", "detail_store"):
+            value = getattr(self, name)
+            setattr(self, name, getattr(other, name))
+            setattr(other, name, value)
+        for name in ("group_stats", "type_stats", "totals"):
+            mine, theirs = getattr(self, name), getattr(other, name)
+            values = dict(mine)
+            mine.clear()
+            mine.update(theirs)
+            theirs.clear()
+            theirs.update(values)
+
+        revision = max(self.revision, other.revision)
+        for store in (self, other):
+            store.revision = revision
+            for main_task in store.groups:
+                old_version = store.group_versions[main_task]
+                store._touch(main_task)
+                # 分组内容没有变化，保存用的片段缓存改用新的版本号继续有效
+                cached = store._fragment_cache.get(main_task)
+                if cached is not None and cached[0][0] == old_version:
+                    store._fragment_cache[main_task] = ((store.group_versions[main_task], cached[0][1]), cached[1])
+            revision = store.revision
+        self._notify("reset", self.tasks)
+        other._notify("reset", other.tasks)
+
+    def add_task(self, task):
+        """添加任务并返回其id"""
+        self._register(task)
+        self.modified = True
+        self._notify("add", [task])
+        return task["id"]
+
+    def add_tasks(self, tasks, modified=True):
+        """
+        批量添加任务，只发送一次变更通知
+
+        参数:
+            tasks (list): 任务对象列表
+            modified (bool): 是否标记为未保存的修改（从文件分块加载时为False）
+        """
+        for task in tasks:
+            self._register(task)
+        if modified:
+            self.modified = True
+        self._notify("add", tasks)
+
+    def import_tasks(self, tasks, on_existing="update", modified=True):
+        """
+        批量导入一批任务：新任务一次性添加（只发送一次变更通知），
+        已有相同 (总标题, 分支序号) 的任务按 on_existing 更新字段或跳过，
+        分支序号为None的任务排在分组末尾。
+
+        参数:
+            tasks (list): 任务对象列表（TaskDataHandler.record_to_task 的格式）
+            on_existing (str): "update" 或 "skip"
+
+        返回:
+            dict: {"added": 新增的任务列表, "updated": 更新的任务列表, "skipped": 跳过的任务数,
+                   "previous": 任务id -> {字段名: 更新前的值}}
+        """
+        added = {}
+        # 已有任务的id -> 新的字段（同一批中重复的任务以后出现的为准）
+        changes = {}
+        skipped = 0
+        # 总标题 -> 下一个可用的分支序号
+        next_numbers = {}
+        for task in tasks:
+            main_task = task["main_task"]
+            if main_task not in next_numbers:
+                next_numbers[main_task] = self.next_branch_number(main_task)
+            if task.get("branch_number") is None:
+                task["branch_number"] = next_numbers[main_task]
+            next_numbers[main_task] = max(next_numbers[main_task], task["branch_number"] + 1)
+
+            key = (main_task, task["branch_number"])
+            fields = {field: task.get(field) for field in ("main_task_type", "sub_task", "details",
+                                                            "estimated_time", "completed", "weight",
+                                                            "sub_task_tasks")}
+            fields["depends_on"] = task.get("depends_on", [])
+            existing = self.find_task(*key)
+            if existing is None and key not in added:
+                added[key] = task
+            elif on_existing == "skip":
+                skipped += 1
+            elif existing is None:
+                # 同一批中重复的任务，以后出现的为准
+                added[key].update(fields)
+                if not added[key]["depends_on"]:
+                    del added[key]["depends_on"]
+            else:
+                changes.setdefault(existing["id"], {}).update(fields)
+
+        previous = self.update_tasks(changes, modified=modified)
+        if added:
+            self.add_tasks(list(added.values()), modified=modified)
+        return {"added": list(added.values()), "updated": [self._tasks[task_id] for task_id in previous],
+                "skipped": skipped, "previous": previous}
+
+    def restore_tasks(self, tasks, modified=True):
+        """
+        重新添加删除的任务（撤销删除），保留原来的id，只发送一次变更通知
+
+        参数:
+            tasks (list): remove_tasks 返回的任务对象
+        """
+        for task in tasks:
+            self._register(task, task["id"])
+        if modified:
+            self.modified = True
+        self._notify("add", tasks)
+
+    def next_branch_number(self, main_task):
+        """分组末尾的下一个分支序号，分组不存在时为1"""
+        group = self.groups.get(main_task)
+        return group["tasks"][-1]["branch_number"] + 1 if group else 1
+
+    def remove_task(self, task_id, modified=True):
+        """删除任务，返回被删除的任务对象"""
+        removed = self.remove_tasks([task_id], modified)
+        return removed[0] if removed else None
+
+    def remove_tasks(self, task_ids, modified=True, keep_references=False):
+        """
+        批量删除任务，删除和前置任务引用的修改各只发送一次变更通知
+
+        参数:
+            keep_references (bool): 为True时保留其他任务中指向被删除任务的依赖引用（移到归档时），
+                这些依赖在图中视为已满足
+
+        返回:
+            list: 被删除的任务对象
+        """
+        removed = []
+        # 因前置任务被删除而修改了 depends_on 的任务
+        changed = {}
+        for task_id in task_ids:
+            task = self._tasks.pop(task_id, None)
+            if task is None:
+                continue
+            # 被删除的任务交给调用方（撤销、归档），细节描述放回任务对象
+            if task_id in self.detail_store:
+                task["details"] = self.detail_store.pop(task_id)
+            removed.append(task)
+            for dependent in self._unregister(task, keep_references):
+                changed[dependent["id"]] = dependent
+
+        if removed:
+            if modified:
+                self.modified = True
+            self._notify("remove", removed)
+            changed = [task for task_id, task in changed.items() if task_id in self._tasks]
+            if changed:
+                self._notify("update", changed)
+        return removed
+
+    def regroup_tasks(self, targets, modified=True):
+        """
+        将任务移动到其他分组或其他分支序号，保留任务id，
+        依赖这些任务的引用原地改写为新的 [总标题, 分支序号]，只发送一次变更通知
+
+        参数:
+            targets (dict): 任务id -> (总标题, 分支序号)
+
+        返回:
+            dict: 任务id -> 原来的 (总标题, 分支序号)，只包含位置发生了变化的任务
+
+        异常:
+            ValueError: 新的位置与依赖矛盾（会形成循环依赖），此时不做任何修改
+        """
+        previous = {}
+        for task_id, target in targets.items():
+            task = self._tasks.get(task_id)
+            if task is not None and (task["main_task"], task["branch_number"]) != tuple(target):
+                previous[task_id] = (task["main_task"], task["branch_number"])
+        if not previous:
+            return previous
+
+        # 依赖被移动任务的 (依赖任务id, 被移动任务id)，以及移动前各任务的前置任务数
+        references = [(dependent_id, task_id) for task_id in previous
+                      for dependent_id in self.dependencies.dependents(task_id)]
+        related = set(previous) | {dependent_id for dependent_id, _ in references}
+        edge_counts = {task_id: len(self.dependencies.prerequisites(task_id)) for task_id in related}
+
+        self._place_tasks({task_id: tuple(targets[task_id]) for task_id in previous}, references)
+        if any(len(self.dependencies.prerequisites(task_id)) < count for task_id, count in edge_counts.items()):
+            # 有依赖没能连接，回到原来的位置
+            self._place_tasks(previous, references)
+            raise ValueError("移动后任务的顺序与依赖矛盾（会形成循环依赖）")
+
+        changed = [self._tasks[task_id] for task_id in related]
+        if modified:
+            self.modified = True
+        self._notify("move", changed)
+        return previous
+
+    def _place_tasks(self, targets, references):
+        """
+        将任务重新注册到新的 (总标题, 分支序号)，并改写、连接指向它们的依赖
+
+        参数:
+            targets (dict): 任务id -> (总标题, 分支序号)
+            references (list): 依赖被移动任务的 (依赖任务id, 被移动任务id)
+        """
+        # 先原地改写引用（保持 depends_on 中的顺序），注销时就不会把它们当作失效的引用删除；
+        # 依赖任务id -> 已改写的引用下标（编号可能互换，改写过的引用不再匹配）
+        rewritten = {}
+        for dependent_id, task_id in references:
+            task = self._tasks[task_id]
+            old_ref = [task["main_task"], task["branch_number"]]
+            refs = self._tasks[dependent_id]["depends_on"]
+            done = rewritten.setdefault(dependent_id, set())
+            for index, ref in enumerate(refs):
+                if index not in done and ref == old_ref:
+                    refs[index] = list(targets[task_id])
+                    done.add(index)
+                    break
+
+        moved = [self._tasks[task_id] for task_id in targets]
+        for task in moved:
+            self._unregister(task)
+        for task in moved:
+            task["main_task"], task["branch_number"] = targets[task["id"]]
+            self._register(task, task["id"])
+
+        # 被移动的依赖任务重新注册时已经连接，这里连接其余的依赖任务
+        for dependent_id, task_id in references:
+            try:
+                self.dependencies.add_edge(task_id, dependent_id)
+            except ValueError:
+                pass
+        for dependent_id in rewritten:
+            self._touch(self._tasks[dependent_id]["main_task"])
+
+    def add_dependency(self, task_id, prerequisite_id):
+        """
+        添加依赖：前置任务完成后任务才能开始
+
+        返回:
+            bool: 是否添加了新的依赖
+
+        异常:
+            ValueError: 添加后会形成循环依赖
+        """
+        task = self._tasks.get(task_id)
+        prerequisite = self._tasks.get(prerequisite_id)
+        if task is None or prerequisite is None or prerequisite_id in self.dependencies.prerequisites(task_id):
+            return False
+
+        self.dependencies.add_edge(prerequisite_id, task_id)
+        refs = task.setdefault("depends_on", [])
+        self._entries[task_id]["depends_on"] = refs
+        refs.append([prerequisite["main_task"], prerequisite["branch_number"]])
+        self._touch(task["main_task"])
+        self.modified = True
+        self._notify("update", [task])
+        return True
+
+    def remove_dependency(self, task_id, prerequisite_id):
+        """
+        删除依赖
+
+        返回:
+            bool: 依赖是否存在并已删除
+        """
+        task = self._tasks.get(task_id)
+        prerequisite = self._tasks.get(prerequisite_id)
+        if task is None or prerequisite is None or prerequisite_id not in self.dependencies.prerequisites(task_id):
+            return False
+
+        self.dependencies.remove_edge(prerequisite_id, task_id)
+        self._remove_ref(task, [prerequisite["main_task"], prerequisite["branch_number"]])
+        self.modified = True
+        self._notify("update", [task])
+        return True
+
+    def _set_branch_numbers(self, main_task, changes):
+        """
+        写入重新编号后的分支序号，并更新依赖这些任务的前置任务引用
+
+        参数:
+            main_task (str): 总标题
+            changes (list): [(任务id, 新的分支序号)]
+
+        返回:
+            list: 分支序号变化的任务
+        """
+        # 依赖任务id -> 已改写的引用下标（编号可能互换，改写过的引用不再匹配）
+        rewritten = {}
+        changed = []
+        for task_id, branch_number in changes:
+            task = self._tasks[task_id]
+            old_ref = [main_task, task["branch_number"]]
+            if self._ref_index.get(tuple(old_ref)) == task_id:
+                del self._ref_index[tuple(old_ref)]
+            task["branch_number"] = branch_number
+            self._entries[task_id]["branch_number"] = branch_number
+            changed.append(task)
+
+            for dependent_id in self.dependencies.dependents(task_id):
+                refs = self._tasks[dependent_id]["depends_on"]
+                done = rewritten.setdefault(dependent_id, set())
+                for index, ref in enumerate(refs):
+                    if index not in done and ref == old_ref:
+                        refs[index] = [main_task, branch_number]
+                        done.add(index)
+                        break
+
+        for dependent_id in rewritten:
+            self._touch(self._tasks[dependent_id]["main_task"])
+
+        for task_id, branch_number in changes:
+            key = (main_task, branch_number)
+            self._ref_index.setdefault(key, task_id)
+            self._resolve_pending(key, task_id)
+
+        self._touch(main_task)
+        return changed
+
+    def renumber_task(self, task_id, branch_number):
+        """
+        修改任务的分支序号，任务在分组中移动到对应的位置，其他任务不受影响
+
+        返回:
+            bool: 分支序号是否发生了变化
+
+        异常:
+            ValueError: 分组中已有该分支序号（依赖通过分支序号引用任务，不能重复），
+                或新的位置与依赖矛盾（会形成循环依赖）
+        """
+        task = self._tasks.get(task_id)
+        if task is None or task["branch_number"] == branch_number:
+            return False
+        if any(entry["branch_number"] == branch_number for entry in self.groups[task["main_task"]]["tasks"]):
+            raise ValueError(f"分支序号 {branch_number} 已存在")
+
+        old_index, index = self.dependencies.set_rank(task_id, branch_number)
+        entries = self.groups[task["main_task"]]["tasks"]
+        entries.insert(index, entries.pop(old_index))
+        changed = self._set_branch_numbers(task["main_task"], [(task_id, branch_number)])
+        self.modified = True
+        self._notify("move", changed)
+        return True
+
+    def move_task(self, task_id, index):
+        """
+        将任务移动到分组中的指定位置。分组内的分支序号集合不变，
+        只有原位置和新位置之间的任务重新编号
+
+        返回:
+            bool: 任务位置是否发生了变化
+
+        异常:
+            ValueError: 新的位置与依赖矛盾（会形成循环依赖）
+        """
+        task = self._tasks.get(task_id)
+        if task is None:
+            return False
+
+        old_index = self.dependencies.chain_index(task_id)
+        changes = self.dependencies.move_node(task_id, index)
+        index = self.dependencies.chain_index(task_id)
+        if index == old_index:
+            return False
+
+        entries = self.groups[task["main_task"]]["tasks"]
+        entries.insert(index, entries.pop(old_index))
+        changed = self._set_branch_numbers(task["main_task"], changes)
+        if task not in changed:
+            changed.append(task)
+        self.modified = True
+        self._notify("move", changed)
+        return True
+
+    def ready_tasks(self):
+        """未完成且所有前置任务都已完成的任务"""
+        return [self._tasks[task_id] for task_id in self.dependencies.ready]
+
+    def grouped_tasks(self, tasks=None):
+        """
+        按总标题分组并按分组内维护的顺序返回任务，不需要排序
+
+        参数:
+            tasks (list): 需要包含的任务（例如筛选结果），为None时包含全部任务
+
+        返回:
+            dict: 总标题 -> 任务列表
+        """
+        task_ids = None if tasks is None else {task["id"] for task in tasks}
+        result = {}
+        for main_task, group in self.groups.items():
+            group_tasks = [self._tasks[entry["id"]] for entry in group["tasks"]
+                           if task_ids is None or entry["id"] in task_ids]
+            if group_tasks:
+                result[main_task] = group_tasks
+        return result
+
+    def get_entry(self, task_id):
+        """按id获取分组投影中的分支任务条目"""
+        return self._entries.get(task_id)
+
+    @timed("convert", items=lambda args, result: len(args[0]) if len(args) < 2 or args[1] is None else len(args[1]))
+    def grouped_view(self, tasks=None):
+        """
+        获取按总标题分组的数据，供卡片视图使用
+
+        参数:
+            tasks (list): 需要包含的任务（例如筛选结果），为None时返回全部分组
+
+        返回:
+            tuple: (分组数据, 分组版本号)。传入任务子集时版本号包含条目id，
+                以便缓存能区分同一分组的不同筛选结果
+        """
+        if tasks is None:
+            return self.groups, dict(self.group_versions)
+
+        groups = {}
+        versions = {}
+        for main_task, group_tasks in self.grouped_tasks(tasks).items():
+            full_group = self.groups[main_task]
+            entries = [self._entries[task["id"]] for task in group_tasks]
+            groups[main_task] = {
+                "Types": full_group["Types"],
+                "describe": full_group["describe"],
+                "tasks": entries,
+                "sub_task_number": len(entries)
+            }
+            versions[main_task] = (self.group_versions[main_task], tuple(entry["id"] for entry in entries))
+        return groups, versions
+
+    def group_fragments(self, compact=False):
+        """
+        获取所有分组的JSON片段，只重新序列化版本号变化的分组
+
+        参数:
+            compact (bool): 是否生成紧凑格式的片段（切换格式后全部重新序列化一次）
+
+        返回:
+            list: 按分组顺序排列的JSON片段
+        """
+        fragments = []
+        for main_task, group in self.groups.items():
+            version = (self.group_versions[main_task], compact)
+            cached = self._fragment_cache.get(main_task)
+            if cached is None or cached[0] != version:
+                if self.detail_store:
+                    group = dict(group, tasks=[self.full_entry(entry) for entry in group["tasks"]])
+                cached = (version, TaskDataHandler.dump_group(main_task, group, compact))
+                self._fragment_cache[main_task] = cached
+            fragments.append(cached[1])
+        return fragments
+
+    def set_completed(self, task_id, completed):
+        """
+        设置任务完成状态
+
+        返回:
+            bool: 状态是否发生了变化
+        """
+        task = self._tasks.get(task_id)
+        if task is None or task["completed"] == completed:
+            return False
+
+        entry = self._entries[task_id]
+        self._apply_stats(task, entry, -1)
+        task["completed"] = completed
+        entry["completed"] = completed
+        self._apply_stats(task, entry, 1)
+        self.dependencies.set_completed(task_id, completed)
+        self._touch(task["main_task"])
+        self.modified = True
+        self._notify("update", [task])
+        return True
+
+    def update_task(self, task_id, fields, modified=True):
+        """
+        修改任务的字段（总标题和分支序号除外，使用 renumber_task / move_task / regroup_tasks）
+
+        参数:
+            task_id (int): 任务id
+            fields (dict): 字段名 -> 新的值
+            modified (bool): 是否标记为未保存的修改（合并外部文件的修改时为False）
+
+        返回:
+            bool: 任务是否发生了变化
+        """
+        task = self._tasks.get(task_id)
+        if task is None or not self._update_fields(task, fields):
+            return False
+        if modified:
+            self.modified = True
+        self._notify("update", [task])
+        return True
+
+    def update_tasks(self, changes, modified=True):
+        """
+        批量修改任务的字段，只发送一次变更通知
+
+        参数:
+            changes (dict): 任务id -> {字段名: 新的值}
+            modified (bool): 是否标记为未保存的修改
+
+        返回:
+            dict: 任务id -> {字段名: 原来的值}，只包含发生了变化的任务和字段
+        """
+        previous = {}
+        changed = []
+        for task_id, fields in changes.items():
+            task = self._tasks.get(task_id)
+            if task is None:
+                continue
+            old_values = self._update_fields(task, fields)
+            if old_values:
+                previous[task_id] = old_values
+                changed.append(task)
+
+        if changed:
+            if modified:
+                self.modified = True
+            self._notify("update", changed)
+        return previous
+
+    def _update_fields(self, task, fields):
+        """
+        修改任务的字段并维护分组投影、统计和依赖，不发送变更通知
+
+        返回:
+            dict: {字段名: 原来的值}，没有变化时为空
+        """
+        if "details" in fields and "details" not in task:
+            if fields["details"] == self.detail_store.get(task["id"]):
+                fields = {name: value for name, value in fields.items() if name != "details"}
+            else:
+                # 记录原来的值，修改后按新的长度重新决定是否移出
+                task["details"] = self.detail_store.pop(task["id"])
+        fields = {name: value for name, value in fields.items() if task.get(name) != value}
+        if not fields:
+            return {}
+        previous = {name: task.get(name) for name in fields}
+
+        task_id = task["id"]
+        main_task = task["main_task"]
+        entry = self._entries[task_id]
+        old_type = task["main_task_type"]
+        self._apply_stats(task, entry, -1)
+        task.update(fields)
+        if not task.get("depends_on"):
+            task.pop("depends_on", None)
+        # 条目原地替换内容，分组投影中的位置不变
+        entry.clear()
+        entry.update(self._make_entry(task))
+        self._apply_stats(task, entry, 1)
+
+        if task["main_task_type"] != old_type:
+            if self.type_stats[old_type]["count"] == 0:
+                del self.type_stats[old_type]
+            type_counts = self._group_types[main_task]
+            type_counts[old_type] -= 1
+            if type_counts[old_type] == 0:
+                del type_counts[old_type]
+            type_counts[task["main_task_type"]] = type_counts.get(task["main_task_type"], 0) + 1
+            self._update_group_types(main_task)
+
+        if "completed" in fields:
+            self.dependencies.set_completed(task_id, task["completed"])
+        if "depends_on" in fields:
+            for prerequisite_id in self.dependencies.prerequisites(task_id):
+                self.dependencies.remove_edge(prerequisite_id, task_id)
+            self._link_prerequisites(task)
+
+        self._touch(main_task)
+        return previous
+
+    def set_subtask_completed(self, task_id, sub_task_name, completed):
+        """
+        设置子任务完成状态
+
+        返回:
+            bool: 状态是否发生了变化
+        """
+        task = self._tasks.get(task_id)
+        if task is None:
+            return False
+
+        sub_tasks = task["sub_task_tasks"]
+        if sub_tasks.get(sub_task_name) == completed:
+            return False
+
+        sub_tasks[sub_task_name] = completed
+        self._touch(task["main_task"])
+        self.modified = True
+        self._notify("update", [task])
+        return True
+
+    def mark_saved(self):
+        """标记当前数据已保存"""
+        self.modified = False
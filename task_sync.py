@@ -0,0 +1,393 @@
+import argparse
+import bisect
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from perf_instrument import timed
+from task_data_handler import TaskDataHandler
+from task_merge import MERGE_FIELDS, TaskFileSync, TaskMerger
+from task_store import TaskStore
+
+# 默认的同步服务地址
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+def task_key(task):
+    """任务在同步协议中的标识：(总标题, 分支序号)，与依赖引用相同"""
+    return task["main_task"], task["branch_number"]
+
+
+def task_state(task):
+    """任务在同步协议中传输的字段"""
+    state = {field: task.get(field) for field in MERGE_FIELDS}
+    state["completed"] = task.get("completed", False)
+    state["weight"] = task.get("weight", 10)
+    state["sub_task_tasks"] = task.get("sub_task_tasks") or {}
+    state["depends_on"] = task.get("depends_on") or []
+    return state
+
+
+def state_to_task(key, state):
+    """由标识和传输的字段恢复任务对象"""
+    task = {"main_task": key[0], "branch_number": key[1]}
+    task.update(json.loads(json.dumps(state)))
+    if not task["depends_on"]:
+        del task["depends_on"]
+    return task
+
+
+def track_changed_keys(keys_by_id, event, tasks):
+    """
+    根据任务存储的变更通知得到标识发生变化的任务
+
+    参数:
+        keys_by_id (dict): 任务id -> 上次记录的标识，原地更新
+        event (str): 变更类型
+        tasks (list): 变更的任务
+
+    返回:
+        set: 受影响的标识（重新编号的任务同时包含原标识和新标识）
+    """
+    keys = set()
+    if event == "reset":
+        keys.update(keys_by_id.values())
+        keys_by_id.clear()
+    for task in tasks:
+        key = task_key(task)
+        keys.add(key)
+        if event == "remove":
+            keys_by_id.pop(task["id"], None)
+        else:
+            old_key = keys_by_id.get(task["id"])
+            if old_key is not None:
+                keys.add(old_key)
+            keys_by_id[task["id"]] = key
+    return keys
+
+
+def apply_states(task_store, states, modified=True):
+    """
+    将一组标识对应的任务状态写入任务存储：已有的任务修改字段，状态为None的删除，其余新增。
+    先修改、再删除、最后新增，重新编号时依赖引用可以在新增的任务注册后重新连接。
+
+    参数:
+        task_store (TaskStore): 任务存储
+        states (list): [(标识, 任务状态或None)]
+
+    返回:
+        dict: {"groups", "added", "removed", "updated"}
+    """
+    result = {"groups": set(), "added": 0, "removed": 0, "updated": 0}
+    removed = []
+    added = []
+    for key, state in states:
+        current = task_store.find_task(*key)
+        if current is not None:
+            current = task_store.full_task(current)
+        if state is None:
+            if current is not None:
+                removed.append(current["id"])
+        elif current is None:
+            added.append(state_to_task(key, state))
+        elif task_state(current) != state and task_store.update_task(current["id"], json.loads(json.dumps(state)), modified=modified):
+            result["updated"] += 1
+            result["groups"].add(key[0])
+
+    for task_id in removed:
+        task = task_store.remove_task(task_id, modified=modified)
+        result["removed"] += 1
+        result["groups"].add(task["main_task"])
+    if added:
+        task_store.add_tasks(added, modified=modified)
+        result["added"] += len(added)
+        result["groups"].update(task["main_task"] for task in added)
+    return result
+
+
+class SyncState:
+    """
+    同步服务端持有的权威任务存储，以及每个标识最后一次变化时的修订号。
+
+    客户端提交自上次同步以来变化的任务（连同上次同步时的版本作为基准），
+    服务端按字段做三方合并，然后返回该客户端已知修订号之后变化的所有任务的当前状态，
+    因此每次同步只传输变化的部分，客户端离线期间的修改在重新连接后一次提交。
+    """
+
+    def __init__(self, task_store, filename=None):
+        self.task_store = task_store
+        self.filename = filename
+        self.file_sync = TaskFileSync(filename) if filename else None
+        if self.file_sync is not None:
+            self.file_sync.record_store(task_store)
+        self.revision = 0
+        self._lock = threading.Lock()
+        # 标识 -> 最后变化的修订号，以及按修订号递增的 (修订号, 标识) 日志
+        self._key_revisions = {}
+        self._log = []
+        self._keys_by_id = {}
+        # 启动时已有的任务记为修订号1，首次同步的客户端会收到它们
+        self._on_store_changed("reset", task_store.tasks)
+        self.revision = 1 if self._log else 0
+        task_store.add_listener(self._on_store_changed)
+
+    def _on_store_changed(self, event, tasks):
+        revision = self.revision + 1
+        for key in track_changed_keys(self._keys_by_id, event, tasks):
+            self._key_revisions[key] = revision
+            self._log.append((revision, key))
+
+    def _compact_log(self):
+        """日志中同一标识的旧记录过多时只保留每个标识的最后一条"""
+        if len(self._log) > 2 * len(self._key_revisions) + 1024:
+            self._log = sorted((revision, key) for key, revision in self._key_revisions.items())
+
+    def delta(self, since):
+        """修订号 since 之后变化的任务：[(标识, 当前状态或None)]"""
+        start = bisect.bisect_right(self._log, since, key=lambda item: item[0])
+        keys = dict.fromkeys(key for _, key in self._log[start:])
+        states = []
+        for key in keys:
+            task = self.task_store.find_task(*key)
+            # 首次同步的客户端不需要知道哪些任务被删除过
+            if task is not None or since > 0:
+                states.append((key, task_state(self.task_store.full_task(task)) if task is not None else None))
+        return states
+
+    def sync(self, since, changes):
+        """
+        合并客户端提交的修改并返回增量
+
+        参数:
+            since (int): 客户端已知的修订号
+            changes (list): [{"key": [总标题, 分支序号], "base": 上次同步时的状态或None,
+                              "task": 当前状态或None（已删除）}]
+
+        返回:
+            dict: {"revision", "tasks": [{"key", "task"}], "conflicts": [...]}
+        """
+        with self._lock:
+            states, conflicts = self._merge_changes(changes)
+            apply_states(self.task_store, states)
+            if self._log and self._log[-1][0] > self.revision:
+                self.revision = self._log[-1][0]
+                if self.file_sync is not None:
+                    self.file_sync.save(self.task_store)
+            self._compact_log()
+
+            return {
+                "revision": self.revision,
+                "tasks": [{"key": list(key), "task": state} for key, state in self.delta(since)],
+                "conflicts": conflicts
+            }
+
+    def _merge_changes(self, changes):
+        """对照服务端的当前状态合并客户端的修改，返回需要写入的 [(标识, 状态)] 和冲突"""
+        states = []
+        conflicts = []
+
+        def conflict(key, state, reason):
+            conflicts.append({"main_task": key[0], "branch_number": key[1],
+                              "sub_task": state["sub_task"], "reason": reason})
+
+        for change in changes:
+            key = tuple(change["key"])
+            base, theirs = change.get("base"), change.get("task")
+            current = self.task_store.find_task(*key)
+            if current is not None:
+                current = self.task_store.full_task(current)
+            base_task = state_to_task(key, base) if base is not None else None
+            if theirs is None:
+                if current is None or base_task is None:
+                    continue
+                if TaskMerger.differs(base_task, current):
+                    conflict(key, task_state(current), "客户端已删除，服务器上被修改")
+                else:
+                    states.append((key, None))
+            elif current is None:
+                if base_task is None:
+                    states.append((key, theirs))
+                elif TaskMerger.differs(base_task, state_to_task(key, theirs)):
+                    conflict(key, theirs, "服务器上已删除，客户端被修改")
+            else:
+                their_task = state_to_task(key, theirs)
+                changed, fields = TaskMerger.merge_fields(base_task, current, their_task)
+                if fields:
+                    conflict(key, theirs, "双方都修改了: " + ", ".join(fields))
+                if changed:
+                    state = task_state(current)
+                    state.update(changed)
+                    states.append((key, state))
+        return states, conflicts
+
+
+class SyncRequestHandler(BaseHTTPRequestHandler):
+    """同步服务的HTTP接口：POST /sync 提交修改并获取增量，GET /status 查看状态"""
+
+    def _send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/status":
+            self._send_json(404, {"error": "not found"})
+            return
+        state = self.server.sync_state
+        self._send_json(200, {"revision": state.revision, "tasks": len(state.task_store)})
+
+    def do_POST(self):
+        if self.path != "/sync":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length).decode("utf-8"))
+            response = self.server.sync_state.sync(int(request.get("revision", 0)), request.get("changes", []))
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        self._send_json(200, response)
+
+    def log_message(self, format, *args):
+        # 每次同步都会请求，不输出访问日志
+        pass
+
+
+def create_server(task_store, host=DEFAULT_HOST, port=DEFAULT_PORT, filename=None):
+    """
+    创建同步服务（调用 serve_forever 开始服务，测试时可在线程中运行）
+
+    参数:
+        task_store (TaskStore): 权威任务存储
+        host (str): 监听地址，默认只接受本机连接
+        port (int): 端口，0表示自动分配
+        filename (str): 可选，合并修改后保存到该任务文件
+    """
+    server = ThreadingHTTPServer((host, port), SyncRequestHandler)
+    server.sync_state = SyncState(task_store, filename)
+    return server
+
+
+class TaskSyncClient:
+    """
+    同步服务的客户端。记录自上次同步以来变化的任务标识，同步时只提交这些任务，
+    并应用服务端返回的增量。服务不可用时修改继续累积，重新连接后一次提交。
+    """
+
+    def __init__(self, task_store, url, timeout=2.0):
+        self.task_store = task_store
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        # 已知的服务端修订号，0表示尚未同步过
+        self.revision = 0
+        # 标识 -> 上次同步时的任务状态（提交修改时作为合并的基准）
+        self.shadow = {}
+        # 自上次同步以来变化的标识
+        self.dirty = set()
+        self._keys_by_id = {task["id"]: task_key(task) for task in task_store}
+        self._applying = False
+        task_store.add_listener(self._on_store_changed)
+
+    def _on_store_changed(self, event, tasks):
+        keys = track_changed_keys(self._keys_by_id, event, tasks)
+        # 应用服务端增量引起的变化不需要再提交
+        if self._applying:
+            return
+        if event == "move":
+            # 重新编号时依赖这些任务的引用也被改写了
+            for task in tasks:
+                for dependent_id in self.task_store.dependencies.dependents(task["id"]):
+                    keys.add(task_key(self.task_store.get(dependent_id)))
+        self.dirty.update(keys)
+
+    @property
+    def pending(self):
+        """尚未提交的变化任务数"""
+        return len(self.dirty)
+
+    def _changes(self):
+        """需要提交的修改，首次同步时提交本地的所有任务"""
+        keys = self.dirty
+        if self.revision == 0:
+            keys = keys | {task_key(task) for task in self.task_store}
+
+        changes = []
+        for key in keys:
+            task = self.task_store.find_task(*key)
+            state = task_state(self.task_store.full_task(task)) if task is not None else None
+            base = self.shadow.get(key)
+            if state != base:
+                changes.append({"key": list(key), "base": base, "task": state})
+        return changes
+
+    def _post(self, path, data):
+        request = urllib.request.Request(
+            self.url + path, data=json.dumps(data, ensure_ascii=False).encode("utf-8"),
+            headers={"Content-Type": "application/json; charset=utf-8"}, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    @timed("sync", items=lambda args, result: result["pushed"])
+    def sync(self):
+        """
+        提交本地修改并应用服务端的增量。服务端的修改不标记为未保存。
+
+        返回:
+            dict: {"groups", "added", "removed", "updated", "pushed", "conflicts"}
+
+        异常:
+            OSError: 无法连接同步服务（本地修改保留，下次同步时提交）
+        """
+        changes = self._changes()
+        try:
+            response = self._post("/sync", {"revision": self.revision, "changes": changes})
+        except (urllib.error.URLError, ValueError) as e:
+            raise OSError(f"无法连接同步服务: {e}") from e
+
+        states = [(tuple(item["key"]), item["task"]) for item in response["tasks"]]
+        self._applying = True
+        try:
+            result = apply_states(self.task_store, states, modified=False)
+        finally:
+            self._applying = False
+
+        for key, state in states:
+            if state is None:
+                self.shadow.pop(key, None)
+            else:
+                self.shadow[key] = state
+        self.dirty.clear()
+        self.revision = response["revision"]
+        result["pushed"] = len(changes)
+        result["conflicts"] = response["conflicts"]
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="任务同步服务")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="监听地址")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="端口")
+    parser.add_argument("--file", default="tasks.json", help="加载并保存的任务文件")
+    args = parser.parse_args()
+
+    tasks = TaskDataHandler.load_tasks_from_json(args.file) if os.path.exists(args.file) else []
+    server = create_server(TaskStore(tasks or []), args.host, args.port, args.file)
+    print(f"同步服务已启动: http://{args.host}:{server.server_address[1]}，任务数 {len(server.sync_state.task_store)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
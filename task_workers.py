@@ -0,0 +1,132 @@
+import csv
+import io
+import os
+
+from PySide6.QtCore import QObject, Signal, Slot
+
+from perf_instrument import timed
+from task_data_handler import TaskDataHandler
+from task_merge import TaskFileSync, file_signature, text_digest
+
+
+class TaskLoadWorker(QObject):
+    """
+    后台加载任务文件的工作对象，运行在独立线程中，按块发送解析出的任务
+    """
+    # 定义信号
+    chunkLoaded = Signal(object)
+    finished = Signal(int)
+    failed = Signal(str)
+
+    def __init__(self, filename, chunk_size=500):
+        super().__init__()
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self._cancelled = False
+        # 加载完成后为 (文件签名, 内容摘要, 分组原始文本, 文件格式)，作为检测外部修改的基准
+        self.snapshot = None
+
+    def cancel(self):
+        """请求取消加载，当前块发送完后停止"""
+        self._cancelled = True
+
+    @Slot()
+    @timed("load")
+    def run(self):
+        """逐块读取任务文件"""
+        if not os.path.exists(self.filename):
+            self.finished.emit(0)
+            return
+
+        count = 0
+        chunk = []
+        group_texts = {}
+        try:
+            signature = file_signature(self.filename)
+            text, compression = TaskDataHandler.read_tasks_file(self.filename)
+            for task in TaskDataHandler.iter_tasks_from_text(text, group_texts):
+                if self._cancelled:
+                    break
+                chunk.append(task)
+                if len(chunk) >= self.chunk_size:
+                    self.chunkLoaded.emit(chunk)
+                    count += len(chunk)
+                    chunk = []
+
+            if chunk and not self._cancelled:
+                self.chunkLoaded.emit(chunk)
+                count += len(chunk)
+        except (OSError, ValueError, KeyError) as e:
+            self.failed.emit(str(e))
+            return
+
+        if not self._cancelled:
+            self.snapshot = (signature, text_digest(text), group_texts, TaskFileSync.file_format(text, compression))
+        self.finished.emit(count)
+
+
+class TaskImportWorker(QObject):
+    """
+    后台导入CSV/JSONL文件的工作对象：流式读取并校验记录，按块发送有效的任务，
+    任务写入存储由界面线程在收到每块后批量完成
+    """
+    # 定义信号
+    chunkParsed = Signal(object)
+    progress = Signal(int)
+    finished = Signal(object)
+    failed = Signal(str)
+
+    # 最多保留的错误行数
+    MAX_ERRORS = 100
+
+    def __init__(self, filename, chunk_size=2000, fmt=None):
+        super().__init__()
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.fmt = fmt or TaskDataHandler.record_format(filename)
+        self._cancelled = False
+
+    def cancel(self):
+        """请求取消导入，当前块发送完后停止"""
+        self._cancelled = True
+
+    @Slot()
+    @timed("import")
+    def run(self):
+        """
+        逐块解析导入文件，通过 progress 报告已读取的比例（0~1000），
+        结束时发送 {"rows", "valid", "errors": [(行号, 原因)], "cancelled"}
+        """
+        rows = valid = 0
+        errors = []
+        chunk = []
+        try:
+            size = os.path.getsize(self.filename) or 1
+            with open(self.filename, 'rb') as raw:
+                stream = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+                for line_number, record in TaskDataHandler.iter_records(stream, self.fmt):
+                    if self._cancelled:
+                        break
+                    rows += 1
+                    try:
+                        if isinstance(record, Exception):
+                            raise record
+                        chunk.append(TaskDataHandler.record_to_task(record))
+                        valid += 1
+                    except (ValueError, TypeError) as e:
+                        if len(errors) < self.MAX_ERRORS:
+                            errors.append((line_number, str(e)))
+
+                    if len(chunk) >= self.chunk_size:
+                        self.chunkParsed.emit(chunk)
+                        self.progress.emit(min(1000, raw.tell() * 1000 // size))
+                        chunk = []
+
+            if chunk and not self._cancelled:
+                self.chunkParsed.emit(chunk)
+        except (OSError, UnicodeDecodeError, csv.Error) as e:
+            self.failed.emit(str(e))
+            return
+
+        self.progress.emit(1000)
+        self.finished.emit({"rows": rows, "valid": valid, "errors": errors, "cancelled": self._cancelled})
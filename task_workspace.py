@@ -0,0 +1,153 @@
+import json
+from collections import OrderedDict
+
+from task_archive import TaskArchive
+from task_data_handler import TaskDataHandler
+from task_merge import TaskFileSync
+
+# 工作区列表文件：{"current": 上次使用的工作区, "workspaces": {名称: 任务文件}}
+WORKSPACES_FILE = "workspaces.json"
+# 没有工作区列表时的默认工作区
+DEFAULT_WORKSPACE = "默认"
+DEFAULT_TASKS_FILE = "tasks.json"
+# 已加载工作区缓存的内存预算（字节）
+WORKSPACE_CACHE_BUDGET = 256 * 1024 * 1024
+# 估算任务存储内存的系数：每个任务的固定开销（任务字典、分组条目、索引和依赖图节点），
+# 以及文本中每个字符的开销（中文字符串每字符2字节）。按 benchmark.py 的数据集用 tracemalloc 测得
+TASK_BASE_BYTES = 2200
+TEXT_CHAR_BYTES = 2
+
+
+class Workspace:
+    """
+    命名的工作区：一个任务文件，以及它的外部修改检测基准和归档。
+    不在界面上显示时，已加载的数据保存在 task_store 中（没有监听者的独立存储），由 WorkspaceCache 管理。
+    """
+
+    def __init__(self, name, filename):
+        self.name = name
+        self.filename = filename
+        self.file_sync = TaskFileSync(filename)
+        self.task_archive = TaskArchive(TaskArchive.archive_filename(filename))
+        self.task_store = None
+        # 放入缓存时估算的内存占用
+        self.estimated_bytes = 0
+
+    @staticmethod
+    def estimate_bytes(task_store):
+        """估算任务存储占用的内存（字节）"""
+        total = 0
+        for task in task_store:
+            total += TASK_BASE_BYTES + TEXT_CHAR_BYTES * (
+                len(task["sub_task"]) + len(task.get("details", "")) + sum(map(len, task.get("sub_task_tasks") or ())))
+        return total
+
+
+class WorkspaceRegistry:
+    """工作区名称到任务文件的列表，以及上次使用的工作区，保存在 workspaces.json 中"""
+
+    def __init__(self, filename=WORKSPACES_FILE):
+        self.filename = filename
+        self.workspaces = {DEFAULT_WORKSPACE: DEFAULT_TASKS_FILE}
+        self.current = DEFAULT_WORKSPACE
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("workspaces"):
+                self.workspaces = dict(data["workspaces"])
+            if data.get("current") in self.workspaces:
+                self.current = data["current"]
+            else:
+                self.current = next(iter(self.workspaces))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"读取工作区列表时出错，使用默认工作区: {e}")
+
+    def names(self):
+        return list(self.workspaces)
+
+    def task_file(self, name):
+        return self.workspaces[name]
+
+    def add(self, name, filename):
+        """
+        添加工作区并保存列表
+
+        异常:
+            ValueError: 名称为空或已存在
+        """
+        name = name.strip()
+        if not name:
+            raise ValueError("工作区名称不能为空")
+        if name in self.workspaces:
+            raise ValueError(f"工作区已存在: {name}")
+        self.workspaces[name] = filename
+        self.save()
+
+    def set_current(self, name):
+        self.current = name
+        self.save()
+
+    def save(self):
+        try:
+            TaskDataHandler.write_text_atomic(
+                json.dumps({"current": self.current, "workspaces": self.workspaces}, ensure_ascii=False, indent=4),
+                self.filename)
+        except OSError as e:
+            print(f"保存工作区列表时出错: {e}")
+
+
+class WorkspaceCache:
+    """
+    最近使用的工作区的LRU缓存：切换走的工作区连同已建好索引的任务存储留在内存中，
+    切换回来时直接换入，不需要重新读取和解析。总的估算内存超过预算时淘汰最久未使用的工作区；
+    有未保存修改的工作区不会被淘汰（关闭窗口前由调用方保存）。
+    """
+
+    def __init__(self, budget=WORKSPACE_CACHE_BUDGET):
+        self.budget = budget
+        # 名称 -> Workspace，最近放入的在末尾
+        self._workspaces = OrderedDict()
+
+    def __contains__(self, name):
+        return name in self._workspaces
+
+    def __len__(self):
+        return len(self._workspaces)
+
+    @property
+    def total_bytes(self):
+        return sum(workspace.estimated_bytes for workspace in self._workspaces.values())
+
+    def take(self, name):
+        """取出缓存的工作区（之后由调用方换入界面），不在缓存中时返回None"""
+        return self._workspaces.pop(name, None)
+
+    def put(self, workspace):
+        """
+        放入切换走的工作区（workspace.task_store 保存其数据），超出预算时淘汰最久未使用的工作区
+
+        返回:
+            list: 被淘汰的工作区
+        """
+        workspace.estimated_bytes = Workspace.estimate_bytes(workspace.task_store)
+        self._workspaces[workspace.name] = workspace
+        self._workspaces.move_to_end(workspace.name)
+
+        evicted = []
+        total = self.total_bytes
+        for name in list(self._workspaces):
+            if total <= self.budget:
+                break
+            cached = self._workspaces[name]
+            if cached.task_store.modified:
+                continue
+            del self._workspaces[name]
+            total -= cached.estimated_bytes
+            evicted.append(cached)
+        return evicted
+
+    def modified(self):
+        """缓存中有未保存修改的工作区"""
+        return [workspace for workspace in self._workspaces.values() if workspace.task_store.modified]